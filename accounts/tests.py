@@ -1,3 +1,31 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from cart.models import Order, Item
+from movies import inventory
+from movies.models import Movie, LibraryBranch, Stock
+
+
+class MarkReturnedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pw')
+        self.client.force_login(self.user)
+        movie = Movie.objects.create(name='Calculus', description='desc')
+        branch = LibraryBranch.objects.create(name='Main')
+        self.stock = Stock.objects.create(movie=movie, branch=branch, count=0)
+        self.order = Order.objects.create(user=self.user, total_items=2)
+        self.item = Item.objects.create(order=self.order, movie=movie, branch=branch, quantity=2)
+        inventory.recompute_availability([movie.id])
+
+    def test_return_restocks_branch_once(self):
+        url = f'/en/accounts/holds/{self.item.id}/return/'
+        self.client.post(url)
+        self.client.post(url)
+        self.stock.refresh_from_db()
+        self.order.refresh_from_db()
+        self.item.refresh_from_db()
+        self.assertTrue(self.item.returned)
+        self.assertEqual(self.stock.count, 2)
+        self.assertEqual(self.order.total_items, 0)
+        movie = Movie.objects.get()
+        self.assertEqual((movie.available_copies, movie.total_copies, movie.available), (2, 2, True))
@@ -4,7 +4,9 @@ from .forms import CustomUserCreationForm, CustomErrorList
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
 from django.shortcuts import get_object_or_404
 from django.views.decorators.http import require_POST
 
@@ -99,21 +101,33 @@ def orders(request):
 def mark_returned(request, item_id):
     """Mark an Item (hold) as returned by the owning user.
 
-    This sets Item.returned = True and decrements the parent Order.total_items by the
-    item's quantity (clamped at zero).
+    This sets Item.returned = True, decrements the parent Order.total_items by the
+    item's quantity (clamped at zero), restocks the branch the copies came from and
+    updates the book's availability counters.
     """
-    from cart.models import Item
+    from cart.models import Item, Order
+    from movies import inventory
+    from movies.models import Stock
     item = get_object_or_404(Item, id=item_id)
     # Ensure the logged-in user owns the order
     if item.order.user != request.user:
         return redirect('accounts.orders')
 
-    if not item.returned:
-        item.returned = True
-        item.save()
-        # update order total_items
-        order = item.order
-        order.total_items = max(0, order.total_items - (item.quantity or 0))
-        order.save()
+    with transaction.atomic():
+        # Conditional update so a double submit cannot return the same hold twice
+        if Item.objects.filter(id=item.id, returned=False).update(returned=True):
+            # update order total_items
+            Order.objects.filter(id=item.order_id).update(
+                total_items=Greatest(F('total_items') - (item.quantity or 0), 0)
+            )
+            # put the copies back on the shelf they came from
+            if item.branch_id:
+                Stock.objects.filter(movie_id=item.movie_id, branch_id=item.branch_id).update(
+                    count=F('count') + (item.quantity or 0)
+                )
+                inventory.return_copies(item.movie_id, item.quantity or 0)
+            else:
+                # holds from before branch tracking have no shelf to go back to
+                inventory.recompute_availability([item.movie_id])
 
-    return redirect('accounts.orders')
\ No newline at end of file
+    return redirect('accounts.orders')
@@ -0,0 +1,113 @@
+"""Run the benchmark suite.
+
+    python -m benchmarks                        # default dataset, compare to benchmarks/baseline.json
+    python -m benchmarks --movies 5000 --iterations 200
+    python -m benchmarks --save-baseline        # record this run as the new baseline
+    python -m benchmarks --only movies.show     # scenarios whose name starts with this
+
+Runs against a throwaway test database and cache directory (never the
+development ones) filled with seeded synthetic data, with DEBUG off and the
+translation upstream replaced by a local stub. Exits with status 1 when a scenario regresses
+against the baseline.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+
+def parse_args(argv, defaults):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.split('\n\n')[0])
+    for name, value in defaults.as_dict().items():
+        parser.add_argument(f'--{name}', type=int, default=value, help=f'rows to generate (default {value})')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--iterations', type=int, default=50, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per scenario')
+    parser.add_argument('--only', action='append', default=[], help='run scenarios whose name starts with this')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth before failing (default 0.25)')
+    parser.add_argument('--output', type=Path, help='also write the results as JSON here')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'moviesstore.settings')
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.db.models import Count
+    from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+    from benchmarks import datagen, runner
+    from movies.models import Movie
+    from translations.cache import translation_cache
+    from translations.testing import StubLibreTranslate
+
+    args = parse_args(argv, datagen.DatasetSize())
+    size = datagen.DatasetSize(**{name: getattr(args, name) for name in datagen.DatasetSize().as_dict()})
+
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        started = time.perf_counter()
+        counts = datagen.generate(size, seed=args.seed)
+        print(f'Generated {counts} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+        all_ids = list(Movie.objects.order_by('id').values_list('id', flat=True))
+        context = {
+            'movie_ids': random.Random(args.seed).sample(all_ids, min(500, len(all_ids))),
+            'popular_movie_id': Movie.objects.annotate(n=Count('review')).order_by('-n').values_list('id', flat=True).first(),
+            'search_terms': list(datagen.WORDS[:10]),
+        }
+        user = User.objects.create_user(username='bench-runner')
+        scenarios = [
+            s for s in runner.build_scenarios(context)
+            if not args.only or any(s.name.startswith(prefix) for prefix in args.only)
+        ]
+
+        results = {'environment': runner.environment(), 'dataset': size.as_dict(), 'seed': args.seed,
+                   'iterations': args.iterations, 'scenarios': {}}
+        # A throwaway cache directory too: the runner clears the cache between scenarios
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(CACHES={
+            alias: {**config, 'LOCATION': os.path.join(cache_dir, alias)} for alias, config in settings.CACHES.items()
+        }), StubLibreTranslate() as stub, override_settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            translation_cache.clear()
+            for scenario in scenarios:
+                results['scenarios'][scenario.name] = runner.run_scenario(scenario, user, args.iterations, args.warmup)
+                print(f'  {scenario.name}: done', file=sys.stderr)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    baseline = None
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get('dataset') != results['dataset']:
+            print('Note: the baseline was recorded with a different dataset size.', file=sys.stderr)
+    print(runner.format_table(results, baseline))
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + '\n')
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + '\n')
+        print(f'Saved baseline to {args.baseline}')
+        return 0
+
+    regressions = runner.compare(results, baseline, args.tolerance) if baseline else []
+    for name, message in regressions:
+        print(f'REGRESSION {name}: {message}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
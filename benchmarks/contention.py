@@ -0,0 +1,241 @@
+"""Concurrent-write benchmark for the SQLite configuration.
+
+    python -m benchmarks.contention                       # both profiles, 8 threads, 10 s each
+    python -m benchmarks.contention --threads 16 --duration 20
+    python -m benchmarks.contention --profile production
+
+Each profile runs in its own process against a fresh database file (WAL
+needs a real file), migrated and seeded by datagen:
+
+- default: plain SQLite as Django opens it. Rollback journal, deferred
+  transactions, a new connection per request and no PRAGMAs.
+- production: the settings as configured (see sqlitetuning/pragmas.py).
+
+Worker threads replay a request mix for a fixed time: catalogue reads,
+session writes, reviews with their rating summary, petition votes and
+checkouts. Each operation is wrapped in the request_started/request_finished
+connection handling, so CONN_MAX_AGE applies as it would in a server.
+The benchmark reports throughput, latency percentiles and how many
+operations failed with "database is locked".
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROFILES = ('default', 'production')
+OPERATIONS = ('read', 'session', 'review', 'vote', 'checkout')
+# Relative frequency of each operation in the mix
+WEIGHTS = (50, 20, 12, 12, 6)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.contention', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--profile', choices=PROFILES, action='append', help='profile(s) to run (default: both)')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per profile')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', type=Path, help='also write the results as JSON here')
+    parser.add_argument('--worker', choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def configure(profile, database):
+    """Point the settings at `database` (and a cache beside it) and, for the default profile, strip the production tuning."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'moviesstore.settings')
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = database
+    # Keep the run's cache entries next to its database, away from the development caches
+    for alias, config in settings.CACHES.items():
+        config['LOCATION'] = os.path.join(os.path.dirname(database), 'cache', alias)
+    if profile == 'default':
+        settings.DATABASES['default'].update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False, OPTIONS={})
+        settings.SQLITE_TUNING = {'ENABLED': False}
+    settings.DEBUG = False
+
+    import django
+    django.setup()
+
+
+def make_operations(context):
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.db import IntegrityError, transaction
+
+    from cart.utils import checkout
+    from movies.models import Movie, Review
+    from petitions.models import PetitionVote
+
+    movie_ids, user_ids, petition_ids = context['movie_ids'], context['user_ids'], context['petition_ids']
+
+    def read(rng):
+        list(Movie.objects.filter(available=True).order_by('name', 'id').values_list('id', 'name')[:24])
+
+    def session(rng):
+        store = SessionStore()
+        store['cart'] = {str(rng.choice(movie_ids)): '1'}
+        store.save()
+
+    def review(rng):
+        movie_id = rng.choice(movie_ids)
+        rating = rng.randint(1, 5)
+        with transaction.atomic():
+            # The post_save signal updates the rating summary, as in the view
+            Review.objects.create(movie_id=movie_id, user_id=rng.choice(user_ids), comment='benchmark', rating=rating)
+
+    def vote(rng):
+        petition_id = rng.choice(petition_ids)
+        try:
+            with transaction.atomic():
+                # The post_save signal counts the vote on the petition, as in the view
+                PetitionVote.objects.create(petition_id=petition_id, user_id=rng.choice(user_ids), is_yes=True)
+        except IntegrityError:
+            pass  # already voted: a normal outcome of the view too
+
+    def borrow(rng):
+        checkout(User(pk=rng.choice(user_ids)), {str(rng.choice(movie_ids)): '1'})
+
+    return {'read': read, 'session': session, 'review': review, 'vote': vote, 'checkout': borrow}
+
+
+def run_worker(profile, database, threads, duration, seed):
+    configure(profile, database)
+
+    from django.core.management import call_command
+    from django.core.signals import request_finished, request_started
+    from django.db import OperationalError, close_old_connections, connection
+
+    from django.contrib.auth.models import User
+
+    from benchmarks import datagen
+    from movies.models import Movie
+    from petitions.models import Petition
+    from profiling.recorder import percentile
+    from sqlitetuning.pragmas import current_pragmas
+
+    call_command('migrate', verbosity=0)
+    datagen.generate(
+        datagen.DatasetSize(movies=500, translations=500, branches=10, users=300, reviews=1000, petitions=50, votes=0),
+        seed=seed,
+    )
+    context = {
+        'movie_ids': list(Movie.objects.values_list('id', flat=True)),
+        'user_ids': list(User.objects.values_list('id', flat=True)),
+        'petition_ids': list(Petition.objects.values_list('id', flat=True)),
+    }
+    pragmas = current_pragmas(connection, ('journal_mode', 'synchronous', 'busy_timeout'))
+    connection.close()
+
+    operations = make_operations(context)
+    timings = {name: [] for name in OPERATIONS}
+    errors = {name: 0 for name in OPERATIONS}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        local_timings = {name: [] for name in OPERATIONS}
+        local_errors = {name: 0 for name in OPERATIONS}
+        while time.monotonic() < deadline:
+            name = rng.choices(OPERATIONS, WEIGHTS)[0]
+            # What the handler does around every request: honours CONN_MAX_AGE
+            request_started.send(sender=None)
+            start = time.perf_counter()
+            try:
+                operations[name](rng)
+                local_timings[name].append((time.perf_counter() - start) * 1000)
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                local_errors[name] += 1
+            finally:
+                request_finished.send(sender=None)
+        close_old_connections()
+        connection.close()
+        with lock:
+            for name in OPERATIONS:
+                timings[name] += local_timings[name]
+                errors[name] += local_errors[name]
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    everything = [t for name in OPERATIONS for t in timings[name]]
+    return {
+        'profile': profile,
+        'pragmas': pragmas,
+        'threads': threads,
+        'seconds': round(elapsed, 2),
+        'ops': len(everything),
+        'ops_per_s': round(len(everything) / elapsed, 1),
+        'p50_ms': round(percentile(everything, 50), 2) if everything else None,
+        'p95_ms': round(percentile(everything, 95), 2) if everything else None,
+        'p99_ms': round(percentile(everything, 99), 2) if everything else None,
+        'locked_errors': sum(errors.values()),
+        'operations': {
+            name: {
+                'ops': len(timings[name]),
+                'p95_ms': round(percentile(timings[name], 95), 2) if timings[name] else None,
+                'locked_errors': errors[name],
+            }
+            for name in OPERATIONS
+        },
+    }
+
+
+def format_table(results):
+    header = f'{"profile":<12} {"ops/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"locked":>8}  journal/sync/busy'
+    lines = [header, '-' * len(header)]
+    for row in results:
+        pragmas = row['pragmas']
+        lines.append(
+            f"{row['profile']:<12} {row['ops_per_s']:>8.1f} {row['p50_ms'] or 0:>8.2f} {row['p95_ms'] or 0:>8.2f} "
+            f"{row['p99_ms'] or 0:>8.2f} {row['locked_errors']:>8}  "
+            f"{pragmas['journal_mode']}/{pragmas['synchronous']}/{pragmas['busy_timeout']}"
+        )
+        for name, op in row['operations'].items():
+            lines.append(f"  {name:<10} {op['ops']:>8} ops  p95 {op['p95_ms'] or 0:>8.2f} ms  locked {op['locked_errors']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.database, args.threads, args.duration, args.seed)))
+        return 0
+
+    results = []
+    for profile in args.profile or PROFILES:
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, 'contention.sqlite3')
+            print(f'Running {profile} profile ({args.threads} threads, {args.duration:g}s)...', file=sys.stderr)
+            completed = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.contention', '--worker', profile, '--database', database,
+                 '--threads', str(args.threads), '--duration', str(args.duration), '--seed', str(args.seed)],
+                check=True, capture_output=True, text=True, cwd=Path(__file__).resolve().parent.parent,
+            )
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    print(format_table(results))
+    if len(results) == 2 and results[0]['ops_per_s']:
+        print(f"\nproduction vs default throughput: x{results[1]['ops_per_s'] / results[0]['ops_per_s']:.2f}")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
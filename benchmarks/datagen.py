@@ -0,0 +1,153 @@
+"""Seeded synthetic catalogue for the benchmarks.
+
+`generate(...)` fills an empty database with books, translations across every
+LANGUAGES entry, branches, stock, users, reviews, petitions and votes. The
+same seed always produces the same data, so runs are comparable. Rows are
+written with bulk_create, then the derived data the app normally maintains
+(search index, availability and rating counters, vote counts) is rebuilt.
+"""
+import random
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from movies import inventory, ratings, search
+from movies.models import LibraryBranch, Movie, MovieTranslation, Review, Stock
+from petitions.models import Petition, PetitionVote
+
+WORDS = (
+    'river', 'shadow', 'empire', 'garden', 'winter', 'letters', 'machine', 'ocean', 'silent', 'city',
+    'crown', 'forest', 'glass', 'harbor', 'island', 'journey', 'lantern', 'memory', 'north', 'orchard',
+    'paper', 'queen', 'signal', 'thunder', 'valley', 'wolf', 'atlas', 'bridge', 'copper', 'desert',
+)
+GENRES = ('Fiction', 'Mystery', 'Science Fiction', 'History', 'Biography', 'Poetry', 'Fantasy', 'Science')
+BATCH_SIZE = 1000
+
+
+@dataclass
+class DatasetSize:
+    movies: int = 1000
+    translations: int = 3000
+    branches: int = 25
+    users: int = 200
+    reviews: int = 5000
+    petitions: int = 100
+    votes: int = 2000
+
+    def as_dict(self):
+        return asdict(self)
+
+
+def _title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+
+
+def generate(size=None, seed=1):
+    """Populate the database. Returns a dict of the row counts written."""
+    size = size or DatasetSize()
+    rng = random.Random(seed)
+    languages = [code for code, _ in settings.LANGUAGES if code != 'en']
+
+    Movie.objects.bulk_create(
+        [
+            Movie(
+                name=_title(rng),
+                author=f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}',
+                genre=rng.choice(GENRES),
+                description=' '.join(rng.choice(WORDS) for _ in range(40)),
+                publication_year=rng.randint(1850, 2025),
+            )
+            for _ in range(size.movies)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    movie_ids = list(Movie.objects.order_by('id').values_list('id', flat=True))
+
+    # Distinct (movie, language) pairs, spread over every non-English language
+    pairs = rng.sample(range(len(movie_ids) * len(languages)), min(size.translations, len(movie_ids) * len(languages)))
+    MovieTranslation.objects.bulk_create(
+        [
+            MovieTranslation(
+                movie_id=movie_ids[pair // len(languages)],
+                language_code=languages[pair % len(languages)],
+                name=f'{languages[pair % len(languages)]}:{_title(rng)}',
+                description=' '.join(rng.choice(WORDS) for _ in range(40)),
+            )
+            for pair in pairs
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    branches = []
+    for i in range(size.branches):
+        branch = LibraryBranch(
+            name=f'Branch {i}',
+            address=f'{rng.randint(1, 999)} {rng.choice(WORDS).title()} St',
+            latitude=round(33.75 + rng.uniform(-0.5, 0.5), 6),
+            longitude=round(-84.39 + rng.uniform(-0.5, 0.5), 6),
+        )
+        branch.geohash = branch.compute_geohash()
+        branches.append(branch)
+    LibraryBranch.objects.bulk_create(branches)
+    branch_ids = list(LibraryBranch.objects.values_list('id', flat=True))
+
+    Stock.objects.bulk_create(
+        [
+            Stock(movie_id=movie_id, branch_id=branch_id, count=rng.randint(0, 5))
+            for movie_id in movie_ids
+            for branch_id in rng.sample(branch_ids, min(3, len(branch_ids)))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    User.objects.bulk_create(
+        [User(username=f'bench{i}', password='!') for i in range(size.users)],
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.filter(username__startswith='bench').values_list('id', flat=True))
+
+    # Skew reviews towards the first books, as popular titles collect most of them
+    Review.objects.bulk_create(
+        [
+            Review(
+                movie_id=movie_ids[min(int(rng.paretovariate(1.2)) - 1, len(movie_ids) - 1)],
+                user_id=rng.choice(user_ids),
+                comment=' '.join(rng.choice(WORDS) for _ in range(12)),
+                rating=rng.randint(1, 5),
+            )
+            for _ in range(size.reviews)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    Petition.objects.bulk_create(
+        [
+            Petition(title=f'Add {_title(rng)}', movie_title=_title(rng), created_by_id=rng.choice(user_ids))
+            for _ in range(size.petitions)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    petition_ids = list(Petition.objects.values_list('id', flat=True))
+    vote_pairs = rng.sample(range(len(petition_ids) * len(user_ids)), min(size.votes, len(petition_ids) * len(user_ids)))
+    PetitionVote.objects.bulk_create(
+        [
+            PetitionVote(petition_id=petition_ids[pair // len(user_ids)], user_id=user_ids[pair % len(user_ids)], is_yes=rng.random() < 0.8)
+            for pair in vote_pairs
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    inventory.recompute_availability()
+    ratings.recompute_ratings()
+    Petition.objects.all().reconcile_yes_votes()
+    search.rebuild_index()
+    return {
+        'movies': len(movie_ids),
+        'translations': len(pairs),
+        'branches': len(branch_ids),
+        'users': len(user_ids),
+        'reviews': size.reviews,
+        'petitions': len(petition_ids),
+        'votes': len(vote_pairs),
+    }
@@ -0,0 +1,163 @@
+"""Benchmark scenarios, measurement and baseline comparison.
+
+Each scenario is one hot endpoint driven through the Django test client
+against a throwaway database filled by datagen. For every scenario the run
+reports throughput, p50/p95/p99 latency and queries per request. The
+anonymous page cache is off unless a scenario asks for it, so the catalogue
+and book scenarios measure the query paths and not cache hits; the
+"cached" scenarios measure the hits. Results can
+be saved as a baseline (JSON) and later runs compared against it: a scenario
+regresses when its p95 grows by more than the tolerance (and by more than a
+small absolute floor, to ignore timer noise) or when it runs more queries.
+"""
+import json
+import platform
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import django
+from django.core.cache import cache
+from django.test import Client
+from django.test.utils import override_settings
+
+from cart.storage import save_user_cart
+from movies import pagecache
+from profiling.recorder import QueryRecorder, percentile
+
+# A p95 increase smaller than this is treated as noise, whatever the percentage
+NOISE_FLOOR_MS = 2.0
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: Callable[[int], str]
+    method: str = 'get'
+    data: Optional[Callable[[int], dict]] = None
+    login: bool = False
+    before: Optional[Callable[[Client, int], None]] = None
+    content_type: Optional[str] = None
+    page_cache: bool = False
+    tags: tuple = field(default_factory=tuple)
+
+
+def build_scenarios(context):
+    """Scenarios over the generated data. `context` holds ids picked from it."""
+    movies = context['movie_ids']
+    popular = context['popular_movie_id']
+
+    def pick(i):
+        return movies[i % len(movies)]
+
+    def fill_cart(client, i):
+        save_user_cart(client.session['_auth_user_id'], {str(pick(i)): '1'})
+
+    scenarios = [
+        Scenario('movies.index', lambda i: '/en/movies/'),
+        Scenario('movies.index search', lambda i: f"/en/movies/?search={context['search_terms'][i % len(context['search_terms'])]}"),
+        Scenario('movies.index sorted by rating', lambda i: '/en/movies/?sort=rating&available=1'),
+    ]
+    for language in ('en', 'es', 'ja', 'hi'):
+        scenarios.append(Scenario(f'movies.show {language}', lambda i, language=language: f'/{language}/movies/{pick(i)}/'))
+    scenarios += [
+        Scenario('movies.show popular', lambda i: f'/en/movies/{popular}/'),
+        Scenario('movies.index cached', lambda i: '/en/movies/', page_cache=True),
+        Scenario('movies.show popular cached', lambda i: f'/en/movies/{popular}/', page_cache=True),
+        Scenario('movies.movie_branches', lambda i: f'/en/movies/{pick(i)}/branches/'),
+        Scenario('movies.movie_branches nearest', lambda i: f'/en/movies/{pick(i)}/branches/?lat=33.75&lon=-84.39&radius=40'),
+        Scenario(
+            'translations.translate',
+            lambda i: '/en/translations/translate/',
+            method='post',
+            # half the texts repeat, so the run mixes cache hits and upstream calls
+            data=lambda i: json.dumps({'text': f'benchmark text {i // 2}', 'source_language': 'en', 'target_language': 'es'}),
+            content_type='application/json',
+        ),
+        Scenario('cart.purchase', lambda i: '/en/cart/purchase/', login=True, before=fill_cart),
+        Scenario('petitions:index', lambda i: '/en/petitions/', login=True),
+    ]
+    return scenarios
+
+
+def run_scenario(scenario, user, iterations, warmup):
+    with override_settings(PAGE_CACHE={**pagecache.get_config(), 'ENABLED': scenario.page_cache}):
+        return _run_scenario(scenario, user, iterations, warmup)
+
+
+def _run_scenario(scenario, user, iterations, warmup):
+    client = Client()
+    if scenario.login:
+        client.force_login(user)
+    cache.clear()
+
+    timings = []
+    queries = []
+    statuses = set()
+    total = 0.0
+    for i in range(warmup + iterations):
+        if scenario.before:
+            scenario.before(client, i)
+        kwargs = {}
+        if scenario.data:
+            kwargs['data'] = scenario.data(i)
+        if scenario.content_type:
+            kwargs['content_type'] = scenario.content_type
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = getattr(client, scenario.method)(scenario.path(i), **kwargs)
+        elapsed = time.perf_counter() - start
+        if i < warmup:
+            continue
+        total += elapsed
+        timings.append(elapsed * 1000)
+        queries.append(recorder.count)
+        statuses.add(response.status_code)
+
+    return {
+        'requests': iterations,
+        'rps': round(iterations / total, 1) if total else None,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries_mean': round(sum(queries) / len(queries), 2),
+        'queries_max': max(queries),
+        'statuses': sorted(statuses),
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return [(scenario, message), ...] for every regression against the baseline."""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        limit = base['p95_ms'] * (1 + tolerance)
+        if current['p95_ms'] > limit and current['p95_ms'] - base['p95_ms'] > NOISE_FLOOR_MS:
+            regressions.append((name, f"p95 {current['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms"))
+        if current['queries_max'] > base['queries_max']:
+            regressions.append((name, f"{current['queries_max']} queries vs baseline {base['queries_max']}"))
+    return regressions
+
+
+def format_table(results, baseline=None):
+    header = f'{"scenario":<32} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8} {"vs base p95":>12}'
+    lines = [header, '-' * len(header)]
+    for name, row in results['scenarios'].items():
+        base = (baseline or {}).get('scenarios', {}).get(name)
+        delta = f"{(row['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%" if base and base['p95_ms'] else ''
+        lines.append(
+            f"{name[:32]:<32} {row['rps'] or 0:>8.1f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} "
+            f"{row['queries_mean']:>8.1f} {delta:>12}"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from movies.models import Movie, MovieTranslation, Review
+from petitions.models import Petition
+
+from . import datagen, runner
+
+TINY = datagen.DatasetSize(movies=20, translations=40, branches=3, users=10, reviews=50, petitions=5, votes=20)
+
+
+class DatagenTests(TestCase):
+    def test_generates_requested_rows_reproducibly(self):
+        counts = datagen.generate(TINY, seed=7)
+        self.assertEqual(counts['movies'], 20)
+        self.assertEqual(MovieTranslation.objects.count(), 40)
+        self.assertEqual(MovieTranslation.objects.values('language_code').distinct().count(), 7)
+        self.assertEqual(sum(Movie.objects.values_list('rating_count', flat=True)), Review.objects.count())
+        self.assertEqual(sum(Petition.objects.values_list('yes_votes', flat=True)), Petition.objects.filter(votes__is_yes=True).count())
+        first = list(Movie.objects.order_by('id').values_list('name', flat=True))
+
+        Movie.objects.all().delete()
+        Petition.objects.all().delete()
+        User.objects.all().delete()
+        datagen.generate(TINY, seed=7)
+        self.assertEqual(list(Movie.objects.order_by('id').values_list('name', flat=True)), first)
+
+
+class RunnerTests(TestCase):
+    def test_scenarios_run_and_compare(self):
+        datagen.generate(TINY, seed=1)
+        context = {
+            'movie_ids': list(Movie.objects.values_list('id', flat=True)),
+            'popular_movie_id': Movie.objects.first().id,
+            'search_terms': ['river'],
+        }
+        user = User.objects.create_user(username='bench-runner')
+        scenarios = {s.name: s for s in runner.build_scenarios(context)}
+        result = runner.run_scenario(scenarios['movies.show es'], user, iterations=5, warmup=1)
+        self.assertEqual(result['statuses'], [200])
+        self.assertEqual(result['requests'], 5)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+        results = {'scenarios': {'movies.show es': result}}
+        slower = {'scenarios': {'movies.show es': dict(result, p95_ms=result['p95_ms'] / 10 - 5, queries_max=result['queries_max'] - 1)}}
+        self.assertEqual(runner.compare(results, results, tolerance=0.25), [])
+        self.assertEqual(len(runner.compare(results, slower, tolerance=0.25)), 2 if result['p95_ms'] > runner.NOISE_FLOOR_MS else 1)
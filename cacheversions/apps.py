@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class CacheVersionsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'cacheversions'
+
+    def ready(self):
+        from django.core import checks
+
+        from .checks import check_generation_cache
+
+        checks.register(check_generation_cache, checks.Tags.caches)
@@ -0,0 +1,36 @@
+"""System checks for the cache behind the generation counters.
+
+A generation bump must be seen by every worker process, or the other
+workers keep serving the pages, fragments and API data they cached under
+the old generations (see generations.py). Django's default LocMemCache
+lives inside one process, so outside DEBUG (where runserver is a single
+process) the CACHE_VERSIONS alias has to be a shared cache.
+"""
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .generations import get_config
+
+
+def is_process_local(alias):
+    """Whether the cache `alias` lives inside one process (not shared by the workers)."""
+    return isinstance(caches[alias], LocMemCache)
+
+
+def check_generation_cache(app_configs=None, **kwargs):
+    alias = get_config()['CACHE_ALIAS']
+    if settings.DEBUG or not is_process_local(alias):
+        return []
+    return [
+        checks.Error(
+            f"The '{alias}' cache holding the generation counters is local to each process.",
+            hint=(
+                'A change seen by one worker would never invalidate the pages other workers cached. '
+                "Point CACHE_VERSIONS['CACHE_ALIAS'] at a cache every worker shares "
+                '(FileBasedCache on one host, Redis or Memcached), or disable PAGE_CACHE.'
+            ),
+            id='cacheversions.E001',
+        )
+    ]
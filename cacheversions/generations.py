@@ -0,0 +1,164 @@
+"""Generation counters for versioned cache keys, shared by every app.
+
+Cached data is never invalidated by deleting keys or by guessing a TTL.
+Each model and each tracked object has a generation counter in the cache.
+Cache keys are built from the current generations of the data they depend
+on, and a change bumps those counters. Entries stored under the old
+generations become unreachable and age out of the cache on their own.
+
+Every model has two kinds of generation name:
+
+- model_generation(Movie): 'movies.movie'. Bumped by any change to any
+  row. Use it for lists, counts and other data built from many rows.
+- object_generations(Movie, pk): ('movies.movie:*', 'movies.movie:<pk>').
+  Use it for data about one row. The '*' part is bumped by bulk changes
+  whose rows are not known.
+
+Declare the models to follow with `track()`, usually from an app's signals
+module. Tracking connects post_save, post_delete and m2m_changed. It can
+also name foreign keys whose targets are stale when the tracked row
+changes, so that a Review counts as a change to its Movie:
+
+    generations.track(Review, parents=('movie',))
+
+Writes that skip signals (QuerySet.update, bulk_create, raw SQL) report
+themselves with `changed(Model, pks)`, or go through `update(queryset, ...)`.
+
+Inside transaction.atomic() every bump happens twice: at once, and again
+on commit (see `bump`). Data cached by a concurrent request before the
+commit is then never served afterwards.
+
+Views and templates build keys with `make_key(prefix, names, *parts)`, or
+read a version string with `version(*names)` (the {% generation %} tag).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'generation',
+}
+
+ALL = '*'
+
+# model label -> parent foreign key names, for every tracked model
+_tracked = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CACHE_VERSIONS', {})}
+
+
+def _cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def _key(name):
+    return f"{get_config()['KEY_PREFIX']}:{name}"
+
+
+def model_generation(model):
+    return model._meta.label_lower
+
+
+def object_generations(model, pk):
+    label = model_generation(model)
+    return (f'{label}:{ALL}', f'{label}:{pk}')
+
+
+def get(*names):
+    """Current value of each named generation, creating missing counters."""
+    cache = _cache()
+    keys = [_key(name) for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # Seeded from the clock, so a counter lost to eviction can never
+            # restart at a value that old entries were stored under
+            cache.add(key, time.time_ns(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def version(*names):
+    """The generations of `names` as one string, for use in a cache key."""
+    return '.'.join(str(value) for value in get(*names))
+
+
+def make_key(prefix, names, *parts):
+    """A cache key for data depending on the generations `names` and varying on `parts`."""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest() if parts else '-'
+    return f'{prefix}:{version(*names)}:{digest}'
+
+
+def _bump(names):
+    cache = _cache()
+    for name in names:
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            cache.set(_key(name), time.time_ns(), None)
+
+
+def bump(*names):
+    """
+    Move `names` to new generations, now and again when the transaction commits.
+
+    The immediate bump lets the writing request see its own change. Until
+    the commit, other requests still read the old rows, and they may cache
+    them under the new generations. The bump on commit makes those entries
+    unreachable.
+    """
+    _bump(names)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(names))
+
+
+def changed(model, pks=None):
+    """Rows of `model` changed: the given `pks`, or any rows when None."""
+    label = model_generation(model)
+    if pks is None:
+        bump(label, f'{label}:{ALL}')
+        return
+    bump(label, *[f'{label}:{pk}' for pk in pks])
+
+
+def update(queryset, pks=None, **fields):
+    """QuerySet.update() that bumps the generations of the rows it changed (all rows when `pks` is None)."""
+    rows = queryset.update(**fields)
+    if rows:
+        changed(queryset.model, pks)
+    return rows
+
+
+def _instance_changed(sender, instance, **kwargs):
+    changed(sender, [instance.pk])
+    for field_name in _tracked[model_generation(sender)]:
+        field = sender._meta.get_field(field_name)
+        parent_pk = getattr(instance, field.attname)
+        if parent_pk is not None:
+            changed(field.related_model, [parent_pk])
+
+
+def _m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    changed(type(instance), [instance.pk])
+    # pk_set is None after a clear(): any row on the other side may be affected
+    changed(model, pk_set)
+
+
+def track(model, parents=()):
+    """Bump `model`'s generations on save/delete and m2m changes, and its `parents`' too."""
+    label = model_generation(model)
+    _tracked[label] = tuple(parents)
+    uid = f'cacheversions:{label}'
+    post_save.connect(_instance_changed, sender=model, dispatch_uid=uid)
+    post_delete.connect(_instance_changed, sender=model, dispatch_uid=uid)
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(_m2m_changed, sender=field.remote_field.through, dispatch_uid=f'{uid}:{field.name}')
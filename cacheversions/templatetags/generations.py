@@ -0,0 +1,24 @@
+from django import template
+from django.db.models import Model
+
+from cacheversions import generations
+
+register = template.Library()
+
+
+@register.simple_tag
+def generation(*dependencies):
+    """
+    Version string for a {% cache %} fragment built from `dependencies`:
+    model instances (their object generations) or generation names.
+
+        {% generation template_data.movie as movie_version %}
+        {% cache 3600 movie_info template_data.movie.id movie_version %}
+    """
+    names = []
+    for dependency in dependencies:
+        if isinstance(dependency, Model):
+            names.extend(generations.object_generations(type(dependency), dependency.pk))
+        else:
+            names.append(str(dependency))
+    return generations.version(*names)
@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from movies.models import LibraryBranch, Movie, Review, Stock
+from petitions.leaderboard import leaderboard_page
+from petitions.models import Petition, PetitionVote
+
+from . import checks, generations
+
+
+class GenerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.movie = Movie.objects.create(name='Dune', description='desc')
+        cls.other = Movie.objects.create(name='Emma', description='desc')
+
+    def setUp(self):
+        cache.clear()
+
+    def movie_version(self, movie):
+        return generations.version(*generations.object_generations(Movie, movie.pk))
+
+    def test_save_bumps_model_and_object_generations(self):
+        model_version = generations.version(generations.model_generation(Movie))
+        mine, theirs = self.movie_version(self.movie), self.movie_version(self.other)
+        self.movie.save()
+        self.assertNotEqual(generations.version(generations.model_generation(Movie)), model_version)
+        self.assertNotEqual(self.movie_version(self.movie), mine)
+        self.assertEqual(self.movie_version(self.other), theirs)
+
+    def test_child_changes_bump_the_parent(self):
+        before = self.movie_version(self.movie)
+        review = Review.objects.create(movie=self.movie, user=self.user, comment='Good', rating=4)
+        after_create = self.movie_version(self.movie)
+        self.assertNotEqual(after_create, before)
+        review.delete()
+        self.assertNotEqual(self.movie_version(self.movie), after_create)
+
+    def test_writes_in_a_transaction_bump_again_on_commit(self):
+        names = generations.object_generations(Movie, self.movie.pk)
+        before = self.movie_version(self.movie)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                self.movie.name = 'Dune Messiah'
+                self.movie.save()
+                during = self.movie_version(self.movie)
+                # A concurrent request, still reading the old row, caches it under the new generation
+                stale_key = generations.make_key('page', names)
+                cache.set(stale_key, 'Dune')
+        self.assertTrue(callbacks)
+        self.assertNotEqual(during, before)
+        self.assertNotEqual(self.movie_version(self.movie), during)
+        self.assertNotEqual(generations.make_key('page', names), stale_key)
+
+    def test_bulk_changes(self):
+        mine, theirs = self.movie_version(self.movie), self.movie_version(self.other)
+        generations.update(Movie.objects.filter(pk=self.movie.pk), pks=[self.movie.pk], genre='Fiction')
+        self.assertNotEqual(self.movie_version(self.movie), mine)
+        self.assertEqual(self.movie_version(self.other), theirs)
+        generations.update(Movie.objects.all(), genre='Classics')
+        self.assertNotEqual(self.movie_version(self.other), theirs)
+
+    def test_evicted_counter_does_not_reuse_old_values(self):
+        name = generations.model_generation(LibraryBranch)
+        old = generations.get(name)[0]
+        cache.delete(f'generation:{name}')
+        self.assertGreater(generations.get(name)[0], old)
+
+    def test_make_key_varies_on_generations_and_parts(self):
+        names = [generations.model_generation(LibraryBranch)]
+        key = generations.make_key('branches', names, 'a')
+        self.assertEqual(generations.make_key('branches', names, 'a'), key)
+        self.assertNotEqual(generations.make_key('branches', names, 'b'), key)
+        branch = LibraryBranch.objects.create(name='Main')
+        self.assertNotEqual(generations.make_key('branches', names, 'a'), key)
+        before = generations.make_key('branches', names, 'a')
+        Stock.objects.create(movie=self.movie, branch=branch, count=1)
+        self.assertNotEqual(generations.make_key('branches', names, 'a'), before)
+
+    def test_generation_template_tag(self):
+        template = Template('{% load generations %}{% generation movie as v %}{{ v }}')
+        rendered = template.render(Context({'movie': self.movie}))
+        self.assertEqual(rendered, self.movie_version(self.movie))
+
+    def test_leaderboard_sees_new_votes_at_once(self):
+        petition = Petition.objects.create(title='Add Dune', movie_title='Dune', created_by=self.user)
+        self.assertEqual(leaderboard_page('total')['results'], [])
+        PetitionVote.objects.create(petition=petition, user=self.user, is_yes=True)
+        Petition.objects.all().reconcile_yes_votes()
+        self.assertEqual([r['yes_votes'] for r in leaderboard_page('total')['results']], [1])
+
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class GenerationCacheCheckTests(SimpleTestCase):
+    def test_configured_cache_is_shared(self):
+        self.assertFalse(checks.is_process_local('default'))
+        self.assertEqual(checks.check_generation_cache(), [])
+
+    def test_suite_runs_outside_the_development_caches(self):
+        for alias in ('default', 'carts'):
+            self.assertNotIn(str(settings.BASE_DIR / 'var'), caches[alias]._dir)
+
+    @override_settings(CACHES=LOCMEM, DEBUG=False)
+    def test_process_local_cache_is_refused(self):
+        self.assertEqual([error.id for error in checks.check_generation_cache()], ['cacheversions.E001'])
+
+    @override_settings(CACHES=LOCMEM, DEBUG=True)
+    def test_process_local_cache_is_fine_for_the_development_server(self):
+        self.assertEqual(checks.check_generation_cache(), [])
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CartConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cart'
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in
+
+        from .storage import merge_on_login
+
+        user_logged_in.connect(merge_on_login, dispatch_uid='cart.merge_on_login')
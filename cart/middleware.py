@@ -0,0 +1,25 @@
+from .storage import RequestCart, get_config
+
+
+class CartMiddleware:
+    """Attach a lazily loaded `request.cart` and persist it after the view if it changed.
+
+    Must come after AuthenticationMiddleware: the backend is chosen by whether
+    request.user is logged in.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.cart = RequestCart(request)
+        response = self.get_response(request)
+
+        cart = request.cart
+        if cart.modified:
+            cart.save(response)
+        cookie_name = get_config()['COOKIE_NAME']
+        if request.user.is_authenticated and cookie_name in request.COOKIES:
+            # Merged into the user's cart at login; the cookie is stale from here on
+            response.delete_cookie(cookie_name, samesite='Lax')
+        return response
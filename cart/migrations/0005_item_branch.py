@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_item_returned'),
+        ('movies', '0008_movie_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='branch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='movies.librarybranch'),
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from movies.models import Movie
+from movies.models import Movie, LibraryBranch
 
 class Order(models.Model):
     id = models.AutoField(primary_key=True)
@@ -17,7 +17,25 @@ class Item(models.Model):
     quantity = models.IntegerField()
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    # branch the copies were taken from at checkout, so returns restock the same branch
+    branch = models.ForeignKey(LibraryBranch, on_delete=models.SET_NULL, blank=True, null=True)
     returned = models.BooleanField(default=False)
 
     def __str__(self):
-        return str(self.id) + ' - ' + self.movie.name
\ No newline at end of file
+        return str(self.id) + ' - ' + self.movie.name
+
+class Cart(models.Model):
+    """
+    The cart as submitted at checkout. Carts live in a cookie or the cache
+    while shopping (see cart/storage.py); this is the only point they reach
+    the database, in the same transaction as the Order they produced.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # None when nothing in the cart could be fulfilled
+    order = models.OneToOneField(Order, on_delete=models.SET_NULL, blank=True, null=True)
+    # {movie_id: quantity} as requested, including titles left unfulfilled
+    items = models.JSONField(default=dict)
+    checked_out_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.id) + ' - ' + self.user.username
@@ -0,0 +1,233 @@
+"""Where a shopper's cart lives between requests.
+
+The cart is a small {movie_id: quantity} dict. Keeping it in the database
+session meant a session read and write against SQLite for every add, view
+and clear, so it is kept out of the database altogether until checkout:
+
+- anonymous shoppers: a signed cookie (tamper-proof, no server state at all)
+- logged-in shoppers: the cache, keyed by user id, so the cart follows them
+  across browsers. The cache must be shared by every worker and must not
+  evict carts (settings.CACHES['carts'] is a file cache of its own). When
+  the configured alias is local to one process, logged-in carts fall back
+  to the session, which is as durable as before.
+
+`CartMiddleware` puts a lazy `request.cart` on every request and saves it
+through the request's backend only when it was changed. On login the cookie
+cart is merged into the user's cached cart (see `merge_on_login`) and the
+cookie is dropped. The database is written only at checkout, where the
+submitted cart is kept as a `cart.models.Cart` next to its Order.
+
+Backends are pluggable through settings.CART (see DEFAULTS).
+"""
+import json
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from cacheversions.checks import is_process_local
+
+from .utils import MAX_QUANTITY, parse_quantity
+
+DEFAULTS = {
+    'ANONYMOUS_BACKEND': 'cart.storage.CookieCartBackend',
+    'AUTHENTICATED_BACKEND': 'cart.storage.CacheCartBackend',
+    'COOKIE_NAME': 'cart',
+    'COOKIE_AGE': 60 * 60 * 24 * 14,
+    'CACHE_ALIAS': 'carts',
+    'CACHE_TIMEOUT': 60 * 60 * 24 * 30,
+    # Keeps the signed cookie well under the 4 KB browsers accept
+    'MAX_ITEMS': 50,
+}
+
+COOKIE_SALT = 'cart.storage'
+SESSION_KEY = 'cart'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CART', {})}
+
+
+def clean(items):
+    """Normalize to {str(movie_id): str(quantity)}, dropping keys that are not ids."""
+    return {str(movie_id): str(quantity) for movie_id, quantity in items.items() if str(movie_id).isdigit()}
+
+
+class CookieCartBackend:
+    """Anonymous carts, in a signed cookie. Nothing is stored server side."""
+
+    def __init__(self, request):
+        self.request = request
+        self.config = get_config()
+
+    def load(self):
+        value = self.request.get_signed_cookie(
+            self.config['COOKIE_NAME'], default=None, salt=COOKIE_SALT, max_age=self.config['COOKIE_AGE']
+        )
+        if not value:
+            return {}
+        try:
+            items = json.loads(value)
+        except ValueError:
+            return {}
+        return clean(items) if isinstance(items, dict) else {}
+
+    def save(self, items, response):
+        if items:
+            response.set_signed_cookie(
+                self.config['COOKIE_NAME'], json.dumps(items, separators=(',', ':')), salt=COOKIE_SALT,
+                max_age=self.config['COOKIE_AGE'], httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(self.config['COOKIE_NAME'], samesite='Lax')
+
+
+class CacheCartBackend:
+    """Logged-in carts, in the cache under the user's id."""
+
+    def __init__(self, request):
+        self.user_id = request.user.pk
+        self.config = get_config()
+
+    def load(self):
+        return load_user_cart(self.user_id)
+
+    def save(self, items, response):
+        save_user_cart(self.user_id, items)
+
+
+class SessionCartBackend:
+    """Logged-in carts, in the session: the fallback when the cart cache is local to one process."""
+
+    def __init__(self, request):
+        self.session = request.session
+
+    def load(self):
+        items = self.session.get(SESSION_KEY)
+        return clean(items) if isinstance(items, dict) else {}
+
+    def save(self, items, response):
+        if items:
+            self.session[SESSION_KEY] = items
+        else:
+            self.session.pop(SESSION_KEY, None)
+
+
+def authenticated_backend(request):
+    """The configured backend for logged-in carts, or the session if its cache is not shared."""
+    backend = import_string(get_config()['AUTHENTICATED_BACKEND'])
+    if issubclass(backend, CacheCartBackend) and is_process_local(get_config()['CACHE_ALIAS']):
+        return SessionCartBackend(request)
+    return backend(request)
+
+
+def _cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def user_cart_key(user_id):
+    return f'cart:user:{user_id}'
+
+
+def load_user_cart(user_id):
+    return _cache().get(user_cart_key(user_id)) or {}
+
+
+def save_user_cart(user_id, items):
+    if items:
+        _cache().set(user_cart_key(user_id), items, get_config()['CACHE_TIMEOUT'])
+    else:
+        _cache().delete(user_cart_key(user_id))
+
+
+@contextmanager
+def user_cart_lock(user_id):
+    """
+    Serialize read-modify-write of one user's cart across every worker, so
+    two logins in parallel (two tabs, two devices) cannot both merge into
+    the same starting cart and lose items. The lock is the user's row:
+    SELECT ... FOR UPDATE where the database supports it. On SQLite the
+    IMMEDIATE transaction mode (settings.DATABASES) takes the database
+    write lock when the transaction begins.
+    """
+    with transaction.atomic():
+        list(get_user_model().objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+        yield
+
+
+def merge(into, other, max_items=None):
+    """Add `other`'s quantities to `into`, each capped at MAX_QUANTITY."""
+    merged = dict(into)
+    for movie_id, quantity in other.items():
+        quantity = parse_quantity(quantity)
+        if quantity is None:
+            continue
+        total = (parse_quantity(merged.get(movie_id)) or 0) + quantity
+        merged[movie_id] = str(min(total, MAX_QUANTITY))
+    if max_items is not None and len(merged) > max_items:
+        merged = dict(list(merged.items())[:max_items])
+    return merged
+
+
+def merge_on_login(sender, request, user, **kwargs):
+    """user_logged_in receiver: fold the anonymous cookie cart into the user's cart."""
+    if request is None:
+        return
+    anonymous = CookieCartBackend(request).load()
+    if anonymous:
+        backend = authenticated_backend(request)
+        with user_cart_lock(user.pk):
+            backend.save(merge(backend.load(), anonymous, get_config()['MAX_ITEMS']), None)
+    # Drop the now-stale cart loaded for the anonymous request; the middleware
+    # clears the cookie on the way out
+    request.cart = RequestCart(request)
+
+
+class RequestCart:
+    """The cart for one request. Loaded on first use, saved by CartMiddleware if changed."""
+
+    def __init__(self, request):
+        self.request = request
+        self.modified = False
+        self._items = None
+
+    @property
+    def backend(self):
+        if self.request.user.is_authenticated:
+            return authenticated_backend(self.request)
+        return import_string(get_config()['ANONYMOUS_BACKEND'])(self.request)
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = self.backend.load()
+        return self._items
+
+    def __len__(self):
+        return len(self.items)
+
+    def ids(self):
+        return list(self.items.keys())
+
+    def set(self, movie_id, quantity):
+        items = dict(self.items)
+        items[str(movie_id)] = str(quantity)
+        if len(items) > get_config()['MAX_ITEMS']:
+            return False
+        self._items = items
+        self.modified = True
+        return True
+
+    def replace(self, items):
+        self._items = dict(items)
+        self.modified = True
+
+    def clear(self):
+        self.replace({})
+
+    def save(self, response):
+        self.backend.save(self.items, response)
@@ -1,3 +1,146 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from movies.models import Movie, LibraryBranch, Stock
+from .models import Cart, Order, Item
+from .storage import SESSION_KEY, load_user_cart, merge, save_user_cart
+from .utils import checkout
+
+
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='pw')
+        cls.other = User.objects.create_user(username='other', password='pw')
+        cls.main = LibraryBranch.objects.create(name='Main')
+        cls.east = LibraryBranch.objects.create(name='East')
+        cls.book = Movie.objects.create(name='Calculus', description='desc')
+        cls.rare = Movie.objects.create(name='Rare Book', description='desc')
+        Stock.objects.create(movie=cls.book, branch=cls.main, count=2)
+        Stock.objects.create(movie=cls.book, branch=cls.east, count=1)
+        Stock.objects.create(movie=cls.rare, branch=cls.main, count=1)
+
+    def stock(self, movie, branch):
+        return Stock.objects.get(movie=movie, branch=branch).count
+
+    def test_checkout_takes_stock_across_branches(self):
+        with self.assertNumQueries(12):
+            order, fulfilled, unfulfilled = checkout(self.user, {str(self.book.id): '3'})
+        self.assertEqual(unfulfilled, [])
+        self.assertEqual(order.total_items, 3)
+        self.assertEqual(
+            sorted(Item.objects.filter(order=order).values_list('branch__name', 'quantity')),
+            [('East', 1), ('Main', 2)]
+        )
+        self.assertEqual((self.stock(self.book, self.main), self.stock(self.book, self.east)), (0, 0))
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.available_copies, self.book.total_copies, self.book.available), (0, 3, False))
+
+    def test_unfulfillable_title_is_reported_and_not_taken(self):
+        order, fulfilled, unfulfilled = checkout(self.user, {str(self.book.id): '4', str(self.rare.id): '1'})
+        self.assertEqual(unfulfilled, [('Calculus', 'Not enough copies available.')])
+        self.assertEqual(fulfilled, [str(self.rare.id)])
+        self.assertEqual(list(Item.objects.filter(order=order).values_list('movie__name', flat=True)), ['Rare Book'])
+        self.assertEqual((self.stock(self.book, self.main), self.stock(self.book, self.east)), (2, 1))
+
+    def test_last_copy_goes_to_one_checkout_only(self):
+        first, _, _ = checkout(self.user, {str(self.rare.id): '1'})
+        second, _, unfulfilled = checkout(self.other, {str(self.rare.id): '1'})
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(unfulfilled, [('Rare Book', 'Not enough copies available.')])
+        self.assertEqual(self.stock(self.rare, self.main), 0)
+
+    def test_invalid_quantities_are_rejected(self):
+        order, _, unfulfilled = checkout(self.user, {str(self.book.id): '0', str(self.rare.id): 'x'})
+        self.assertIsNone(order)
+        self.assertEqual(len(unfulfilled), 2)
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_purchase_view_keeps_unfulfilled_titles_in_cart(self):
+        self.client.force_login(self.user)
+        save_user_cart(self.user.pk, {str(self.book.id): '4', str(self.rare.id): '1'})
+        response = self.client.get('/en/cart/purchase/')
+        self.assertContains(response, 'Not enough copies available.')
+        self.assertEqual(load_user_cart(self.user.pk), {str(self.book.id): '4'})
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(cart.items, {str(self.book.id): '4', str(self.rare.id): '1'})
+        self.assertEqual(cart.order.total_items, 1)
+
+
+class CartStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='shopper', password='pw')
+        cls.book = Movie.objects.create(name='Calculus', description='desc')
+        cls.other = Movie.objects.create(name='Algebra', description='desc')
+
+    def setUp(self):
+        # The suite's own cache directory, never var/ (see moviesstore/test_runner.py)
+        cache.clear()
+        caches['carts'].clear()
+
+    def add(self, movie, quantity):
+        return self.client.post(f'/en/cart/{movie.id}/add/', {'quantity': quantity})
+
+    def test_anonymous_cart_lives_in_a_signed_cookie(self):
+        with self.assertNumQueries(1):  # the book lookup only
+            self.add(self.book, '2')
+        self.assertIn('cart', self.client.cookies)
+        self.assertEqual(Session.objects.count(), 0)
+
+        response = self.client.get('/en/cart/')
+        self.assertEqual(response.context['template_data']['cart_total'], 2)
+
+        # A cookie edited by hand fails the signature check and reads as empty
+        self.client.cookies['cart'] = '{"%d":"9"}' % self.other.id
+        response = self.client.get('/en/cart/')
+        self.assertEqual(response.context['template_data']['cart_total'], 0)
+
+    def test_logged_in_cart_lives_in_the_cache(self):
+        self.client.force_login(self.user)
+        self.add(self.book, '3')
+        self.assertEqual(load_user_cart(self.user.pk), {str(self.book.id): '3'})
+        self.assertNotIn('cart', self.client.cookies)
+        self.client.get('/en/cart/clear/')
+        self.assertEqual(load_user_cart(self.user.pk), {})
+
+    def test_login_merges_the_anonymous_cart(self):
+        save_user_cart(self.user.pk, {str(self.book.id): '1'})
+        self.add(self.book, '2')
+        self.add(self.other, '1')
+        response = self.client.post('/en/accounts/login/', {'username': 'shopper', 'password': 'pw'})
+        self.assertEqual(load_user_cart(self.user.pk), {str(self.book.id): '3', str(self.other.id): '1'})
+        self.assertEqual(response.cookies['cart'].value, '')
+
+    def test_merge_caps_quantities_and_skips_invalid_ones(self):
+        merged = merge({'1': '8', '2': '1'}, {'1': '5', '3': 'x', '4': '2'})
+        self.assertEqual(merged, {'1': '10', '2': '1', '4': '2'})
+
+    def test_bad_quantities_are_rejected(self):
+        for quantity in ('x', '0', '-1', '11', '99999999999999999999', '2.5'):
+            self.assertEqual(self.add(self.book, quantity).status_code, 400)
+        self.assertEqual(self.client.post(f'/en/cart/{self.book.id}/add/').status_code, 400)
+        self.assertNotIn('cart', self.client.cookies)
+
+    @override_settings(CART={'MAX_ITEMS': 1})
+    def test_full_cart_is_reported(self):
+        self.add(self.book, '1')
+        response = self.client.post(f'/en/cart/{self.other.id}/add/', {'quantity': '1'}, follow=True)
+        self.assertContains(response, 'Your cart is full')
+        self.assertEqual(response.context['template_data']['cart'], {str(self.book.id): '1'})
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'carts': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    })
+    def test_logged_in_cart_falls_back_to_the_session_without_a_shared_cache(self):
+        self.add(self.book, '2')
+        self.client.post('/en/accounts/login/', {'username': 'shopper', 'password': 'pw'})
+        self.add(self.other, '1')
+        self.assertEqual(load_user_cart(self.user.pk), {})
+        self.assertEqual(self.client.session[SESSION_KEY], {str(self.book.id): '2', str(self.other.id): '1'})
+        response = self.client.get('/en/cart/')
+        self.assertEqual(response.context['template_data']['cart_total'], 3)
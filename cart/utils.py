@@ -1,7 +1,99 @@
+from django.db import transaction
+from django.db.models import F
+
+from movies import inventory
+from movies.models import Movie, Stock
+
+# Most copies of one title a single checkout may take (matches the quantity input's max)
+MAX_QUANTITY = 10
+
+
 def calculate_total_items(cart, movies_in_cart):
     """Return total number of items in the cart (sum of quantities)."""
     total = 0
     for movie in movies_in_cart:
         quantity = cart[str(movie.id)]
         total += int(quantity)
-    return total
\ No newline at end of file
+    return total
+
+
+def parse_quantity(value):
+    """Return the cart quantity as an int in 1..MAX_QUANTITY, or None if it is invalid."""
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if 1 <= quantity <= MAX_QUANTITY else None
+
+
+def reserve_copies(movie, quantity):
+    """
+    Take `quantity` copies of `movie` from branch stock, largest stock first.
+    Each decrement is a conditional UPDATE (count >= taken), so two checkouts
+    can never take the same copy. Returns [(branch_id, taken), ...], or None
+    (with nothing taken, via a savepoint rollback) if there are not enough copies.
+    """
+    allocations = []
+    remaining = quantity
+    with transaction.atomic():
+        stocks = Stock.objects.filter(movie=movie, count__gt=0).order_by('-count', 'id').values_list('id', 'branch_id', 'count')
+        for stock_id, branch_id, count in stocks:
+            take = min(count, remaining)
+            if Stock.objects.filter(id=stock_id, count__gte=take).update(count=F('count') - take):
+                allocations.append((branch_id, take))
+                remaining -= take
+            if remaining == 0:
+                return allocations
+        # Not enough copies: undo this title's decrements
+        transaction.set_rollback(True)
+    return None
+
+
+def checkout(user, cart):
+    """
+    Turn a cart ({movie_id: quantity}) into an Order in one transaction.
+
+    Stock is decremented per branch (and the movie's availability counters
+    with it) and one Item is created per (title, branch)
+    with a single bulk insert. Titles that cannot be fulfilled are left out of
+    the order. The submitted cart is kept as a Cart row alongside the Order.
+    Returns (order or None, fulfilled_ids, unfulfilled) where unfulfilled is
+    a list of (title, reason).
+    """
+    from .models import Cart, Order, Item
+
+    movies = {str(m.id): m for m in Movie.objects.filter(id__in=list(cart.keys()))}
+    items = []
+    fulfilled_ids = []
+    unfulfilled = []
+
+    with transaction.atomic():
+        for movie_id, value in cart.items():
+            movie = movies.get(str(movie_id))
+            if movie is None:
+                unfulfilled.append((f'#{movie_id}', 'This book is no longer in the catalogue.'))
+                continue
+            quantity = parse_quantity(value)
+            if quantity is None:
+                unfulfilled.append((movie.name, f'Quantity must be between 1 and {MAX_QUANTITY}.'))
+                continue
+            allocations = reserve_copies(movie, quantity)
+            if allocations is None:
+                unfulfilled.append((movie.name, 'Not enough copies available.'))
+                continue
+            inventory.take_copies(movie.id, quantity)
+            fulfilled_ids.append(str(movie_id))
+            for branch_id, taken in allocations:
+                items.append(Item(movie=movie, branch_id=branch_id, quantity=taken))
+
+        if not items:
+            Cart.objects.create(user=user, items=dict(cart))
+            return None, fulfilled_ids, unfulfilled
+
+        order = Order.objects.create(user=user, total_items=sum(item.quantity for item in items))
+        for item in items:
+            item.order = order
+        Item.objects.bulk_create(items)
+        Cart.objects.create(user=user, order=order, items=dict(cart))
+
+    return order, fulfilled_ids, unfulfilled
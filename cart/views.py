@@ -1,17 +1,17 @@
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404, redirect
+from django.contrib import messages
+from django.http import HttpResponseBadRequest
 from movies.models import Movie
-from .utils import calculate_total_items
-from .models import Order, Item
-from django.db.models import Sum
-from decimal import Decimal
+from .storage import get_config
+from .utils import MAX_QUANTITY, calculate_total_items, checkout, parse_quantity
 from django.contrib.auth.decorators import login_required
 
 
 def index(request):
     cart_total = 0
     movies_in_cart = []
-    cart = request.session.get('cart', {})
+    cart = request.cart.items
     movie_ids = list(cart.keys())
     if (movie_ids != []):
         movies_in_cart = Movie.objects.filter(id__in=movie_ids)
@@ -21,45 +21,37 @@ def index(request):
         'title': 'Borrow Cart',
         'movies_in_cart': movies_in_cart,
         'cart_total': cart_total,
+        'cart': cart,
     }
     return render(request, 'cart/index.html', {'template_data': template_data})
 
 def add(request, id):
     get_object_or_404(Movie, id=id)
-    cart = request.session.get('cart', {})
-    cart[id] = request.POST['quantity']
-    request.session['cart'] = cart
+    quantity = parse_quantity(request.POST.get('quantity'))
+    if quantity is None:
+        return HttpResponseBadRequest(f'Quantity must be a whole number between 1 and {MAX_QUANTITY}.')
+    if not request.cart.set(id, quantity):
+        messages.error(request, f"Your cart is full: it can hold up to {get_config()['MAX_ITEMS']} different titles.")
     return redirect('cart.index')
 
 def clear(request):
-    request.session['cart'] = {}
+    request.cart.clear()
     return redirect('cart.index')
 
 @login_required
 def purchase(request):
-    cart = request.session.get('cart', {})
+    cart = request.cart.items
     movie_ids = list(cart.keys())
 
     if (movie_ids == []):
         return redirect('cart.index')
-    
-    movies_in_cart = Movie.objects.filter(id__in=movie_ids)
-    total_items = calculate_total_items(cart, movies_in_cart)
 
-    order = Order()
-    order.user = request.user
-    order.total_items = total_items
-    order.save()
+    order, fulfilled_ids, unfulfilled = checkout(request.user, cart)
 
-    for movie in movies_in_cart:
-        item = Item()
-        item.movie = movie
-        item.order = order
-        item.quantity = cart[str(movie.id)]
-        item.save()
-
-    request.session['cart'] = {}
+    # Keep titles that could not be fulfilled in the cart so they can be adjusted
+    request.cart.replace({k: v for k, v in cart.items() if str(k) not in fulfilled_ids})
     template_data = {}
     template_data['title'] = 'Purchase confirmation'
-    template_data['order_id'] = order.id
-    return render(request, 'cart/purchase.html', {'template_data': template_data})
\ No newline at end of file
+    template_data['order_id'] = order.id if order else None
+    template_data['unfulfilled'] = unfulfilled
+    return render(request, 'cart/purchase.html', {'template_data': template_data})
@@ -1,5 +1,7 @@
 from django.shortcuts import render
+from movies.pagecache import cache_anonymous_page
 
+@cache_anonymous_page()
 def index(request):
     template_data = {}
     template_data['title'] = 'Yellow Jackets Archives'
@@ -37,7 +37,7 @@ class MovieAdmin(admin.ModelAdmin):
        - Click "+ Add another Movie Translation" to add a new language
     
     3. INVENTORY TRACKING
-       - Mark books as available/checked out
+       - Availability is computed from branch stock (edit copies under Stock)
        - Filter by availability and genre
        - Track publication years
     
@@ -48,9 +48,9 @@ class MovieAdmin(admin.ModelAdmin):
     """
     ordering = ['name']
     search_fields = ['name', 'author', 'genre']
-    list_display = ('id', 'name', 'author', 'publication_year', 'available')
+    list_display = ('id', 'name', 'author', 'publication_year', 'available', 'available_copies', 'total_copies')
     list_filter = ('available', 'publication_year', 'genre')
-    list_editable = ('available',)
+    readonly_fields = ('available', 'available_copies', 'total_copies')
     list_display_links = ('id', 'name')
     inlines = [MovieTranslationInline]
     fieldsets = (
@@ -61,7 +61,8 @@ class MovieAdmin(admin.ModelAdmin):
             'fields': ('description',)
         }),
         ('Availability', {
-            'fields': ('available',)
+            'fields': ('available', 'available_copies', 'total_copies'),
+            'description': 'Computed from branch stock and holds'
         }),
         ('Cover Image', {
             'fields': ('image',)
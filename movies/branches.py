@@ -0,0 +1,129 @@
+"""Cached payloads for the branch and per-book availability JSON endpoints.
+
+The branch directory (every LibraryBranch) is cached under the LibraryBranch
+cache generation, which any branch save or delete bumps (see signals.py).
+Per-book availability is cached under a version made of the book's
+stock_version (bumped on every stock change, see inventory.py), its title and
+the branch directory's version, so a stale entry is never served and the same
+version doubles as the response ETag.
+
+`nearest_branches` answers "closest copy" queries through the geohash index
+(see geo.py).
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from cacheversions import generations
+
+from . import geo
+from .models import LibraryBranch, Movie, Stock
+
+DIRECTORY_CACHE_KEY = 'movies:branches:directory'
+DIRECTORY_CACHE_TIMEOUT = 24 * 60 * 60
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60
+
+# Browser cache lifetimes (Cache-Control max-age, in seconds)
+DIRECTORY_MAX_AGE = 300
+AVAILABILITY_MAX_AGE = 30
+
+
+def _version(*parts):
+    return hashlib.md5(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def _branch_data(branch):
+    return {
+        'id': branch['id'],
+        'name': branch['name'],
+        'address': branch['address'],
+        'latitude': float(branch['latitude']) if branch['latitude'] is not None else None,
+        'longitude': float(branch['longitude']) if branch['longitude'] is not None else None,
+        'phone': branch['phone'],
+    }
+
+
+def branch_directory():
+    """Return {'version': ..., 'branches': [...]} for every branch, from the cache when possible."""
+    key = generations.make_key(DIRECTORY_CACHE_KEY, [generations.model_generation(LibraryBranch)])
+    directory = cache.get(key)
+    if directory is None:
+        rows = LibraryBranch.objects.order_by('id').values('id', 'name', 'address', 'latitude', 'longitude', 'phone')
+        branches = [_branch_data(row) for row in rows]
+        directory = {'version': _version(branches), 'branches': branches}
+        cache.set(key, directory, DIRECTORY_CACHE_TIMEOUT)
+    return directory
+
+
+def movie_availability(movie_id):
+    """Return the availability payload for a book plus its 'version', or None if it does not exist.
+
+    Costs one small query for the version; the stock query only runs on a cache miss.
+    """
+    row = Movie.objects.filter(id=movie_id).values_list('name', 'stock_version').first()
+    if row is None:
+        return None
+    name, stock_version = row
+    directory = branch_directory()
+    version = _version(movie_id, name, stock_version, directory['version'])
+
+    key = f'movies:availability:{movie_id}:{version}'
+    availability = cache.get(key)
+    if availability is None:
+        branches = {branch['id']: branch for branch in directory['branches']}
+        stocks = Stock.objects.filter(movie_id=movie_id, count__gt=0).order_by('branch_id').values_list('branch_id', 'count')
+        availability = {
+            'version': version,
+            'movie_id': movie_id,
+            'movie_name': name,
+            'branches': [
+                {
+                    'branch_id': branch_id,
+                    'branch_name': branches[branch_id]['name'],
+                    'address': branches[branch_id]['address'],
+                    'latitude': branches[branch_id]['latitude'],
+                    'longitude': branches[branch_id]['longitude'],
+                    'phone': branches[branch_id]['phone'],
+                    'count': count,
+                }
+                for branch_id, count in stocks
+                if branch_id in branches
+            ],
+        }
+        cache.set(key, availability, AVAILABILITY_CACHE_TIMEOUT)
+    return availability
+
+
+def nearest_branches(movie_id, latitude, longitude, radius_km, limit):
+    """Branches holding `movie_id` within `radius_km` of a point, nearest first.
+
+    Each result is a movie_availability-style branch dict plus 'distance_km'.
+    """
+    stocks = Stock.objects.filter(movie_id=movie_id, count__gt=0, branch__geohash__gt='')
+    prefixes = geo.covering_prefixes(latitude, longitude, radius_km)
+    if prefixes:
+        # Range comparisons rather than __startswith: SQLite's LIKE cannot use the index
+        cells = Q()
+        for prefix in prefixes:
+            cells |= Q(branch__geohash__gte=prefix, branch__geohash__lt=prefix + '~')
+        stocks = stocks.filter(cells)
+
+    results = []
+    for stock in stocks.select_related('branch'):
+        branch = stock.branch
+        distance = geo.haversine_km(latitude, longitude, branch.latitude, branch.longitude)
+        if distance <= radius_km:
+            results.append({
+                'branch_id': branch.id,
+                'branch_name': branch.name,
+                'address': branch.address,
+                'latitude': float(branch.latitude),
+                'longitude': float(branch.longitude),
+                'phone': branch.phone,
+                'count': stock.count,
+                'distance_km': round(distance, 3),
+            })
+    results.sort(key=lambda result: (result['distance_km'], result['branch_id']))
+    return results[:limit]
@@ -0,0 +1,191 @@
+"""Streaming bulk import/export of the catalogue (books, translations, branches, stock).
+
+Files are CSV (with a header row) or JSONL (one object per line) and are read
+and written lazily, so memory use does not grow with the file. Imports upsert
+BATCH_SIZE rows at a time with bulk_create(update_conflicts=True), one
+transaction per batch:
+
+    books         keyed by id (rows without an id are inserted)
+    translations  keyed by (movie_id, language_code)
+    branches      keyed by id
+    stock         keyed by (movie_id, branch_id)
+
+bulk_create skips save() and signals, so each batch also refreshes what those
+would have maintained: the search index, availability counters, branch
+geohashes and the cache generations of the imported rows.
+"""
+import csv
+import json
+from dataclasses import dataclass
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from cacheversions import generations
+
+from . import inventory, search
+from .models import LibraryBranch, Movie, MovieTranslation, Stock
+
+BATCH_SIZE = 1000
+FORMATS = ('csv', 'jsonl')
+
+
+class CatalogueImportError(Exception):
+    """A row could not be imported; the message says which line and why."""
+
+
+@dataclass(frozen=True)
+class Kind:
+    model: type
+    fields: tuple
+    unique_fields: tuple
+    update_fields: tuple
+
+
+KINDS = {
+    'books': Kind(
+        Movie,
+        fields=('id', 'name', 'author', 'genre', 'description', 'publication_year'),
+        unique_fields=('id',),
+        update_fields=('name', 'author', 'genre', 'description', 'publication_year'),
+    ),
+    'translations': Kind(
+        MovieTranslation,
+        fields=('movie_id', 'language_code', 'name', 'description', 'author', 'genre'),
+        unique_fields=('movie', 'language_code'),
+        update_fields=('name', 'description', 'author', 'genre', 'updated_at'),
+    ),
+    'branches': Kind(
+        LibraryBranch,
+        fields=('id', 'name', 'address', 'latitude', 'longitude', 'phone'),
+        unique_fields=('id',),
+        update_fields=('name', 'address', 'latitude', 'longitude', 'phone', 'geohash'),
+    ),
+    'stock': Kind(
+        Stock,
+        fields=('movie_id', 'branch_id', 'count'),
+        unique_fields=('movie', 'branch'),
+        update_fields=('count',),
+    ),
+}
+
+
+def guess_format(path):
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, {column: value}) from a CSV or JSONL text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise CatalogueImportError(f'line {line_number}: invalid JSON ({e})')
+        if not isinstance(row, dict):
+            raise CatalogueImportError(f'line {line_number}: expected a JSON object')
+        yield line_number, row
+
+
+def write_rows(stream, fmt, fields, rows):
+    """Write dict rows to a text stream as CSV (with header) or JSONL. Returns the row count."""
+    written = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            written += 1
+        return written
+    for row in rows:
+        stream.write(json.dumps(row, default=str, ensure_ascii=False) + '\n')
+        written += 1
+    return written
+
+
+def export_rows(kind_name, batch_size=BATCH_SIZE):
+    """Yield every row of a kind as a dict of its export columns, in primary key order."""
+    kind = KINDS[kind_name]
+    rows = kind.model.objects.order_by('pk').values_list(*kind.fields)
+    for values in rows.iterator(chunk_size=batch_size):
+        yield dict(zip(kind.fields, values))
+
+
+def build_object(kind, line_number, row):
+    """Validate one input row and return an unsaved model instance."""
+    values = {}
+    for name in kind.fields:
+        field = kind.model._meta.get_field(name[:-3] if name.endswith('_id') else name)
+        raw = row.get(name)
+        if raw is None or raw == '':
+            if name == 'id':
+                continue
+            if not field.null and not field.has_default():
+                raise CatalogueImportError(f'line {line_number}: {name} is required')
+            if field.null:
+                values[field.attname] = None
+            continue
+        try:
+            values[field.attname] = field.target_field.to_python(raw) if field.is_relation else field.to_python(raw)
+        except ValidationError as e:
+            raise CatalogueImportError(f'line {line_number}: {name}: {" ".join(e.messages)}')
+    obj = kind.model(**values)
+    if isinstance(obj, LibraryBranch):
+        obj.geohash = obj.compute_geohash()
+    return obj
+
+
+def import_rows(kind_name, rows, batch_size=BATCH_SIZE, progress=None):
+    """Upsert (line_number, row) pairs in batches. Returns the number of rows imported.
+
+    Batches before a failing one stay committed; the failing batch is rolled back.
+    """
+    kind = KINDS[kind_name]
+    imported = 0
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        objs = [build_object(kind, line_number, row) for line_number, row in batch]
+        try:
+            with transaction.atomic():
+                saved = kind.model.objects.bulk_create(
+                    objs,
+                    update_conflicts=True,
+                    unique_fields=kind.unique_fields,
+                    update_fields=kind.update_fields,
+                )
+                _refresh_derived(kind_name, saved)
+        except IntegrityError as e:
+            raise CatalogueImportError(f'lines {batch[0][0]}-{batch[-1][0]}: {e}')
+        imported += len(objs)
+        if progress:
+            progress(f'{kind_name}: {imported} rows imported')
+    if kind_name == 'branches':
+        generations.changed(LibraryBranch)
+    return imported
+
+
+def _refresh_derived(kind_name, objs):
+    if kind_name == 'books':
+        movie_ids = [obj.pk for obj in objs if obj.pk is not None]
+        search.index_movies(movie_ids)
+        generations.changed(Movie, movie_ids)
+    elif kind_name == 'translations':
+        movie_ids = {obj.movie_id for obj in objs}
+        search.index_movies(movie_ids)
+        generations.changed(Movie, movie_ids)
+    elif kind_name == 'stock':
+        inventory.recompute_availability({obj.movie_id for obj in objs})
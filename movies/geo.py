@@ -0,0 +1,82 @@
+"""Geohash spatial index and haversine distances for LibraryBranch coordinates.
+
+Each branch stores the geohash of its coordinates (LibraryBranch.geohash,
+indexed). A search around a point picks the finest geohash precision whose
+cells are at least `radius` across, then reads only the branches in the
+point's cell and its eight neighbours: a handful of index range scans instead
+of a scan over every branch. Candidates are then filtered and sorted by exact
+haversine distance.
+"""
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Return the geohash of a point, `precision` characters long."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # bits alternate between longitude (even) and latitude (odd)
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell with `precision` characters."""
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision // 2
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def covering_prefixes(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells together contain every point within `radius_km`.
+
+    Returns [] when the radius is too large for any prefix to help (search everything).
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    # east-west extent of a degree shrinks towards the poles
+    lon_km = KM_PER_DEGREE * max(math.cos(math.radians(min(abs(latitude) + radius_km / KM_PER_DEGREE, 90))), 0)
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(candidate)
+        if height * KM_PER_DEGREE < radius_km or width * lon_km < radius_km:
+            break
+        precision = candidate
+    if precision == 0:
+        return []
+
+    height, width = cell_size(precision)
+    prefixes = set()
+    for dlat in (-height, 0, height):
+        for dlon in (-width, 0, width):
+            lat = min(max(latitude + dlat, -90.0), 90.0 - 1e-9)
+            lon = (longitude + dlon + 180.0) % 360.0 - 180.0
+            prefixes.add(encode_geohash(lat, lon, precision))
+    return sorted(prefixes)
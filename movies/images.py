@@ -0,0 +1,122 @@
+"""Resized JPEG and WebP derivatives of book cover images.
+
+When a cover is uploaded (see signals.py), or when `generate_cover_derivatives`
+backfills older covers, the image is resized to each of COVER_WIDTHS that is
+not wider than the original, in every COVER_FORMATS format. Derivatives are
+stored under a name built from a hash of the original's bytes:
+
+    covers/<hash[:2]>/<hash>-<width>.<ext>
+
+so a URL never changes meaning and can be cached for a year (see
+views.cover_image). Movie.cover_hash and Movie.cover_width record which
+derivatives exist; the {% cover_img %} tag builds the srcset from them.
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from cacheversions import generations
+
+# Card (200px) and detail (400px) sizes, plus 2x for high-density screens
+COVER_WIDTHS = (200, 400, 800)
+COVER_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+COVER_DIR = 'covers'
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:20]
+
+
+def derivative_name(cover_hash, width, ext):
+    return f'{COVER_DIR}/{cover_hash[:2]}/{cover_hash}-{width}.{ext}'
+
+
+def variant_widths(source_width):
+    """Derivative widths for an original `source_width` pixels wide (never upscaled)."""
+    widths = [width for width in COVER_WIDTHS if width < source_width]
+    if source_width <= COVER_WIDTHS[-1]:
+        widths.append(source_width)
+    return widths
+
+
+def derivative_urls(cover_hash, source_width, ext):
+    """[(width, url), ...] for one format, narrowest first."""
+    return [
+        (width, default_storage.url(derivative_name(cover_hash, width, ext)))
+        for width in variant_widths(source_width)
+    ]
+
+
+def _encode(image, width, pil_format, options):
+    resized = image if image.width <= width else image.resize(
+        (width, max(1, round(image.height * width / image.width))), Image.LANCZOS
+    )
+    if pil_format == 'JPEG' and resized.mode != 'RGB':
+        resized = resized.convert('RGB')
+    out = BytesIO()
+    resized.save(out, pil_format, **options)
+    return out.getvalue()
+
+
+def _record(movie, cover_hash, cover_width, bump):
+    from .models import Movie
+
+    movie.cover_hash, movie.cover_width = cover_hash, cover_width
+    # update() rather than save(): no signals, so this does not re-trigger itself
+    Movie.objects.filter(pk=movie.pk).update(cover_hash=cover_hash, cover_width=cover_width)
+    if bump:
+        # ...and no generation bump either: cached pages still carry the old <img> markup
+        generations.changed(Movie, [movie.pk])
+
+
+def generate_derivatives(movie, force=False, bump=True):
+    """Write any missing derivatives for `movie.image` and record them on the Movie.
+
+    Returns the number of files written. Covers that are missing, that Pillow
+    cannot read or that are too large to decode safely (a decompression bomb)
+    are left without derivatives; the original is then served as before.
+    With `bump=False` the caller bumps the cache generations of the movies
+    whose cover_hash changed itself (once per batch, say).
+    """
+    if not movie.image:
+        if movie.cover_hash:
+            _record(movie, '', None, bump)
+        return 0
+    try:
+        with movie.image.open('rb') as f:
+            data = f.read()
+    except OSError:
+        # the file is missing from storage
+        return 0
+    cover_hash = content_hash(data)
+    if cover_hash == movie.cover_hash and not force:
+        return 0
+
+    try:
+        image = Image.open(BytesIO(data))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        return 0
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    written = 0
+    for width in variant_widths(image.width):
+        for ext, (pil_format, options) in COVER_FORMATS.items():
+            name = derivative_name(cover_hash, width, ext)
+            if default_storage.exists(name):
+                if not force:
+                    continue
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(_encode(image, width, pil_format, options)))
+            written += 1
+
+    _record(movie, cover_hash, image.width, bump)
+    return written
@@ -0,0 +1,61 @@
+"""Denormalized availability counters on Movie, derived from branch Stock.
+
+- available_copies: copies on the shelf, i.e. the sum of Stock.count
+- total_copies: available copies plus copies out on unreturned holds
+- available: available_copies > 0
+
+Checkout and returns move copies with F() updates (`take_copies` /
+`return_copies`) in the same transaction as their Stock updates. Stock edits
+(admin, imports) recompute the affected movies from scratch with
+`recompute_availability`.
+
+Every one of these bumps Movie.stock_version, which versions the cached
+per-movie availability responses (see branches.py), and the movies'
+cache generations, which version the cached catalogue pages.
+"""
+from django.apps import apps
+from django.db.models import BooleanField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from cacheversions import generations
+
+from .models import Movie, Stock
+
+
+def take_copies(movie_id, quantity):
+    """Record `quantity` copies leaving the shelf for a hold."""
+    generations.update(
+        Movie.objects.filter(id=movie_id), pks=[movie_id],
+        # the right-hand side sees the old value, so "old > quantity" means "new > 0"
+        available=ExpressionWrapper(Q(available_copies__gt=quantity), output_field=BooleanField()),
+        available_copies=F('available_copies') - quantity,
+        stock_version=F('stock_version') + 1,
+    )
+
+
+def return_copies(movie_id, quantity):
+    """Record `quantity` copies coming back to the shelf."""
+    if quantity <= 0:
+        return
+    generations.update(
+        Movie.objects.filter(id=movie_id), pks=[movie_id],
+        available=True,
+        available_copies=F('available_copies') + quantity,
+        stock_version=F('stock_version') + 1,
+    )
+
+
+def recompute_availability(movie_ids=None):
+    """Recompute the counters from Stock and unreturned Items for some (or all) movies."""
+    Item = apps.get_model('cart', 'Item')
+    shelved = Stock.objects.filter(movie=OuterRef('pk')).values('movie').annotate(n=Sum('count')).values('n')
+    on_loan = Item.objects.filter(movie=OuterRef('pk'), returned=False).values('movie').annotate(n=Sum('quantity')).values('n')
+
+    movies = Movie.objects.all() if movie_ids is None else Movie.objects.filter(id__in=movie_ids)
+    movies.update(
+        available_copies=Coalesce(Subquery(shelved), 0),
+        total_copies=Coalesce(Subquery(shelved), 0) + Coalesce(Subquery(on_loan), 0),
+        stock_version=F('stock_version') + 1,
+    )
+    movies.update(available=ExpressionWrapper(Q(available_copies__gt=0), output_field=BooleanField()))
+    generations.changed(Movie, movie_ids)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from movies import catalogue_io
+
+
+class Command(BaseCommand):
+    help = 'Stream books, translations, branches or stock to a CSV or JSONL file in the import_catalogue format.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(catalogue_io.KINDS))
+        parser.add_argument('path', nargs='?', default='-', help='File to write, or - (default) for standard output')
+        parser.add_argument('--format', choices=catalogue_io.FORMATS, help='Defaults to the file extension, or jsonl on standard output')
+        parser.add_argument('--batch-size', type=int, default=catalogue_io.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or catalogue_io.guess_format(path) or ('jsonl' if path == '-' else None)
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format csv or --format jsonl.')
+
+        kind = options['kind']
+        rows = catalogue_io.export_rows(kind, batch_size=options['batch_size'])
+        fields = catalogue_io.KINDS[kind].fields
+        if path == '-':
+            catalogue_io.write_rows(self.stdout, fmt, fields, rows)
+            return
+        with open(path, 'w', newline='', encoding='utf-8') as stream:
+            written = catalogue_io.write_rows(stream, fmt, fields, rows)
+        self.stdout.write(self.style.SUCCESS(f'Exported {written} {kind} rows to {path}.'))
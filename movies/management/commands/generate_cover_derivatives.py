@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from cacheversions import generations
+from movies import images
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Create resized JPEG/WebP derivatives for book covers that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives for every cover')
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.exclude(image='').exclude(image=None).only('id', 'image', 'cover_hash', 'cover_width')
+        processed = written = last_id = 0
+        changed = []
+        # keyset batches rather than one open cursor, since each cover updates its row
+        while True:
+            batch = list(movies.filter(id__gt=last_id).order_by('id')[:100])
+            if not batch:
+                break
+            for movie in batch:
+                before = (movie.cover_hash, movie.cover_width)
+                written += images.generate_derivatives(movie, force=options['force'], bump=False)
+                if (movie.cover_hash, movie.cover_width) != before:
+                    changed.append(movie.pk)
+            processed += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'{processed} covers checked, {written} files written')
+        if changed:
+            # One bump for the whole run rather than one per cover
+            generations.changed(Movie, changed)
+        self.stdout.write(self.style.SUCCESS(f'Checked {processed} covers; wrote {written} derivative files.'))
@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies import catalogue_io
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a CSV or JSONL file of books, translations, branches or stock into the catalogue, '
+        'upserting in batches. Import books and branches before the stock and translations that refer to them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(catalogue_io.KINDS))
+        parser.add_argument('path', help='File to read, or - for standard input')
+        parser.add_argument('--format', choices=catalogue_io.FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=catalogue_io.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or catalogue_io.guess_format(path)
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format csv or --format jsonl.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            imported = catalogue_io.import_rows(
+                options['kind'],
+                catalogue_io.read_rows(stream, fmt),
+                batch_size=options['batch_size'],
+                progress=self.stdout.write,
+            )
+        except catalogue_io.CatalogueImportError as e:
+            raise CommandError(f'Import stopped at {e}. Earlier batches were committed.')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} {options["kind"]} rows.'))
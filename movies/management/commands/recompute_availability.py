@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from movies import inventory
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Recompute every book\'s availability counters from branch stock and open holds.'
+
+    def handle(self, *args, **options):
+        inventory.recompute_availability()
+        available = Movie.objects.filter(available=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed availability for {Movie.objects.count()} books ({available} available).'
+        ))
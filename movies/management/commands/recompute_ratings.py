@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from movies import ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the review rating summary of books whose summary has drifted from their reviews.'
+
+    def handle(self, *args, **options):
+        fixed = ratings.reconcile_ratings()
+        if fixed:
+            self.stdout.write(self.style.WARNING(f'Fixed the rating summary on {len(fixed)} book(s): {fixed}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All book rating summaries are correct.'))
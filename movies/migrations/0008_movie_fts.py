@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+CREATE_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS movies_movie_fts USING fts5(
+    name, author, genre, description, translated_names, translated_descriptions,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+POPULATE_FTS = """
+INSERT INTO movies_movie_fts (rowid, name, author, genre, description, translated_names, translated_descriptions)
+SELECT m.id, m.name, COALESCE(m.author, ''), COALESCE(m.genre, ''), m.description,
+       COALESCE((SELECT group_concat(t.name, ' ') FROM movies_movietranslation t WHERE t.movie_id = m.id), ''),
+       COALESCE((SELECT group_concat(t.description, ' ') FROM movies_movietranslation t WHERE t.movie_id = m.id), '')
+FROM movies_movie m
+"""
+
+
+def create_fts_index(apps, schema_editor):
+    """Create and fill the FTS5 table. Skipped on backends (or SQLite builds) without FTS5."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from django.db import OperationalError
+    try:
+        schema_editor.execute(CREATE_FTS)
+    except OperationalError:
+        return
+    schema_editor.execute(POPULATE_FTS)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS movies_movie_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_movietranslation_author_movietranslation_genre'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
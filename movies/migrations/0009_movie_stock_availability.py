@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:02
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_availability(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    Stock = apps.get_model('movies', 'Stock')
+    Item = apps.get_model('cart', 'Item')
+    shelved = Stock.objects.filter(movie=OuterRef('pk')).values('movie').annotate(n=Sum('count')).values('n')
+    on_loan = Item.objects.filter(movie=OuterRef('pk'), returned=False).values('movie').annotate(n=Sum('quantity')).values('n')
+    Movie.objects.update(
+        available_copies=Coalesce(Subquery(shelved), 0),
+        total_copies=Coalesce(Subquery(shelved), 0) + Coalesce(Subquery(on_loan), 0),
+    )
+    Movie.objects.update(available=False)
+    Movie.objects.filter(available_copies__gt=0).update(available=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_movie_fts'),
+        ('cart', '0005_item_branch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='available_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='total_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='movie',
+            name='available',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['available', 'name', 'id'], name='movie_available_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-available_copies', 'id'], name='movie_available_copies_idx'),
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_movie_stock_availability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='stock_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:05
+
+from django.db import migrations, models
+
+from movies.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    LibraryBranch = apps.get_model('movies', 'LibraryBranch')
+    branches = list(LibraryBranch.objects.exclude(latitude=None).exclude(longitude=None))
+    for branch in branches:
+        branch.geohash = encode_geohash(branch.latitude, branch.longitude)
+    LibraryBranch.objects.bulk_update(branches, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_movie_stock_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='librarybranch',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
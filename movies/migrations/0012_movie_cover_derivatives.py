@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_librarybranch_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='cover_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='cover_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:12
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+
+def backfill_rating_summary(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    Review = apps.get_model('movies', 'Review')
+    counted = Review.objects.filter(movie=OuterRef('pk'), rating__in=(1, 2, 3, 4, 5)).values('movie')
+    aggregates = {
+        'rating_count': Count('id'),
+        'rating_sum': Sum('rating'),
+        **{f'rating_{value}': Count('id', filter=Q(rating=value)) for value in (1, 2, 3, 4, 5)},
+    }
+    Movie.objects.update(**{
+        field: Coalesce(Subquery(counted.annotate(n=aggregate).values('n')), 0)
+        for field, aggregate in aggregates.items()
+    })
+    Movie.objects.update(
+        rating_avg=Cast(F('rating_sum'), FloatField()) / Cast(Greatest(F('rating_count'), Value(1)), FloatField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_movie_cover_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-rating_avg', '-rating_count', 'id'], name='movie_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_summary, migrations.RunPython.noop),
+    ]
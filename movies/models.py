@@ -1,13 +1,30 @@
 from django.db import models
+from django.db.models import Prefetch
 from django.conf import settings
 
 
+def translation_attr(language_code):
+    """Name of the instance attribute holding the prefetched translation for a language."""
+    return '_translation_' + language_code.replace('-', '_')
+
+
+class MovieQuerySet(models.QuerySet):
+    def with_translation(self, language_code):
+        """Prefetch the translation for one language in a single query for the whole queryset."""
+        return self.prefetch_related(Prefetch(
+            'translations',
+            queryset=MovieTranslation.objects.filter(language_code=language_code),
+            to_attr=translation_attr(language_code),
+        ))
+
+
 class Movie(models.Model):
     """Represents a book in the library domain.
 
     The model name `Movie` is retained to avoid renaming the existing DB table.
     Fields describe book attributes: title (name), author, genre, summary (description),
-    publication_year and availability.
+    publication_year and availability. Availability is derived from branch Stock
+    and kept up to date by movies.inventory.
     """
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
@@ -16,38 +33,109 @@ class Movie(models.Model):
     description = models.TextField()
     publication_year = models.IntegerField(blank=True, null=True)
     image = models.ImageField(upload_to='movie_images/', blank=True, null=True)
-    available = models.BooleanField(default=True)
+    # content hash and pixel width of the cover the resized derivatives were made from (see movies.images)
+    cover_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    cover_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    available = models.BooleanField(default=False, editable=False)
+    available_copies = models.PositiveIntegerField(default=0, editable=False)
+    total_copies = models.PositiveIntegerField(default=0, editable=False)
+    # bumped on every stock change; the version behind the availability endpoint's ETag
+    stock_version = models.PositiveIntegerField(default=0, editable=False)
+    # review rating summary, maintained by movies.ratings
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = MovieQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # catalogue filtered to available books, in name order
+            models.Index(fields=['available', 'name', 'id'], name='movie_available_name_idx'),
+            # catalogue sorted by availability
+            models.Index(fields=['-available_copies', 'id'], name='movie_available_copies_idx'),
+            # catalogue sorted by rating
+            models.Index(fields=['-rating_avg', '-rating_count', 'id'], name='movie_rating_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            # The raw column value: no FieldFile is built for every row of a listing
+            instance._loaded_image = values[field_names.index('image')] or ''
+        return instance
+
+    def remember_image(self):
+        """Note the current cover, so a later save can tell whether it changed."""
+        if 'image' not in self.get_deferred_fields():
+            self._loaded_image = self.image.name or ''
+
+    def image_changed(self):
+        """Whether `image` differs from the cover loaded from (or last saved to) the database."""
+        if 'image' in self.get_deferred_fields():
+            return False  # never loaded, so never assigned
+        return getattr(self, '_loaded_image', None) != (self.image.name or '')
+
+    def rating_histogram(self):
+        """[(stars, count, percent of ratings), ...] from 5 stars down to 1."""
+        return [
+            (stars, count, round(100 * count / self.rating_count) if self.rating_count else 0)
+            for stars, count in ((s, getattr(self, f'rating_{s}')) for s in (5, 4, 3, 2, 1))
+        ]
 
     def __str__(self):
         return f"{self.id} - {self.name}"
 
+    def get_translation(self, language_code):
+        """Return the MovieTranslation for a language, or None if there isn't one.
+
+        Uses the row prefetched by `Movie.objects.with_translation()` when present,
+        otherwise runs a single query and remembers the result on the instance.
+        """
+        attr = translation_attr(language_code)
+        if not hasattr(self, attr):
+            setattr(self, attr, list(self.translations.filter(language_code=language_code)[:1]))
+        prefetched = getattr(self, attr)
+        return prefetched[0] if prefetched else None
+
+    def get_translated_fields(self, language_code):
+        """Get name, description, author and genre for a language, falling back to English per field."""
+        translation = self.get_translation(language_code)
+        if translation is None:
+            return {
+                'name': self.name,
+                'description': self.description,
+                'author': self.author,
+                'genre': self.genre,
+            }
+        return {
+            'name': translation.name or self.name,
+            'description': translation.description or self.description,
+            'author': translation.author or self.author,
+            'genre': translation.genre or self.genre,
+        }
+
     def get_translated_name(self, language_code):
         """Get the translated name for a given language, or fallback to English."""
-        translation = self.translations.filter(language_code=language_code).first()
-        if translation:
-            return translation.name
-        return self.name
+        return self.get_translated_fields(language_code)['name']
 
     def get_translated_description(self, language_code):
         """Get the translated description for a given language, or fallback to English."""
-        translation = self.translations.filter(language_code=language_code).first()
-        if translation:
-            return translation.description
-        return self.description
+        return self.get_translated_fields(language_code)['description']
 
     def get_translated_author(self, language_code):
         """Get the translated author for a given language, or fallback to English."""
-        translation = self.translations.filter(language_code=language_code).first()
-        if translation and translation.author:
-            return translation.author
-        return self.author
+        return self.get_translated_fields(language_code)['author']
 
     def get_translated_genre(self, language_code):
         """Get the translated genre for a given language, or fallback to English."""
-        translation = self.translations.filter(language_code=language_code).first()
-        if translation and translation.genre:
-            return translation.genre
-        return self.genre
+        return self.get_translated_fields(language_code)['genre']
 
 
 class MovieTranslation(models.Model):
@@ -113,6 +201,18 @@ class LibraryBranch(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     phone = models.CharField(max_length=50, blank=True, null=True)
+    # geohash of (latitude, longitude) for nearest-branch lookups (see movies.geo)
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False, db_index=True)
+
+    def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash()
+        super().save(*args, **kwargs)
+
+    def compute_geohash(self):
+        from .geo import encode_geohash
+        if self.latitude is None or self.longitude is None:
+            return ''
+        return encode_geohash(self.latitude, self.longitude)
 
     def __str__(self):
         return f"{self.name} ({self.id})"
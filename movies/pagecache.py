@@ -0,0 +1,109 @@
+"""Full-page caching for anonymous visitors on the catalogue pages.
+
+Anonymous GETs of the pages decorated with `cache_anonymous_page` are
+served whole from the cache. Keys are versioned by the generations of the
+data the page shows (see cacheversions/generations.py), so a change to a
+book, its translations, reviews or stock makes the affected pages
+unreachable at once, with no TTL guess:
+
+- listing pages depend on the Movie model generation, which any book,
+  translation, review or stock change bumps (see signals.py)
+- a book page depends on that book's object generations
+
+Keys also carry the view, the path (which includes the i18n_patterns
+language prefix), the active language and the query parameters the view
+reads. The CSRF token is the one per-visitor part of those pages. It is
+cached as a placeholder and filled in with the visitor's own token on the
+way out.
+
+Logged-in users get fragment caching instead, through the {% cache %} tag
+and the {% generation %} version of the same dependencies (see
+movies/show.html).
+
+The cache must be shared by every worker process, as the generation
+counters are; cacheversions/checks.py refuses a per-process cache outside
+DEBUG. Configured by settings.PAGE_CACHE (see DEFAULTS).
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import translation
+
+from cacheversions import generations
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    # Upper bound on how long an unreachable entry may occupy the cache, not a freshness guess
+    'TIMEOUT': 24 * 60 * 60,
+}
+
+CSRF_PLACEHOLDER = '__page_cache_csrf_token__'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+def _cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def page_key(request, view_name, names, params):
+    query = tuple((param, request.GET.get(param, '')) for param in params)
+    return generations.make_key(
+        f'pagecache:page:{view_name}:{translation.get_language()}', names, request.path_info, query
+    )
+
+
+def csrf_placeholder(request):
+    """Context processor: while a page is rendered for the page cache, emit a placeholder CSRF token."""
+    if getattr(request, '_page_cache_render', False):
+        return {'csrf_token': CSRF_PLACEHOLDER}
+    return {}
+
+
+def _fill_csrf(request, content):
+    placeholder = CSRF_PLACEHOLDER.encode()
+    if placeholder in content:
+        content = content.replace(placeholder, get_token(request).encode())
+    return content
+
+
+def cache_anonymous_page(depends_on=lambda request, **kwargs: (), params=()):
+    """
+    Serve anonymous GETs of the view from the page cache.
+
+    `depends_on(request, **view_kwargs)` returns the generation names the page
+    is built from (see cacheversions.generations). `params` lists the query parameters that change its content.
+    Any other parameter shares the cached page.
+    """
+    def decorator(view):
+        view_name = f'{view.__module__}.{view.__name__}'
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not get_config()['ENABLED'] or request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            cache = _cache()
+            key = page_key(request, view_name, depends_on(request, **kwargs), params)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(_fill_csrf(request, content), content_type=content_type)
+
+            request._page_cache_render = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request._page_cache_render = False
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, (response.content, response['Content-Type']), get_config()['TIMEOUT'])
+            response.content = _fill_csrf(request, response.content)
+            return response
+        return wrapped
+    return decorator
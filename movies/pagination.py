@@ -0,0 +1,96 @@
+"""Keyset (cursor) pagination helpers.
+
+A page is fetched with a WHERE clause on the ordering columns of the last row
+already seen, so page N costs the same as page 1. Cursors are the ordering
+values of that last row, encoded as URL-safe base64 JSON. Decoded values are
+coerced by the ordering fields, so a tampered cursor is an InvalidCursor
+rather than a broken query.
+"""
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering, fields=None):
+    """Decode a cursor produced by `encode_cursor` for the given ordering.
+
+    With `fields` (the model or annotation field of each ordering column),
+    every value is converted and validated by its field's to_python().
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Malformed cursor')
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor('Cursor does not match this listing')
+    if fields is not None:
+        try:
+            values = [_coerce(field, value) for field, value in zip(fields, values)]
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor('Cursor does not match this listing')
+    return values
+
+
+def _coerce(field, value):
+    if value is None:
+        raise ValueError('Keyset columns are never null')
+    value = field.to_python(value)
+    field.run_validators(value)
+    return value
+
+
+def ordering_fields(queryset, ordering):
+    """The field behind each column of `ordering`: a model field or an annotation's output field."""
+    fields = []
+    for column in ordering:
+        name = column.lstrip('-')
+        if name in queryset.query.annotations:
+            fields.append(queryset.query.annotations[name].output_field)
+        else:
+            fields.append(queryset.model._meta.get_field(name))
+    return fields
+
+
+def _after(ordering, values):
+    """Build the Q that selects rows strictly after `values` in `ordering`."""
+    clauses = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        equal = {f.lstrip('-'): v for f, v in zip(ordering[:i], values[:i])}
+        clauses.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+    return reduce(or_, clauses)
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=20):
+    """Return `(rows, next_cursor)` for one page of `queryset` ordered by `ordering`.
+
+    `ordering` must end in a unique column (usually 'id') so the order is total.
+    `next_cursor` is None on the last page.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(
+            _after(ordering, decode_cursor(cursor, ordering, ordering_fields(queryset, ordering)))
+        )
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, field.lstrip('-')) for field in ordering)
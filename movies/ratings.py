@@ -0,0 +1,93 @@
+"""Denormalized review rating summary on Movie.
+
+- rating_count / rating_sum: number and total of 1-5 star ratings
+- rating_avg: rating_sum / rating_count (0 without ratings), indexed for sorting
+- rating_1 ... rating_5: histogram
+
+The Review signals (see signals.py) apply each create, edit and delete with
+one F() update (`record_rating_change`) in the same transaction as the Review
+write, whatever made it: the review views, the admin, a User or Movie cascade.
+`reconcile_ratings` (and `manage.py recompute_ratings`) rebuilds the summary
+from the Review table where it has drifted, e.g. after raw SQL or bulk_create.
+Both bump the movies' cache generations once the summary is written.
+"""
+from django.db.models import Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from cacheversions import generations
+
+from .models import Movie, Review
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+
+def _counted(rating):
+    return rating in RATING_VALUES
+
+
+def record_rating_change(movie_id, old_rating=None, new_rating=None):
+    """Move the summary from `old_rating` to `new_rating` (None for a created/deleted review)."""
+    removed = old_rating if _counted(old_rating) else None
+    added = new_rating if _counted(new_rating) else None
+    if removed == added:
+        return
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = (added or 0) - (removed or 0)
+
+    updates = {}
+    if removed is not None:
+        updates[f'rating_{removed}'] = F(f'rating_{removed}') - 1
+    if added is not None:
+        updates[f'rating_{added}'] = F(f'rating_{added}') + 1
+    new_count = F('rating_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    generations.update(
+        Movie.objects.filter(id=movie_id), pks=[movie_id],
+        rating_count=new_count,
+        rating_sum=new_sum,
+        # the right-hand side sees the old row, so this is the new average
+        rating_avg=_average(new_sum, new_count),
+        **updates,
+    )
+
+
+def _average(total, count):
+    # Greatest(count, 1) keeps a book without ratings at 0 / 1 = 0
+    return Cast(total, FloatField()) / Cast(Greatest(count, Value(1)), FloatField())
+
+
+def _counted_summary():
+    """{summary field: subquery counting it from the movie's Review rows}"""
+    counted = Review.objects.filter(movie=OuterRef('pk'), rating__in=RATING_VALUES).values('movie')
+    aggregates = {
+        'rating_count': Count('id'),
+        'rating_sum': Sum('rating'),
+        **{f'rating_{value}': Count('id', filter=Q(rating=value)) for value in RATING_VALUES},
+    }
+    return {
+        field: Coalesce(Subquery(counted.annotate(n=aggregate).values('n')), 0)
+        for field, aggregate in aggregates.items()
+    }
+
+
+def recompute_ratings(movie_ids=None):
+    """Rebuild the rating summary from Review rows for some (or all) movies."""
+    movies = Movie.objects.all() if movie_ids is None else Movie.objects.filter(id__in=movie_ids)
+    movies.update(**_counted_summary())
+    movies.update(rating_avg=_average(F('rating_sum'), F('rating_count')))
+    generations.changed(Movie, movie_ids)
+
+
+def reconcile_ratings():
+    """Rebuild the summary of the movies whose counters have drifted from their reviews. Returns their ids."""
+    summary = _counted_summary()
+    drift = Q()
+    for field in summary:
+        drift |= ~Q(**{field: F(f'counted_{field}')})
+    drifted = list(
+        Movie.objects.annotate(**{f'counted_{field}': counted for field, counted in summary.items()})
+        .filter(drift).order_by('id').values_list('id', flat=True)
+    )
+    if drifted:
+        recompute_ratings(drifted)
+    return drifted
@@ -0,0 +1,208 @@
+"""Full-text search over the book catalogue.
+
+On SQLite the catalogue is indexed in an FTS5 virtual table (`movies_movie_fts`)
+whose rowid is the Movie id. Each row holds the English fields plus every
+translated name and description, and results are ranked with BM25. Other
+database backends fall back to the original `icontains` filtering.
+
+Ranked results are paginated on the FTS side by `ranked_page`: one MATCH
+query ranks the candidates with BM25 and returns the page after the cursor's
+(rank, rowid), so every hit stays reachable and each page costs one ranked
+FTS query plus a primary-key lookup of its books.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .pagination import decode_cursor, encode_cursor
+
+FTS_TABLE = 'movies_movie_fts'
+
+# Relative BM25 weights for: name, author, genre, description,
+# translated_names, translated_descriptions
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 8.0, 1.0)
+
+_fts_ready = False
+
+
+def fts_enabled():
+    """Return True when the FTS5 index table exists on the default database."""
+    global _fts_ready
+    if _fts_ready:
+        return True
+    if connection.vendor != 'sqlite':
+        return False
+    _fts_ready = FTS_TABLE in connection.introspection.table_names()
+    return _fts_ready
+
+
+def build_match_query(term):
+    """Turn free text into an FTS5 query where every word is a prefix match."""
+    tokens = re.findall(r'\w+', term)
+    return ' AND '.join(f'"{token}"*' for token in tokens)
+
+
+def _bm25():
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    return f'bm25({FTS_TABLE}, {weights})'
+
+
+def search_movie_ids(term, limit=None):
+    """Return ids of movies matching `term`, most relevant first (all of them unless `limit` is given)."""
+    match = build_match_query(term)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY {_bm25()} LIMIT %s',
+            [match, -1 if limit is None else limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _matching_ids(match):
+    return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+
+
+# Keyset ordering of ranked results: BM25 score (lower is better), then id
+RANKED_ORDERING = ('search_rank', 'id')
+
+
+def result_ordering():
+    """Ordering for search results: relevance when FTS is available, otherwise by name."""
+    return RANKED_ORDERING if fts_enabled() else ('name', 'id')
+
+
+def search_movies(term, language_code):
+    """Return a Movie queryset matching `term`.
+
+    Page it with `ranked_page` for relevance order (when `result_ordering()` is
+    RANKED_ORDERING), or with keyset_page for any other ordering.
+    """
+    from .models import Movie
+
+    if not fts_enabled():
+        return Movie.objects.filter(
+            Q(name__icontains=term) |
+            Q(author__icontains=term) |
+            Q(genre__icontains=term) |
+            Q(translations__language_code=language_code, translations__name__icontains=term)
+        ).distinct()
+
+    match = build_match_query(term)
+    if not match:
+        return Movie.objects.none()
+    return Movie.objects.filter(id__in=_matching_ids(match))
+
+
+def ranked_page(queryset, term, cursor=None, limit=20):
+    """keyset_page for relevance order: `(movies, next_cursor)` for one page of `queryset`.
+
+    The books of `queryset` (any filters applied) are ranked by one MATCH query,
+    which also applies the (rank, rowid) keyset and the limit. Each movie gets its
+    score as `search_rank`. Raises InvalidCursor for a bad cursor.
+    """
+    from .models import Movie
+
+    match = build_match_query(term)
+    after = None
+    if cursor:
+        after = decode_cursor(cursor, RANKED_ORDERING, [FloatField(), Movie._meta.get_field('id')])
+    if not match:
+        return [], None
+
+    candidates, params = queryset.order_by().values('id').query.sql_with_params()
+    # "+rowid" keeps SQLite from driving the FTS scan by the candidate list, which
+    # would run the MATCH once per candidate instead of once per page
+    sql = (
+        f'SELECT rowid, rank FROM ('
+        f'SELECT rowid, {_bm25()} AS rank FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND +rowid IN ({candidates}))'
+    )
+    params = [match, *params]
+    if after:
+        sql += ' WHERE rank > %s OR (rank = %s AND rowid > %s)'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, [*params, limit + 1])
+        ranked = db_cursor.fetchall()
+
+    page = ranked[:limit]
+    movies = queryset.in_bulk([movie_id for movie_id, _ in page])
+    rows = []
+    for movie_id, rank in page:
+        movie = movies.get(movie_id)
+        if movie is not None:  # unless deleted between the two queries
+            movie.search_rank = rank
+            rows.append(movie)
+    next_cursor = encode_cursor(page[-1][::-1]) if len(ranked) > limit else None
+    return rows, next_cursor
+
+
+def index_movie(movie_id):
+    """(Re)write the index row for one movie, or drop it if the movie is gone."""
+    index_movies([movie_id])
+
+
+def index_movies(movie_ids):
+    """(Re)write the index rows for several movies at once, dropping rows of movies that are gone."""
+    if not fts_enabled():
+        return
+    from .models import Movie
+
+    movie_ids = list(movie_ids)
+    movies = Movie.objects.filter(id__in=movie_ids).prefetch_related('translations')
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[movie_id] for movie_id in movie_ids])
+        rows = [_index_row(movie) for movie in movies]
+        if rows:
+            _insert_rows(cursor, rows)
+
+
+def rebuild_index(batch_size=500):
+    """Rebuild the whole index from Movie and MovieTranslation. Returns the number of rows written."""
+    if not fts_enabled():
+        return 0
+    from .models import Movie
+
+    written = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        movies = Movie.objects.order_by('id').prefetch_related('translations')
+        batch = []
+        for movie in movies.iterator(chunk_size=batch_size):
+            batch.append(_index_row(movie))
+            if len(batch) >= batch_size:
+                _insert_rows(cursor, batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            _insert_rows(cursor, batch)
+            written += len(batch)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return written
+
+
+def _index_row(movie):
+    translations = list(movie.translations.all())
+    return [
+        movie.id,
+        movie.name,
+        movie.author or '',
+        movie.genre or '',
+        movie.description or '',
+        ' '.join(t.name for t in translations if t.name),
+        ' '.join(t.description for t in translations if t.description),
+    ]
+
+
+def _insert_rows(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, name, author, genre, description, '
+        f'translated_names, translated_descriptions) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+        rows,
+    )
@@ -0,0 +1,71 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from cacheversions import generations
+
+from . import images, inventory, ratings, search
+from .models import LibraryBranch, Movie, MovieTranslation, Review, Stock
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def reindex_movie(sender, instance, **kwargs):
+    """Keep the full-text index in step with the catalogue."""
+    search.index_movie(instance.id)
+
+
+@receiver(post_save, sender=MovieTranslation)
+@receiver(post_delete, sender=MovieTranslation)
+def reindex_translated_movie(sender, instance, **kwargs):
+    search.index_movie(instance.movie_id)
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def recount_stock(sender, instance, **kwargs):
+    """Stock edited outside checkout/returns (admin, imports): recount that movie."""
+    inventory.recompute_availability([instance.movie_id])
+
+
+@receiver(post_save, sender=Movie)
+def generate_cover_derivatives(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Resize a newly uploaded cover. Saves that leave `image` alone do no image work."""
+    if raw or (update_fields is not None and 'image' not in update_fields):
+        return
+    if not created and not instance.image_changed():
+        return
+    images.generate_derivatives(instance)
+    instance.remember_image()
+
+
+# Movie's rating summary follows every Review write from here, whatever made it
+# (the review views, the admin, a User or Movie cascade). Raw saves (loaddata) are
+# skipped: a fixture carries its movies' summaries along with their reviews.
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._old_rating = None
+    else:
+        instance._old_rating = Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+
+
+@receiver(post_save, sender=Review)
+def count_saved_rating(sender, instance, raw=False, **kwargs):
+    """Count a new review's rating, or move an edited review from its old rating."""
+    if not raw:
+        ratings.record_rating_change(instance.movie_id, getattr(instance, '_old_rating', None), instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_deleted_rating(sender, instance, **kwargs):
+    ratings.record_rating_change(instance.movie_id, old_rating=instance.rating)
+
+
+# Versions the cached catalogue pages and branch data (see pagecache.py, branches.py).
+# Translations, reviews and stock are shown as part of their book.
+generations.track(Movie)
+generations.track(MovieTranslation, parents=('movie',))
+generations.track(Review, parents=('movie',))
+generations.track(Stock, parents=('movie', 'branch'))
+generations.track(LibraryBranch)
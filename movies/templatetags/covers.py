@@ -0,0 +1,35 @@
+from django import template
+from django.utils.html import format_html
+
+from movies.images import derivative_urls
+
+register = template.Library()
+
+
+def _srcset(urls):
+    return ', '.join(f'{url} {width}w' for width, url in urls)
+
+
+@register.simple_tag
+def cover_img(movie, display_width, css_class='', alt=''):
+    """Responsive <picture> for a book cover shown `display_width` CSS pixels wide.
+
+    Offers the WebP derivatives with a JPEG fallback; covers without derivatives
+    fall back to the original upload.
+    Usage: {% cover_img movie 200 "card-img-top rounded img-card-200" movie.name %}
+    """
+    if not movie.image:
+        return ''
+    if not movie.cover_hash:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', movie.image.url, css_class, alt)
+
+    webp = derivative_urls(movie.cover_hash, movie.cover_width, 'webp')
+    jpeg = derivative_urls(movie.cover_hash, movie.cover_width, 'jpg')
+    # smallest JPEG at least as wide as the slot, for browsers without srcset
+    fallback = next((url for width, url in jpeg if width >= display_width), jpeg[-1][1])
+    sizes = f'{display_width}px'
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy" decoding="async"></picture>',
+        _srcset(webp), sizes, fallback, _srcset(jpeg), sizes, css_class, alt,
+    )
@@ -1,10 +1,23 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Movie, LibraryBranch, Stock
+from . import search
+from .models import Movie, MovieTranslation, LibraryBranch, Review, Stock
+from .pagination import encode_cursor
 
 
 class BranchesAPITest(TestCase):
 	def setUp(self):
+		cache.clear()
 		self.movie = Movie.objects.create(name='Test Book', description='desc', available=True)
 		self.branch = LibraryBranch.objects.create(name='Test Branch', latitude=33.77, longitude=-84.39)
 		Stock.objects.create(movie=self.movie, branch=self.branch, count=3)
@@ -24,3 +37,655 @@ class BranchesAPITest(TestCase):
 		data = resp.json()
 		self.assertEqual(data.get('movie_id'), self.movie.id)
 		self.assertTrue(len(data.get('branches', [])) >= 1)
+
+	def test_branches_list_is_cached_until_a_branch_changes(self):
+		url = '/en/movies/branches/'
+		first = self.client.get(url)
+		self.assertIn('max-age=', first['Cache-Control'])
+		with self.assertNumQueries(0):
+			self.client.get(url)
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+		self.branch.name = 'Renamed Branch'
+		self.branch.save()
+		second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+		self.assertEqual(second.status_code, 200)
+		self.assertEqual(second.json()['branches'][0]['name'], 'Renamed Branch')
+
+	def test_movie_branches_revalidates_against_stock_changes(self):
+		from . import inventory
+		url = f'/en/movies/{self.movie.id}/branches/'
+		first = self.client.get(url)
+		self.assertIn('ETag', first)
+		with self.assertNumQueries(1):
+			not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+		self.assertEqual(not_modified.status_code, 304)
+		self.assertIn('max-age=', not_modified['Cache-Control'])
+
+		inventory.take_copies(self.movie.id, 1)
+		Stock.objects.filter(movie=self.movie).update(count=2)
+		changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+		self.assertEqual(changed.status_code, 200)
+		self.assertEqual(changed.json()['branches'][0]['count'], 2)
+
+	def test_movie_branches_404_for_unknown_movie(self):
+		self.assertEqual(self.client.get('/en/movies/999999/branches/').status_code, 404)
+
+
+class MovieTranslationResolverTest(TestCase):
+	def setUp(self):
+		self.movie = Movie.objects.create(name='The Giver', author='Lois Lowry', genre='Fiction', description='A boy and his memories.')
+		MovieTranslation.objects.create(movie=self.movie, language_code='es', name='El Dador', description='Un chico y sus recuerdos.', genre='Ficción')
+
+	def test_fields_fall_back_to_english_per_field(self):
+		fields = self.movie.get_translated_fields('es')
+		self.assertEqual(fields['name'], 'El Dador')
+		self.assertEqual(fields['genre'], 'Ficción')
+		self.assertEqual(fields['author'], 'Lois Lowry')
+
+	def test_missing_translation_falls_back_to_english(self):
+		self.assertIsNone(self.movie.get_translation('fr'))
+		self.assertEqual(self.movie.get_translated_name('fr'), 'The Giver')
+
+	def test_translation_is_fetched_once_per_instance(self):
+		with self.assertNumQueries(1):
+			self.movie.get_translated_name('es')
+			self.movie.get_translated_description('es')
+			self.movie.get_translated_author('es')
+			self.movie.get_translated_genre('es')
+
+	def test_with_translation_prefetches(self):
+		movie = Movie.objects.with_translation('es').get(id=self.movie.id)
+		with self.assertNumQueries(0):
+			self.assertEqual(movie.get_translated_name('es'), 'El Dador')
+
+	def test_show_queries_translations_once(self):
+		with CaptureQueriesContext(connection) as ctx:
+			resp = self.client.get(f'/es/movies/{self.movie.id}/')
+		self.assertEqual(resp.status_code, 200)
+		self.assertContains(resp, 'El Dador')
+		translation_queries = [q for q in ctx.captured_queries if 'movies_movietranslation' in q['sql']]
+		self.assertEqual(len(translation_queries), 1)
+
+
+class TranslatedCatalogueTest(TestCase):
+	def create_movies(self, count):
+		for i in range(count):
+			movie = Movie.objects.create(name=f'Book {i}', description='desc')
+			MovieTranslation.objects.create(movie=movie, language_code='fr', name=f'Livre {i}', description='desc')
+
+	def test_listing_shows_active_language_titles(self):
+		self.create_movies(2)
+		resp = self.client.get('/fr/movies/')
+		self.assertContains(resp, 'Livre 0')
+		self.assertContains(resp, 'Livre 1')
+		resp = self.client.get('/en/movies/')
+		self.assertContains(resp, 'Book 0')
+
+	def test_search_matches_and_shows_translated_titles(self):
+		self.create_movies(2)
+		resp = self.client.get('/fr/movies/', {'search': 'Livre 1'})
+		self.assertContains(resp, 'Livre 1')
+		self.assertNotContains(resp, 'Livre 0')
+
+	def test_listing_query_count_is_independent_of_catalogue_size(self):
+		self.create_movies(2)
+		with CaptureQueriesContext(connection) as small:
+			self.client.get('/fr/movies/')
+		self.create_movies(10)
+		with self.assertNumQueries(len(small.captured_queries)):
+			self.client.get('/fr/movies/')
+
+
+class CatalogueSearchTest(TestCase):
+	def setUp(self):
+		self.hunger = Movie.objects.create(name='The Hunger Games', author='Suzanne Collins', genre='Dystopian', description='Katniss volunteers.')
+		self.mouse = Movie.objects.create(name='If You Give a Mouse a Cookie', author='Laura Numeroff', genre='Children', description='A hungry mouse wants more.')
+		MovieTranslation.objects.create(movie=self.mouse, language_code='es', name='Si le das una galletita a un ratón', description='Un ratón con hambre.')
+
+	def test_fts_index_is_available_on_sqlite(self):
+		self.assertTrue(search.fts_enabled())
+
+	def test_prefix_match_ranked_by_relevance(self):
+		# "hung" prefixes the title of one book and only the description of the other
+		self.assertEqual(search.search_movie_ids('hung'), [self.hunger.id, self.mouse.id])
+
+	def test_translated_names_are_indexed(self):
+		self.assertEqual(search.search_movie_ids('galletita'), [self.mouse.id])
+
+	def test_index_follows_updates_and_deletes(self):
+		self.hunger.name = 'Catching Fire'
+		self.hunger.save()
+		self.assertEqual(search.search_movie_ids('catching'), [self.hunger.id])
+		self.hunger.delete()
+		self.assertEqual(search.search_movie_ids('catching'), [])
+
+	def test_punctuation_only_query_matches_nothing(self):
+		self.assertEqual(search.search_movie_ids('"*'), [])
+
+	def test_rebuild_command(self):
+		with connection.cursor() as cursor:
+			cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+		call_command('rebuild_search_index', stdout=mock.Mock())
+		self.assertEqual(search.search_movie_ids('cookie'), [self.mouse.id])
+
+	def test_falls_back_to_icontains_without_fts(self):
+		with mock.patch.object(search, 'fts_enabled', return_value=False):
+			results = list(search.search_movies('collins', 'en'))
+		self.assertEqual(results, [self.hunger])
+
+	def test_index_view_uses_search(self):
+		resp = self.client.get('/en/movies/', {'search': 'numer'})
+		self.assertContains(resp, 'If You Give a Mouse a Cookie')
+		self.assertNotContains(resp, 'The Hunger Games')
+
+	def test_ranked_results_page_through_every_hit(self):
+		for i in range(7):
+			Movie.objects.create(name=f'Saga {i}', description='saga ' * i)
+		seen, cursor = [], None
+		while True:
+			query = {'search': 'saga', 'fields': 'id', 'limit': 2}
+			if cursor:
+				query['cursor'] = cursor
+			data = self.client.get('/en/movies/api/', query).json()
+			seen += [row['id'] for row in data['results']]
+			cursor = data['next_cursor']
+			if not cursor:
+				break
+		self.assertEqual(len(seen), 7)
+		self.assertEqual(seen, search.search_movie_ids('saga'))
+
+		# filters narrow the ranked candidates
+		Movie.objects.filter(name='Saga 3').update(available=True)
+		data = self.client.get('/en/movies/api/', {'search': 'saga', 'available': '1', 'fields': 'name'}).json()
+		self.assertEqual(data['results'], [{'name': 'Saga 3'}])
+
+	def test_search_without_matches_returns_an_empty_page(self):
+		resp = self.client.get('/en/movies/', {'search': 'zzzzz'})
+		self.assertEqual(resp.status_code, 200)
+		self.assertNotContains(resp, 'The Hunger Games')
+		data = self.client.get('/en/movies/api/', {'search': 'zzzzz'}).json()
+		self.assertEqual(data, {'results': [], 'next_cursor': None})
+
+
+class CataloguePaginationTest(TestCase):
+	def setUp(self):
+		for i in range(7):
+			Movie.objects.create(name=f'Title {i % 3}', description='desc', author=f'Author {i}')
+
+	def walk_api(self, **params):
+		seen, cursor = [], None
+		while True:
+			query = dict(params, limit=3)
+			if cursor:
+				query['cursor'] = cursor
+			data = self.client.get('/en/movies/api/', query).json()
+			seen.extend(data['results'])
+			cursor = data['next_cursor']
+			if not cursor:
+				return seen
+
+	def test_api_walks_catalogue_in_name_id_order(self):
+		results = self.walk_api(fields='id,name')
+		expected = list(Movie.objects.order_by('name', 'id').values('id', 'name'))
+		self.assertEqual(results, expected)
+
+	def test_api_sparse_fields(self):
+		data = self.client.get('/en/movies/api/', {'fields': 'name,author', 'limit': 1}).json()
+		self.assertEqual(set(data['results'][0]), {'name', 'author'})
+
+	def test_api_paginates_search_results(self):
+		results = self.walk_api(search='title', fields='id')
+		self.assertEqual(len(results), 7)
+		self.assertEqual(len({r['id'] for r in results}), 7)
+
+	def test_api_rejects_bad_parameters(self):
+		self.assertEqual(self.client.get('/en/movies/api/', {'cursor': 'not-a-cursor'}).status_code, 400)
+		self.assertEqual(self.client.get('/en/movies/api/', {'fields': 'password'}).status_code, 400)
+		self.assertEqual(self.client.get('/en/movies/api/', {'limit': 'x'}).status_code, 400)
+
+	def test_tampered_cursor_values_are_rejected(self):
+		for values in (['x', 'abc'], [None, 1], ['Title 1', [2]], ['Title 1', 2 ** 70]):
+			cursor = encode_cursor(values)
+			self.assertEqual(self.client.get('/en/movies/api/', {'cursor': cursor}).status_code, 400)
+			self.assertEqual(self.client.get('/en/movies/', {'cursor': cursor}).status_code, 200)
+			self.assertEqual(self.client.get('/en/movies/api/', {'cursor': cursor, 'sort': 'rating'}).status_code, 400)
+		ranked = encode_cursor(['best', 1])
+		self.assertEqual(self.client.get('/en/movies/api/', {'cursor': ranked, 'search': 'title'}).status_code, 400)
+
+	def test_html_listing_has_next_page_link(self):
+		with mock.patch('movies.views.PAGE_SIZE', 5):
+			first = self.client.get('/en/movies/')
+			self.assertEqual(len(first.context['template_data']['movies']), 5)
+			cursor = first.context['template_data']['next_cursor']
+			second = self.client.get('/en/movies/', {'cursor': cursor})
+		self.assertEqual(len(second.context['template_data']['movies']), 2)
+		self.assertIsNone(second.context['template_data']['next_cursor'])
+
+
+class StockAvailabilityTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.main = LibraryBranch.objects.create(name='Main')
+		cls.east = LibraryBranch.objects.create(name='East')
+		cls.popular = Movie.objects.create(name='Popular', description='desc')
+		cls.single = Movie.objects.create(name='Single', description='desc')
+		cls.none = Movie.objects.create(name='None Left', description='desc')
+		Stock.objects.create(movie=cls.popular, branch=cls.main, count=3)
+		Stock.objects.create(movie=cls.popular, branch=cls.east, count=2)
+		Stock.objects.create(movie=cls.single, branch=cls.main, count=1)
+
+	def test_stock_edits_update_counters(self):
+		self.popular.refresh_from_db()
+		self.assertEqual((self.popular.available_copies, self.popular.total_copies), (5, 5))
+		self.assertTrue(self.popular.available)
+		self.none.refresh_from_db()
+		self.assertFalse(self.none.available)
+
+		Stock.objects.filter(movie=self.single).get().delete()
+		self.single.refresh_from_db()
+		self.assertEqual(self.single.available_copies, 0)
+		self.assertFalse(self.single.available)
+
+	def test_take_and_return_copies(self):
+		from . import inventory
+		inventory.take_copies(self.single.id, 1)
+		self.single.refresh_from_db()
+		self.assertEqual(self.single.available_copies, 0)
+		self.assertFalse(self.single.available)
+		inventory.return_copies(self.single.id, 1)
+		self.single.refresh_from_db()
+		self.assertEqual(self.single.available_copies, 1)
+		self.assertTrue(self.single.available)
+
+	def test_recompute_command_repairs_drift(self):
+		Movie.objects.update(available=False, available_copies=0, total_copies=0)
+		call_command('recompute_availability', stdout=open('/dev/null', 'w'))
+		self.assertEqual(
+			list(Movie.objects.order_by('id').values_list('available_copies', 'available')),
+			[(5, True), (1, True), (0, False)]
+		)
+
+	def test_api_filters_and_sorts_by_availability(self):
+		data = self.client.get('/en/movies/api/', {'available': '1', 'sort': 'availability', 'fields': 'name,available_copies'}).json()
+		self.assertEqual(data['results'], [
+			{'name': 'Popular', 'available_copies': 5},
+			{'name': 'Single', 'available_copies': 1},
+		])
+
+	def test_listing_keeps_filters_on_paging_links(self):
+		with mock.patch('movies.views.PAGE_SIZE', 1):
+			response = self.client.get('/en/movies/', {'available': '1', 'sort': 'availability'})
+		self.assertEqual([m.name for m in response.context['template_data']['movies']], ['Popular'])
+		self.assertContains(response, 'available=1&amp;sort=availability&amp;cursor=')
+
+
+class NearestBranchTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		cls.movie = Movie.objects.create(name='Atlas', description='desc')
+		places = [
+			('Midtown', 33.7810, -84.3880),
+			('Decatur', 33.7748, -84.2963),
+			('Marietta', 33.9526, -84.5499),
+			('Savannah', 32.0809, -81.0912),
+			('No Stock', 33.7800, -84.3900),
+		]
+		cls.branches = {name: LibraryBranch.objects.create(name=name, latitude=lat, longitude=lon) for name, lat, lon in places}
+		for name in ('Midtown', 'Decatur', 'Marietta', 'Savannah'):
+			Stock.objects.create(movie=cls.movie, branch=cls.branches[name], count=1)
+
+	def setUp(self):
+		cache.clear()
+
+	def nearest(self, **params):
+		return self.client.get(f'/en/movies/{self.movie.id}/branches/', params)
+
+	def test_geohash_matches_reference_values(self):
+		from .geo import encode_geohash
+		self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+		self.assertEqual(self.branches['Midtown'].geohash, encode_geohash(33.7810, -84.3880))
+
+	def test_covering_prefixes_contain_every_point_in_radius(self):
+		from .geo import covering_prefixes, encode_geohash
+		prefixes = covering_prefixes(33.78, -84.39, 25)
+		for name in ('Midtown', 'Decatur', 'Marietta'):
+			self.assertTrue(any(self.branches[name].geohash.startswith(p) for p in prefixes), name)
+		self.assertFalse(any(encode_geohash(32.0809, -81.0912).startswith(p) for p in prefixes))
+
+	def test_nearest_branches_sorted_by_distance(self):
+		data = self.nearest(lat=33.7800, lon=-84.3900, radius=30).json()
+		self.assertEqual([b['branch_name'] for b in data['branches']], ['Midtown', 'Decatur', 'Marietta'])
+		distances = [b['distance_km'] for b in data['branches']]
+		self.assertEqual(distances, sorted(distances))
+		self.assertLess(distances[0], 1)
+
+	def test_limit_and_radius(self):
+		data = self.nearest(lat=33.7800, lon=-84.3900, radius=30, limit=1).json()
+		self.assertEqual([b['branch_name'] for b in data['branches']], ['Midtown'])
+		data = self.nearest(lat=33.7800, lon=-84.3900, radius=500).json()
+		self.assertEqual(data['branches'][-1]['branch_name'], 'Savannah')
+
+	def test_moved_branch_is_reindexed(self):
+		branch = self.branches['Savannah']
+		branch.latitude, branch.longitude = 33.7790, -84.3910
+		branch.save()
+		data = self.nearest(lat=33.7800, lon=-84.3900, radius=5).json()
+		self.assertEqual(data['branches'][0]['branch_name'], 'Savannah')
+
+	def test_rejects_bad_coordinates(self):
+		self.assertEqual(self.nearest(lat='x', lon=1).status_code, 400)
+		self.assertEqual(self.nearest(lat=95, lon=1).status_code, 400)
+		self.assertEqual(self.nearest(lat=1).status_code, 400)
+		self.assertEqual(self.nearest(lat=1, lon=1, radius=-3).status_code, 400)
+
+
+class CatalogueImportExportTest(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+
+	def write(self, name, text):
+		path = os.path.join(self.tmp.name, name)
+		with open(path, 'w', encoding='utf-8') as f:
+			f.write(text)
+		return path
+
+	def run_import(self, *args):
+		out = io.StringIO()
+		call_command('import_catalogue', *args, stdout=out)
+		return out.getvalue()
+
+	def test_import_upserts_and_refreshes_derived_data(self):
+		self.run_import('books', self.write('books.csv', 'id,name,author,genre,description,publication_year\n1,Dune,Frank Herbert,SF,Desert planet,1965\n2,Emma,Jane Austen,,Matchmaking,\n'))
+		self.run_import('branches', self.write('branches.jsonl', '{"id": 1, "name": "Main", "latitude": "33.78", "longitude": "-84.39"}\n'))
+		output = self.run_import('stock', self.write('stock.csv', 'movie_id,branch_id,count\n1,1,4\n2,1,0\n'), '--batch-size', '1')
+		self.run_import('translations', self.write('translations.jsonl', '{"movie_id": 1, "language_code": "es", "name": "Duna", "description": "Planeta desierto"}\n'))
+		self.assertIn('stock: 2 rows imported', output)
+
+		dune = Movie.objects.get(id=1)
+		self.assertEqual((dune.available_copies, dune.available, dune.publication_year), (4, True, 1965))
+		self.assertIsNone(Movie.objects.get(id=2).genre)
+		self.assertTrue(LibraryBranch.objects.get(id=1).geohash)
+		self.assertEqual(list(search.search_movies('duna', 'es').values_list('id', flat=True)), [1])
+
+		# a second import updates in place instead of duplicating
+		self.run_import('books', self.write('books2.jsonl', '{"id": 1, "name": "Dune Messiah", "description": "Sequel"}\n{"name": "New Book", "description": "No id"}\n'))
+		self.run_import('stock', self.write('stock2.csv', 'movie_id,branch_id,count\n1,1,1\n'))
+		self.assertEqual(Movie.objects.count(), 3)
+		self.assertEqual(Movie.objects.get(id=1).name, 'Dune Messiah')
+		self.assertEqual(Stock.objects.get(movie_id=1).count, 1)
+		self.assertEqual(Movie.objects.get(id=1).available_copies, 1)
+
+	def test_bad_rows_stop_the_import(self):
+		with self.assertRaisesMessage(CommandError, 'line 2: name is required'):
+			self.run_import('books', self.write('bad.csv', 'id,name,description\n1,,desc\n'))
+		with self.assertRaisesMessage(CommandError, 'publication_year'):
+			self.run_import('books', self.write('bad.jsonl', '{"name": "X", "description": "d", "publication_year": "soon"}\n'))
+		self.assertFalse(Movie.objects.exists())
+
+	def test_export_round_trips(self):
+		movie = Movie.objects.create(name='Dune', author='Frank Herbert', description='Desert planet')
+		branch = LibraryBranch.objects.create(name='Main')
+		Stock.objects.create(movie=movie, branch=branch, count=2)
+		for kind in ('books', 'stock'):
+			path = os.path.join(self.tmp.name, f'{kind}.csv')
+			call_command('export_catalogue', kind, path, stdout=io.StringIO())
+			with open(path, encoding='utf-8') as f:
+				self.assertEqual(len(f.read().splitlines()), 2)
+		out = io.StringIO()
+		call_command('export_catalogue', 'books', stdout=out)
+		self.assertEqual(json.loads(out.getvalue())['name'], 'Dune')
+
+		Movie.objects.update(name='Changed')
+		self.run_import('books', os.path.join(self.tmp.name, 'books.csv'))
+		self.assertEqual(Movie.objects.get().name, 'Dune')
+
+
+class CoverDerivativeTest(TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+		settings_override = self.settings(MEDIA_ROOT=self.tmp.name)
+		settings_override.enable()
+		self.addCleanup(settings_override.disable)
+
+	def upload(self, width=1000, height=1500, mode='RGB'):
+		from django.core.files.uploadedfile import SimpleUploadedFile
+		from PIL import Image
+		out = io.BytesIO()
+		Image.new(mode, (width, height), 'red').save(out, 'PNG')
+		return SimpleUploadedFile('cover.png', out.getvalue(), content_type='image/png')
+
+	def test_upload_generates_hashed_derivatives(self):
+		from PIL import Image
+		from .images import derivative_name
+		movie = Movie.objects.create(name='Dune', description='desc', image=self.upload())
+		movie.refresh_from_db()
+		self.assertEqual(movie.cover_width, 1000)
+		for width in (200, 400, 800):
+			for ext in ('webp', 'jpg'):
+				path = os.path.join(self.tmp.name, derivative_name(movie.cover_hash, width, ext))
+				with Image.open(path) as image:
+					self.assertEqual(image.width, width)
+
+		# saving again with the same cover does no work
+		with mock.patch('movies.images.default_storage.save') as save:
+			movie.save()
+		save.assert_not_called()
+
+	def test_small_covers_are_not_upscaled(self):
+		from .images import variant_widths
+		self.assertEqual(variant_widths(300), [200, 300])
+		self.assertEqual(variant_widths(2000), [200, 400, 800])
+		movie = Movie.objects.create(name='Tiny', description='desc', image=self.upload(150, 200, 'RGBA'))
+		movie.refresh_from_db()
+		self.assertEqual(movie.cover_width, 150)
+
+	def test_catalogue_uses_srcset(self):
+		Movie.objects.create(name='Dune', description='desc', image=self.upload())
+		response = self.client.get('/en/movies/')
+		self.assertContains(response, 'type="image/webp"')
+		self.assertContains(response, '-400.webp 400w')
+		self.assertContains(response, 'sizes="200px"')
+
+	def test_derivatives_served_with_long_cache_headers(self):
+		from django.test import RequestFactory
+		from .views import cover_image
+		movie = Movie.objects.create(name='Dune', description='desc', image=self.upload())
+		movie.refresh_from_db()
+		path = f'{movie.cover_hash[:2]}/{movie.cover_hash}-200.webp'
+		# the development route (DEBUG only); production servers send the same headers
+		response = cover_image(RequestFactory().get(f'/media/covers/{path}'), path)
+		self.assertEqual(response.status_code, 200)
+		self.assertIn('immutable', response['Cache-Control'])
+		self.assertIn('max-age=31536000', response['Cache-Control'])
+		self.assertEqual(self.client.get(f'/media/covers/{path}').status_code, 404)
+
+	def test_only_saves_that_change_the_cover_do_image_work(self):
+		movie = Movie.objects.create(name='Dune', description='desc', image=self.upload())
+		loaded = Movie.objects.get(pk=movie.pk)
+		with mock.patch('movies.images.generate_derivatives') as generate:
+			loaded.rating_avg = 4.5
+			loaded.save()
+			loaded.save(update_fields=['rating_avg'])
+			Movie.objects.only('id', 'name').get(pk=movie.pk).save(update_fields=['name'])
+			movie.name = 'Dune Messiah'
+			movie.save()
+		generate.assert_not_called()
+
+		loaded.image = self.upload(600, 900)
+		loaded.save()
+		loaded.refresh_from_db()
+		self.assertEqual(loaded.cover_width, 600)
+		self.assertNotEqual(loaded.cover_hash, movie.cover_hash)
+
+	def test_decompression_bombs_are_skipped(self):
+		from PIL import Image
+		with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+			movie = Movie.objects.create(name='Dune', description='desc', image=self.upload())
+		movie.refresh_from_db()
+		self.assertEqual((movie.cover_hash, movie.cover_width), ('', None))
+
+	def test_backfill_command(self):
+		movie = Movie.objects.create(name='Dune', description='desc', image=self.upload())
+		Movie.objects.update(cover_hash='', cover_width=None)
+		self.assertNotContains(self.client.get('/en/movies/'), 'srcset')
+		out = io.StringIO()
+		call_command('generate_cover_derivatives', stdout=out)
+		self.assertIn('Checked 1 covers', out.getvalue())
+		movie.refresh_from_db()
+		self.assertEqual(movie.cover_width, 1000)
+		# the cached listing is invalidated and shows the new srcset
+		self.assertContains(self.client.get('/en/movies/'), '-400.webp 400w')
+
+
+class ReviewRatingTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		from django.contrib.auth.models import User
+		cls.user = User.objects.create_user(username='reader', password='pw')
+		cls.movie = Movie.objects.create(name='Dune', description='desc')
+
+	def setUp(self):
+		self.client.force_login(self.user)
+
+	def summary(self):
+		movie = Movie.objects.get(id=self.movie.id)
+		return movie.rating_count, movie.rating_sum, movie.rating_avg, [c for _, c, _ in movie.rating_histogram()]
+
+	def review(self, rating, comment='Good'):
+		self.client.post(f'/en/movies/{self.movie.id}/review/create/', {'comment': comment, 'rating': rating})
+		return Review.objects.latest('id')
+
+	def test_views_keep_the_summary_current(self):
+		first = self.review(5)
+		self.review(3)
+		self.assertEqual(self.summary(), (2, 8, 4.0, [1, 0, 1, 0, 0]))
+
+		self.client.post(f'/en/movies/{self.movie.id}/review/{first.id}/edit/', {'comment': 'Meh', 'rating': 2})
+		self.assertEqual(self.summary(), (2, 5, 2.5, [0, 0, 1, 1, 0]))
+
+		url = f'/en/movies/{self.movie.id}/review/{first.id}/delete/'
+		self.client.get(url)
+		self.client.get(url)
+		self.assertEqual(self.summary(), (1, 3, 3.0, [0, 0, 1, 0, 0]))
+
+	def test_reviews_written_outside_the_views_are_counted(self):
+		from django.contrib.auth.models import User
+		critic = User.objects.create_user(username='critic')
+		review = Review.objects.create(movie=self.movie, user=critic, comment='Good', rating=4)
+		Review.objects.create(movie=self.movie, user=self.user, comment='Fine', rating=2)
+		self.assertEqual(self.summary(), (2, 6, 3.0, [0, 1, 0, 1, 0]))
+
+		review.rating = 5
+		review.save()
+		self.assertEqual(self.summary(), (2, 7, 3.5, [1, 0, 0, 1, 0]))
+
+		# deleting the critic deletes their review by cascade
+		critic.delete()
+		self.assertEqual(self.summary(), (1, 2, 2.0, [0, 0, 0, 1, 0]))
+		from . import ratings
+		self.assertEqual(ratings.reconcile_ratings(), [])
+
+	def test_recompute_command_repairs_drift(self):
+		self.review(4)
+		self.review(1)
+		other = Movie.objects.create(name='Emma', description='desc')
+		Movie.objects.filter(id=self.movie.id).update(rating_count=0, rating_sum=0, rating_avg=0, rating_4=0, rating_1=0)
+		out = io.StringIO()
+		call_command('recompute_ratings', stdout=out)
+		self.assertIn(f'1 book(s): [{self.movie.id}]', out.getvalue())
+		self.assertEqual(self.summary(), (2, 5, 2.5, [0, 1, 0, 0, 1]))
+		self.assertEqual(Movie.objects.get(id=other.id).rating_count, 0)
+
+	def test_book_page_paginates_reviews_in_constant_queries(self):
+		from django.contrib.auth.models import User
+		for i in range(3):
+			self.review(4, comment=f'Review {i}')
+		with CaptureQueriesContext(connection) as small:
+			self.client.get(f'/en/movies/{self.movie.id}/')
+		for i in range(20):
+			author = User.objects.create(username=f'reader{i}')
+			Review.objects.create(movie=self.movie, user=author, comment=f'More {i}', rating=3)
+		with mock.patch('movies.views.REVIEWS_PAGE_SIZE', 10):
+			with self.assertNumQueries(len(small.captured_queries)):
+				response = self.client.get(f'/en/movies/{self.movie.id}/')
+			self.assertEqual(len(response.context['template_data']['reviews']), 10)
+			cursor = response.context['template_data']['next_reviews_cursor']
+			older = self.client.get(f'/en/movies/{self.movie.id}/', {'reviews_cursor': cursor})
+		self.assertEqual(older.context['template_data']['reviews'][0].comment, 'More 9')
+
+	def test_catalogue_sorts_by_rating(self):
+		other = Movie.objects.create(name='Emma', description='desc')
+		self.review(3)
+		Review.objects.create(movie=other, user=self.user, comment='Great', rating=5)
+		data = self.client.get('/en/movies/api/', {'sort': 'rating', 'fields': 'name,rating_avg'}).json()
+		self.assertEqual(data['results'], [{'name': 'Emma', 'rating_avg': 5.0}, {'name': 'Dune', 'rating_avg': 3.0}])
+
+
+class PageCacheTest(TestCase):
+	@classmethod
+	def setUpTestData(cls):
+		from django.contrib.auth.models import User
+		cls.user = User.objects.create_user(username='reader', password='pw')
+		cls.author = User.objects.create_user(username='author', password='pw')
+		cls.movie = Movie.objects.create(name='Dune', description='desc')
+		cls.branch = LibraryBranch.objects.create(name='Main')
+		Stock.objects.create(movie=cls.movie, branch=cls.branch, count=2)
+		MovieTranslation.objects.create(movie=cls.movie, language_code='fr', name='Dune (fr)', description='desc')
+
+	def setUp(self):
+		cache.clear()
+
+	def test_anonymous_listing_is_served_from_cache_per_language_and_query(self):
+		self.client.get('/en/movies/')
+		with self.assertNumQueries(0):
+			self.assertContains(self.client.get('/en/movies/'), 'Dune')
+		self.assertContains(self.client.get('/fr/movies/'), 'Dune (fr)')
+		self.assertNotContains(self.client.get('/en/movies/', {'search': 'nothing'}), 'Dune')
+
+	def test_model_changes_bump_the_cached_pages(self):
+		self.assertContains(self.client.get('/fr/movies/'), 'Dune (fr)')
+		self.assertContains(self.client.get(f'/fr/movies/{self.movie.id}/'), 'Dune (fr)')
+		MovieTranslation.objects.filter(movie=self.movie).get().delete()
+		self.assertNotContains(self.client.get('/fr/movies/'), 'Dune (fr)')
+		self.assertNotContains(self.client.get(f'/fr/movies/{self.movie.id}/'), 'Dune (fr)')
+
+	def test_checkout_invalidates_the_book_page(self):
+		from cart.utils import checkout
+		url = f'/en/movies/{self.movie.id}/'
+		self.assertContains(self.client.get(url), '2 copies available')
+		checkout(self.user, {str(self.movie.id): '1'})
+		self.assertContains(self.client.get(url), '1 copy available')
+
+	def test_cached_book_page_gets_a_fresh_csrf_token(self):
+		url = f'/en/movies/{self.movie.id}/'
+		self.client.get(url)
+		with self.assertNumQueries(0):
+			response = self.client.get(url)
+		self.assertNotContains(response, '__page_cache_csrf_token__')
+		self.assertContains(response, 'name="csrfmiddlewaretoken"')
+		self.assertIn('csrftoken', response.cookies)
+		self.client.cookies['csrftoken'] = response.cookies['csrftoken'].value
+		self.client.handler.enforce_csrf_checks = True
+		token = response.content.decode().split('name="csrfmiddlewaretoken" value="')[1].split('"')[0]
+		added = self.client.post(f'/en/cart/{self.movie.id}/add/', {'quantity': '1', 'csrfmiddlewaretoken': token})
+		self.assertEqual(added.status_code, 302)
+
+	def test_logged_in_book_page_caches_fragments(self):
+		Review.objects.create(movie=self.movie, user=self.author, comment='Classic', rating=5)
+		url = f'/en/movies/{self.movie.id}/'
+		self.client.force_login(self.user)
+		with CaptureQueriesContext(connection) as first:
+			self.assertContains(self.client.get(url), 'Classic')
+		with CaptureQueriesContext(connection) as second:
+			response = self.client.get(url)
+		self.assertContains(response, 'Classic')
+		self.assertNotContains(response, '/edit/')  # no edit links for someone else's review
+		self.assertEqual(len(second.captured_queries), len(first.captured_queries) - 1)
+		self.assertFalse(any('movies_review' in q['sql'] for q in second.captured_queries))
+
+		self.client.force_login(self.author)
+		self.assertContains(self.client.get(url), f'/review/{Review.objects.get().id}/edit/')
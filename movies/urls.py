@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='movies.index'),
+    path('api/', views.catalogue_api, name='movies.catalogue_api'),
     path('<int:id>/', views.show, name='movies.show'),
     path('<int:id>/review/create/', views.create_review, name='movies.create_review'),
     path('<int:id>/review/<int:review_id>/edit/', views.edit_review, name='movies.edit_review'),
@@ -1,41 +1,187 @@
+import os
+from urllib.parse import urlencode
+
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import Movie, Review
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import JsonResponse
-from .models import LibraryBranch, Stock
+from django.http import Http404, JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.views.decorators.cache import cache_control
+from django.views.static import serve
+from django.views.decorators.http import condition
 from django.utils import translation
+from django.utils.functional import SimpleLazyObject
+from cacheversions import generations
+from . import branches, images, pagecache, search
+from .pagination import InvalidCursor, keyset_page
+
+# Number of book cards per catalogue page
+PAGE_SIZE = 24
+
+# Catalogue API: default/maximum page size and the fields clients may select
+API_DEFAULT_LIMIT = 20
+API_MAX_LIMIT = 100
+API_FIELDS = (
+    'id', 'name', 'author', 'genre', 'description', 'publication_year', 'image',
+    'available', 'available_copies', 'total_copies', 'rating_count', 'rating_avg',
+)
+
+
+# Catalogue orderings selectable with ?sort= (search results default to relevance)
+SORT_ORDERINGS = {
+    'name': ('name', 'id'),
+    'availability': ('-available_copies', 'id'),
+    'rating': ('-rating_avg', '-rating_count', 'id'),
+}
+
+# Reviews shown per page on the book page, newest first
+REVIEWS_PAGE_SIZE = 10
+REVIEW_ORDERING = ('-id',)
+
+# Nearest-branch mode of the availability endpoint: search radius (km) and result count
+NEAREST_DEFAULT_RADIUS_KM = 50
+NEAREST_MAX_RADIUS_KM = 1000
+NEAREST_DEFAULT_LIMIT = 5
+NEAREST_MAX_LIMIT = 50
+
+# Cover derivatives have content-hashed names, so browsers may keep them for a year
+COVER_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def catalogue_queryset(search_term, language_code, available_only=False, sort=None):
+    """Return the catalogue queryset and its keyset ordering.
+
+    `available_only` keeps books with a copy on the shelf; `sort` is a key of
+    SORT_ORDERINGS. Both are served by indexes on Movie's availability columns.
+    """
+    if search_term:
+        movies, ordering = search.search_movies(search_term, language_code), search.result_ordering()
+    else:
+        movies, ordering = Movie.objects.all(), SORT_ORDERINGS['name']
+    if available_only:
+        movies = movies.filter(available=True)
+    if sort in SORT_ORDERINGS:
+        ordering = SORT_ORDERINGS[sort]
+    return movies, ordering
+
+
+def catalogue_page(movies, ordering, search_term, cursor, limit):
+    """One page of a catalogue queryset: `(movies, next_cursor)`. Raises InvalidCursor."""
+    if ordering == search.RANKED_ORDERING:
+        return search.ranked_page(movies, search_term, cursor, limit)
+    return keyset_page(movies, ordering, cursor, limit)
+
+
+def catalogue_filters(request):
+    """Read the ?available= and ?sort= catalogue options from a request."""
+    return {
+        'available_only': request.GET.get('available') in ('1', 'true', 'on'),
+        'sort': request.GET.get('sort'),
+    }
+
 
 # Revised code with enhanced search functionality
+@pagecache.cache_anonymous_page(
+    depends_on=lambda request: (generations.model_generation(Movie),),
+    params=('search', 'available', 'sort', 'cursor'),
+)
 def index(request):
     search_term = request.GET.get('search')
-    if search_term:
-        movies = Movie.objects.filter(
-            Q(name__icontains=search_term) |
-            Q(author__icontains=search_term) |
-            Q(genre__icontains=search_term)
-        )
-    else:
-        movies = Movie.objects.all()
+    current_language = translation.get_language()
+    filters = catalogue_filters(request)
+    movies, ordering = catalogue_queryset(search_term, current_language, **filters)
+    # One prefetch query for the whole page, whatever the number of cards
+    movies = movies.with_translation(current_language)
+    try:
+        movies, next_cursor = catalogue_page(movies, ordering, search_term, request.GET.get('cursor'), PAGE_SIZE)
+    except InvalidCursor:
+        movies, next_cursor = catalogue_page(movies, ordering, search_term, None, PAGE_SIZE)
+    for movie in movies:
+        movie.translated_name = movie.get_translated_name(current_language)
 
     template_data = {
         'title': 'Movies',
-        'movies': movies
+        'movies': movies,
+        'search_term': search_term or '',
+        'available_only': filters['available_only'],
+        'sort': filters['sort'] if filters['sort'] in SORT_ORDERINGS else '',
+        # search/filter/sort parameters carried over by the paging links
+        'page_query': urlencode({
+            key: request.GET[key] for key in ('search', 'available', 'sort') if request.GET.get(key)
+        }),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
     }
     return render(request, 'movies/index.html', {'template_data': template_data})
 
+
+def catalogue_api(request):
+    """Return one page of the catalogue as JSON.
+
+    GET /movies/api/?limit=20&cursor=<next_cursor>&fields=id,name&search=term
+                    &available=1&sort=availability
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', API_DEFAULT_LIMIT)), 1), API_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+
+    fields = [f for f in request.GET.get('fields', '').split(',') if f] or list(API_FIELDS)
+    unknown = [f for f in fields if f not in API_FIELDS]
+    if unknown:
+        return JsonResponse({'error': f"Unknown fields: {', '.join(unknown)}"}, status=400)
+
+    search_term = request.GET.get('search')
+    movies, ordering = catalogue_queryset(search_term, translation.get_language(), **catalogue_filters(request))
+    # Load only the requested columns plus the ones the cursor is built from
+    movies = movies.only(*{f for f in fields + [o.lstrip('-') for o in ordering] if f != 'search_rank'})
+    try:
+        movies, next_cursor = catalogue_page(movies, ordering, search_term, request.GET.get('cursor'), limit)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    results = []
+    for movie in movies:
+        item = {}
+        for field in fields:
+            value = getattr(movie, field)
+            if field == 'image':
+                value = value.url if value else None
+            item[field] = value
+        results.append(item)
+    return JsonResponse({'results': results, 'next_cursor': next_cursor})
+
+def _reviews_page(movie, cursor):
+    # One page of reviews, newest first, with their authors in the same query
+    reviews = Review.objects.filter(movie=movie).select_related('user')
+    try:
+        return keyset_page(reviews, REVIEW_ORDERING, cursor, REVIEWS_PAGE_SIZE)
+    except InvalidCursor:
+        return keyset_page(reviews, REVIEW_ORDERING, None, REVIEWS_PAGE_SIZE)
+
+
+@pagecache.cache_anonymous_page(
+    depends_on=lambda request, id: generations.object_generations(Movie, id),
+    params=('reviews_cursor',),
+)
 def show(request, id):
-    movie = Movie.objects.get(id=id)
-    reviews = Review.objects.filter(movie=movie)
-    
     # Get the current language
     current_language = translation.get_language()
-    
-    # Get translated name, description, author, and genre
-    translated_name = movie.get_translated_name(current_language)
-    translated_description = movie.get_translated_description(current_language)
-    translated_author = movie.get_translated_author(current_language)
-    translated_genre = movie.get_translated_genre(current_language)
+
+    movie = Movie.objects.with_translation(current_language).get(id=id)
+    # Queried only if the review list is rendered, not served from the fragment cache
+    page = SimpleLazyObject(lambda: _reviews_page(movie, request.GET.get('reviews_cursor')))
+    reviews = SimpleLazyObject(lambda: page[0])
+    next_reviews_cursor = SimpleLazyObject(lambda: page[1])
+
+    # Get translated name, description, author, and genre from a single translation lookup
+    translated = movie.get_translated_fields(current_language)
+    translated_name = translated['name']
+    translated_description = translated['description']
+    translated_author = translated['author']
+    translated_genre = translated['genre']
 
     template_data = {}
     template_data['title'] = translated_name
@@ -45,7 +191,12 @@ def show(request, id):
     template_data['translated_author'] = translated_author
     template_data['translated_genre'] = translated_genre
     template_data['reviews'] = reviews
+    template_data['next_reviews_cursor'] = next_reviews_cursor
+    template_data['is_first_reviews_page'] = not request.GET.get('reviews_cursor')
+    template_data['rating_histogram'] = movie.rating_histogram()
     template_data['current_language'] = current_language
+    # Lifetime of the book info and review fragments, versioned by the book's generations
+    template_data['cache_timeout'] = pagecache.get_config()['TIMEOUT']
     return render(request, 'movies/show.html', {'template_data': template_data})
 
 @login_required
@@ -57,7 +208,9 @@ def create_review(request, id):
         review.rating = int(request.POST.get('rating', 0))  # Get rating from form
         review.movie = movie
         review.user = request.user
-        review.save()
+        # The Review signals update the rating summary in the same transaction
+        with transaction.atomic():
+            review.save()
         return redirect('movies.show', id=id)
     else:
         return redirect('movies.show', id=id)
@@ -74,10 +227,11 @@ def edit_review(request, id, review_id):
         template_data['review'] = review
         return render(request, 'movies/edit_review.html', {'template_data': template_data})
     elif request.method == 'POST' and request.POST['comment'] != '':
-        review = Review.objects.get(id=review_id)
-        review.comment = request.POST['comment']
-        review.rating = int(request.POST.get('rating', review.rating))  # Keep old rating if not provided
-        review.save()
+        with transaction.atomic():
+            review = Review.objects.select_for_update().get(id=review_id)
+            review.comment = request.POST['comment']
+            review.rating = int(request.POST.get('rating', review.rating))  # Keep old rating if not provided
+            review.save()
         return redirect('movies.show', id=id)
     else:
         return redirect('movies.show', id=id)
@@ -85,40 +239,73 @@ def edit_review(request, id, review_id):
 @login_required
 def delete_review(request, id, review_id):
     review = get_object_or_404(Review, id=review_id, user=request.user)
-    review.delete()
+    with transaction.atomic():
+        # Only a row actually deleted here reaches post_delete and the rating summary
+        Review.objects.filter(id=review.id).delete()
     return redirect('movies.show', id=id)
 
 
+def _directory_etag(request):
+    request.branch_directory = branches.branch_directory()
+    return request.branch_directory['version']
+
+
+@cache_control(public=True, max_age=branches.DIRECTORY_MAX_AGE)
+@condition(etag_func=_directory_etag)
 def branches_list(request):
-    """Return a JSON list of all library branches with basic info."""
-    branches = LibraryBranch.objects.all()
-    data = []
-    for b in branches:
-        data.append({
-            'id': b.id,
-            'name': b.name,
-            'address': b.address,
-            'latitude': float(b.latitude) if b.latitude is not None else None,
-            'longitude': float(b.longitude) if b.longitude is not None else None,
-            'phone': b.phone,
-        })
-    return JsonResponse({'branches': data})
+    """Return a JSON list of all library branches with basic info.
+
+    Served from a cache invalidated when a branch changes, with an ETag so
+    clients can revalidate with If-None-Match and get a 304.
+    """
+    directory = getattr(request, 'branch_directory', None) or branches.branch_directory()
+    return JsonResponse({'branches': directory['branches']})
 
 
+def _availability_etag(request, id):
+    request.movie_availability = branches.movie_availability(id)
+    return request.movie_availability['version'] if request.movie_availability else None
+
+
+@cache_control(public=True, max_age=branches.AVAILABILITY_MAX_AGE)
+@condition(etag_func=_availability_etag)
 def movie_branches(request, id):
-    """Return branches that have stock for the given movie id."""
-    movie = get_object_or_404(Movie, id=id)
-    stocks = Stock.objects.filter(movie=movie, count__gt=0).select_related('branch')
-    data = []
-    for s in stocks:
-        b = s.branch
-        data.append({
-            'branch_id': b.id,
-            'branch_name': b.name,
-            'address': b.address,
-            'latitude': float(b.latitude) if b.latitude is not None else None,
-            'longitude': float(b.longitude) if b.longitude is not None else None,
-            'phone': b.phone,
-            'count': s.count,
-        })
-    return JsonResponse({'movie_id': movie.id, 'movie_name': movie.name, 'branches': data})
\ No newline at end of file
+    """Return branches that have stock for the given movie id.
+
+    The ETag changes with every stock change of the book (and any branch edit).
+    """
+    availability = getattr(request, 'movie_availability', None) or branches.movie_availability(id)
+    if availability is None:
+        raise Http404('No Movie matches the given query.')
+    if 'lat' in request.GET or 'lon' in request.GET:
+        return nearest_movie_branches(request, availability)
+    return JsonResponse({key: value for key, value in availability.items() if key != 'version'})
+
+
+def nearest_movie_branches(request, availability):
+    """Nearest branches holding the book: GET /movies/<id>/branches/?lat=&lon=&radius=&limit="""
+    try:
+        latitude = float(request.GET['lat'])
+        longitude = float(request.GET['lon'])
+        radius = float(request.GET.get('radius', NEAREST_DEFAULT_RADIUS_KM))
+        limit = int(request.GET.get('limit', NEAREST_DEFAULT_LIMIT))
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'lat and lon are required; lat, lon and radius must be numbers and limit an integer'}, status=400)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return JsonResponse({'error': 'lat must be within [-90, 90] and lon within [-180, 180]'}, status=400)
+    if not 0 < radius <= NEAREST_MAX_RADIUS_KM:
+        return JsonResponse({'error': f'radius must be between 0 and {NEAREST_MAX_RADIUS_KM} km'}, status=400)
+    limit = min(max(limit, 1), NEAREST_MAX_LIMIT)
+
+    return JsonResponse({
+        'movie_id': availability['movie_id'],
+        'movie_name': availability['movie_name'],
+        'branches': branches.nearest_branches(availability['movie_id'], latitude, longitude, radius, limit),
+    })
+
+
+def cover_image(request, path):
+    """Serve a cover derivative (see images.py) with a long-lived, immutable Cache-Control."""
+    response = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, images.COVER_DIR))
+    patch_cache_control(response, public=True, max_age=COVER_MAX_AGE, immutable=True)
+    return response
@@ -44,15 +44,21 @@ INSTALLED_APPS = [
     'cart',
     "petitions",
     'translations',
+    'profiling',
+    'cacheversions',
+    'sqlitetuning',
 ]
 
 MIDDLEWARE = [
+    'profiling.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
+    'translations.preferences.LanguagePreferenceMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cart.middleware.CartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,6 +76,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'movies.pagecache.csrf_placeholder',
             ],
         },
     },
@@ -81,10 +88,22 @@ WSGI_APPLICATION = 'moviesstore.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# SQLite production profile: persistent, health-checked connections and write
+# transactions that take the lock up front with BEGIN IMMEDIATE. The connection
+# PRAGMAs (WAL, synchronous, busy_timeout, mmap, cache) are in SQLITE_TUNING
+# below; see sqlitetuning/pragmas.py. `python -m benchmarks.contention` compares
+# this profile with the plain defaults under concurrent writes.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Django 5.1+
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
     }
 }
 
@@ -155,4 +174,110 @@ LOCALE_PATHS = [
 ]
 
 USE_I18N = True
-USE_L10N = True
\ No newline at end of file
+USE_L10N = True
+
+# Translation cache: per-process LRU in front of the CachedTranslation table,
+# optionally backed by a shared cache from CACHES (see translations/cache.py)
+TRANSLATION_CACHE = {
+    'LRU_SIZE': 10000,
+    'LRU_TTL': 3600,
+    'BACKEND': None,
+    'TIMEOUT': 86400,
+}
+
+# LibreTranslate client: pooled requests.Session for WSGI, pooled httpx.AsyncClient
+# for ASGI (see translations/upstream.py)
+TRANSLATION_UPSTREAM = {
+    'URL': 'https://libretranslate.com/translate',
+    'TIMEOUT': 10,
+    'BATCH_SIZE': 50,
+    'POOL_SIZE': 20,
+    'MAX_CONCURRENCY': 10,
+}
+
+# Queue newly created books for background machine translation into every LANGUAGES
+# entry (see translations/pipeline.py). `manage.py pretranslate_catalogue` does the same
+# for the whole catalogue in a separate process.
+PRETRANSLATE_ON_SAVE = False
+
+# Per-request profiling: view, wall time, query count, DB time and duplicate SQL
+# (see profiling/middleware.py). Summarize the log with `manage.py perf_report`.
+PROFILING = {
+    'ENABLED': None,             # None: only while DEBUG is on
+    'SAMPLE_RATE': 1.0,          # fraction of requests profiled
+    'LOG_FILE': os.path.join(BASE_DIR, 'perf.jsonl'),
+    'DUPLICATE_THRESHOLD': 3,    # same statement this many times in one request is flagged
+    'SERVER_TIMING': True,       # add a Server-Timing header to profiled responses
+}
+
+# PRAGMAs run on every new SQLite connection (see sqlitetuning/pragmas.py)
+SQLITE_TUNING = {
+    'ENABLED': True,
+    'PRAGMAS': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': 5000,
+        'mmap_size': 128 * 1024 * 1024,
+        'cache_size': -20000,
+    },
+}
+
+# Every worker process must see the same cache: a generation bump in one worker
+# has to invalidate the pages the others cached (see cacheversions/checks.py), and
+# logged-in carts live there (see cart/storage.py). SQLite keeps the site on one
+# host, where a file-based cache is shared by all workers and survives restarts.
+# Use Redis or Memcached instead when serving from several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Logged-in carts: a directory of their own, so page churn never culls a cart
+    'carts': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'carts',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000000,
+        },
+    },
+}
+
+# The test suite runs against the same backends in a temporary directory of its
+# own, never the caches above (see moviesstore/test_runner.py)
+TEST_RUNNER = 'moviesstore.test_runner.TestRunner'
+
+# Generation counters behind versioned cache keys, bumped when tracked models
+# change (see cacheversions/generations.py)
+CACHE_VERSIONS = {
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'generation',
+}
+
+# Anonymous catalogue, book and home pages are cached whole, logged-in book pages
+# per fragment, under keys versioned by the generations of the data they show
+# (see movies/pagecache.py)
+PAGE_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 24 * 60 * 60,
+}
+
+# Carts stay out of the database while shopping: a signed cookie for anonymous
+# visitors, the shared 'carts' cache for logged-in users; a Cart row is written
+# only at checkout (see cart/storage.py). If CACHE_ALIAS names a per-process cache
+# (LocMemCache), logged-in carts are kept in the session instead.
+CART = {
+    'ANONYMOUS_BACKEND': 'cart.storage.CookieCartBackend',
+    'AUTHENTICATED_BACKEND': 'cart.storage.CacheCartBackend',
+    'COOKIE_NAME': 'cart',
+    'COOKIE_AGE': 60 * 60 * 24 * 14,
+    'CACHE_ALIAS': 'carts',
+    'CACHE_TIMEOUT': 60 * 60 * 24 * 30,
+    'MAX_ITEMS': 50,
+}
+
+# Sessions now only carry the login: read them through the cache, write through to the DB
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
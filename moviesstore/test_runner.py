@@ -0,0 +1,30 @@
+"""Test runner that keeps the suite away from the development caches.
+
+The default and 'carts' caches are file caches under var/ (see settings.py),
+and the tests clear them freely. Each run gets its own temporary directory
+instead, with the same backends, so the tests still exercise shared caches
+without wiping the developer's pages, generations or carts.
+"""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='moviesstore-test-cache-')
+        self.cache_override = override_settings(CACHES={
+            alias: {**config, 'LOCATION': os.path.join(self.cache_dir, alias)}
+            for alias, config in settings.CACHES.items()
+        })
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
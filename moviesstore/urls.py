@@ -15,16 +15,25 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf.urls.static import static
 from django.conf import settings
 from django.conf.urls.i18n import i18n_patterns
+from movies.images import COVER_DIR
+from movies.views import cover_image
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('i18n/', include('django.conf.urls.i18n')),
 ]
 
+if settings.DEBUG:
+    # Resized cover images with far-future cache headers. In production the web
+    # server serves MEDIA_ROOT itself, with the same headers (see README.md).
+    urlpatterns += [
+        re_path(rf'^{settings.MEDIA_URL.lstrip("/")}{COVER_DIR}/(?P<path>.+)$', cover_image, name='movies.cover_image'),
+    ]
+
 urlpatterns += i18n_patterns(
     path('', include('home.urls')),
     path('movies/', include('movies.urls')),
@@ -0,0 +1,73 @@
+"""Petition leaderboard: ranking by total yes votes or by yes votes in a recent window.
+
+Pages are keyset-paginated on (votes, id) and cached under the Petition cache
+generation, which every vote bumps (see signals.py), so a burst of staff page
+views costs one ranking query per page and a new vote shows up at once.
+Trending pages also expire after TRENDING_CACHE_TTL seconds, as their window
+moves with the clock even when nobody votes.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from cacheversions import generations
+from movies.pagination import keyset_page
+
+from .models import Petition
+
+LEADERBOARD_CACHE_TIMEOUT = 24 * 60 * 60
+TRENDING_CACHE_TTL = 60
+
+# Trending windows selectable with ?window=
+TRENDING_WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+}
+DEFAULT_WINDOW = "24h"
+
+TOTAL_ORDERING = ("-yes_votes", "-id")
+TRENDING_ORDERING = ("-window_votes", "-id")
+
+
+def ranked_petitions(mode, window=DEFAULT_WINDOW):
+    """Return the ranked queryset and its keyset ordering for a leaderboard mode."""
+    if mode == "trending":
+        since = timezone.now() - TRENDING_WINDOWS[window]
+        petitions = Petition.objects.filter(
+            votes__is_yes=True, votes__voted_at__gte=since
+        ).annotate(window_votes=Count("votes"))
+        return petitions, TRENDING_ORDERING
+    return Petition.objects.filter(yes_votes__gt=0), TOTAL_ORDERING
+
+
+def leaderboard_page(mode, window=DEFAULT_WINDOW, cursor=None, limit=20):
+    """Return {"results": [...], "next_cursor": ...} for one page, cached until the next vote.
+
+    Raises movies.pagination.InvalidCursor for a bad cursor.
+    """
+    key = generations.make_key(
+        "petitions:leaderboard", [generations.model_generation(Petition)], mode, window, limit, cursor or ""
+    )
+    page = cache.get(key)
+    if page is None:
+        petitions, ordering = ranked_petitions(mode, window)
+        rows, next_cursor = keyset_page(petitions.select_related("created_by"), ordering, cursor, limit)
+        page = {
+            "results": [
+                {
+                    "id": p.pk,
+                    "title": p.title,
+                    "movie_title": p.movie_title,
+                    "created_by": p.created_by.username,
+                    "yes_votes": p.yes_votes,
+                    "window_votes": getattr(p, "window_votes", None),
+                }
+                for p in rows
+            ],
+            "next_cursor": next_cursor,
+        }
+        cache.set(key, page, TRENDING_CACHE_TTL if mode == "trending" else LEADERBOARD_CACHE_TIMEOUT)
+    return page
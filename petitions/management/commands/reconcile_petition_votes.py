@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from petitions.models import Petition
+
+
+class Command(BaseCommand):
+    help = "Recount Petition.yes_votes from the votes table and fix any drift."
+
+    def handle(self, *args, **options):
+        fixed = Petition.objects.reconcile_yes_votes()
+        if fixed:
+            self.stdout.write(self.style.WARNING(f"Fixed yes_votes on {len(fixed)} petition(s): {fixed}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("All petition vote counts are correct."))
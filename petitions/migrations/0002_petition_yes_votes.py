@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_yes_votes(apps, schema_editor):
+    Petition = apps.get_model('petitions', 'Petition')
+    PetitionVote = apps.get_model('petitions', 'PetitionVote')
+    yes_votes = PetitionVote.objects.filter(petition=OuterRef('pk'), is_yes=True).values('petition').annotate(n=Count('pk')).values('n')
+    Petition.objects.update(yes_votes=Coalesce(Subquery(yes_votes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('petitions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='petition',
+            name='yes_votes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_yes_votes, migrations.RunPython.noop),
+    ]
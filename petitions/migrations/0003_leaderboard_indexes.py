@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('petitions', '0002_petition_yes_votes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='petition',
+            index=models.Index(fields=['-yes_votes', '-id'], name='petition_yes_votes_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='petitionvote',
+            index=models.Index(fields=['is_yes', 'voted_at', 'petition'], name='petition_vote_trending_idx'),
+        ),
+    ]
@@ -1,5 +1,31 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from cacheversions import generations
+
+
+class PetitionQuerySet(models.QuerySet):
+    def with_counted_yes_votes(self):
+        """Annotate the live yes-vote count (used to reconcile the yes_votes counter)."""
+        return self.annotate(counted_yes_votes=Count("votes", filter=Q(votes__is_yes=True)))
+
+    def reconcile_yes_votes(self):
+        """Reset yes_votes from the vote table where it has drifted. Returns the petitions fixed."""
+        drifted = list(
+            self.with_counted_yes_votes().exclude(yes_votes=F("counted_yes_votes")).values_list("pk", flat=True)
+        )
+        if drifted:
+            yes_votes = (
+                PetitionVote.objects.filter(petition=OuterRef("pk"), is_yes=True)
+                .values("petition").annotate(n=Count("pk")).values("n")
+            )
+            generations.update(
+                self.model.objects.filter(pk__in=drifted), pks=drifted, yes_votes=Coalesce(Subquery(yes_votes), 0)
+            )
+        return drifted
+
 
 class Petition(models.Model):
     title = models.CharField(max_length=200)
@@ -7,9 +33,19 @@ class Petition(models.Model):
     description = models.TextField(blank=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="petitions")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Denormalized count of yes votes, updated with F() by the PetitionVote signals (see signals.py)
+    yes_votes = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PetitionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # leaderboard by total yes votes
+            models.Index(fields=["-yes_votes", "-id"], name="petition_yes_votes_rank_idx"),
+        ]
 
     def yes_count(self):
-        return self.votes.filter(is_yes=True).count()
+        return self.yes_votes
 
     def __str__(self):
         return f"{self.movie_title} (#{self.pk})"
@@ -22,6 +58,10 @@ class PetitionVote(models.Model):
 
     class Meta:
         unique_together = ("petition", "user")  # one vote per user per petition
+        indexes = [
+            # trending: yes votes cast since a point in time, grouped by petition
+            models.Index(fields=["is_yes", "voted_at", "petition"], name="petition_vote_trending_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} -> {self.petition} : {'YES' if self.is_yes else 'NO'}"
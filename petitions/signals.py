@@ -0,0 +1,46 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from cacheversions import generations
+
+from .models import Petition, PetitionVote
+
+# Versions the cached leaderboard pages (see leaderboard.py); a vote changes its petition's count
+generations.track(Petition)
+generations.track(PetitionVote, parents=("petition",))
+
+
+def _count_yes_votes(petition_id, delta):
+    generations.update(
+        Petition.objects.filter(pk=petition_id, yes_votes__gte=max(-delta, 0)), pks=[petition_id],
+        yes_votes=F("yes_votes") + delta,
+    )
+
+
+# Petition.yes_votes follows every PetitionVote write from here, whatever made it
+# (the vote view, the admin, the shell, a user deletion). Raw saves (loaddata) are
+# skipped: a fixture carries its petitions' counts along with their votes.
+
+@receiver(pre_save, sender=PetitionVote)
+def remember_previous_answer(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._was_yes = False
+    else:
+        instance._was_yes = bool(
+            PetitionVote.objects.filter(pk=instance.pk).values_list("is_yes", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=PetitionVote)
+def count_saved_vote(sender, instance, raw=False, **kwargs):
+    """Count a new yes vote, or an existing vote switched to or from yes."""
+    delta = int(instance.is_yes) - int(getattr(instance, "_was_yes", False))
+    if not raw and delta:
+        _count_yes_votes(instance.petition_id, delta)
+
+
+@receiver(post_delete, sender=PetitionVote)
+def uncount_deleted_vote(sender, instance, **kwargs):
+    if instance.is_yes:
+        _count_yes_votes(instance.petition_id, -1)
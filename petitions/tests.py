@@ -1,3 +1,147 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
+from io import StringIO
+
+from movies.pagination import encode_cursor
+
+from .leaderboard import leaderboard_page
+from .models import Petition, PetitionVote
+
+
+class PetitionVoteCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="voter", password="pw")
+        self.client.login(username="voter", password="pw")
+        self.petitions = [
+            Petition.objects.create(title=f"Add {i}", movie_title=f"Book {i}", created_by=self.user)
+            for i in range(3)
+        ]
+
+    def vote(self, petition):
+        return self.client.post(f"/en/petitions/{petition.pk}/vote/")
+
+    def test_vote_increments_counter_once_per_user(self):
+        self.vote(self.petitions[0])
+        self.vote(self.petitions[0])
+        self.petitions[0].refresh_from_db()
+        self.assertEqual(self.petitions[0].yes_votes, 1)
+        self.assertEqual(PetitionVote.objects.count(), 1)
+
+    def test_listing_query_count_is_independent_of_petitions(self):
+        for petition in self.petitions:
+            self.vote(petition)
+        url = "/en/petitions/"
+        self.client.get(url)  # warm up the session
+        with self.assertNumQueries(2):  # user, petitions (the session is read from the cache)
+            response = self.client.get(url)
+        self.assertContains(response, "(Yes: 1)", count=3)
+
+    def test_deleting_vote_decrements_counter(self):
+        self.vote(self.petitions[0])
+        PetitionVote.objects.get().delete()
+        self.petitions[0].refresh_from_db()
+        self.assertEqual(self.petitions[0].yes_votes, 0)
+
+    def test_votes_written_outside_the_view_are_counted(self):
+        petition = self.petitions[0]
+        vote = PetitionVote.objects.create(petition=petition, user=self.user, is_yes=True)
+        PetitionVote.objects.create(petition=petition, user=User.objects.create_user(username="no"), is_yes=False)
+        petition.refresh_from_db()
+        self.assertEqual(petition.yes_votes, 1)
+
+        vote.is_yes = False
+        vote.save()
+        petition.refresh_from_db()
+        self.assertEqual(petition.yes_votes, 0)
+
+        vote.is_yes = True
+        vote.save()
+        vote.delete()
+        petition.refresh_from_db()
+        self.assertEqual(petition.yes_votes, 0)
+        self.assertEqual(Petition.objects.all().reconcile_yes_votes(), [])
+
+    def test_reconcile_command_fixes_drift(self):
+        self.vote(self.petitions[0])
+        Petition.objects.filter(pk=self.petitions[1].pk).update(yes_votes=F("yes_votes") + 5)
+        out = StringIO()
+        call_command("reconcile_petition_votes", stdout=out)
+        self.assertIn("1 petition(s)", out.getvalue())
+        counts = dict(Petition.objects.values_list("pk", "yes_votes"))
+        self.assertEqual(counts, {self.petitions[0].pk: 1, self.petitions[1].pk: 0, self.petitions[2].pk: 0})
+
+
+class PetitionLeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        voters = [User.objects.create_user(username=f"u{i}", password="pw") for i in range(3)]
+        # popular: 3 old votes; rising: 2 recent votes; quiet: 1 recent vote
+        cls.popular, cls.rising, cls.quiet = [
+            Petition.objects.create(title=name, movie_title=name, created_by=voters[0])
+            for name in ("popular", "rising", "quiet")
+        ]
+        for petition, count in ((cls.popular, 3), (cls.rising, 2), (cls.quiet, 1)):
+            for voter in voters[:count]:
+                PetitionVote.objects.create(petition=petition, user=voter)
+            Petition.objects.filter(pk=petition.pk).update(yes_votes=count)
+        PetitionVote.objects.filter(petition=cls.popular).update(voted_at=timezone.now() - timedelta(days=3))
+        cls.user = voters[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def api(self, **params):
+        return self.client.get("/en/petitions/api/leaderboard/", params)
+
+    def test_total_ranking(self):
+        data = self.api().json()
+        self.assertEqual([r["movie_title"] for r in data["results"]], ["popular", "rising", "quiet"])
+
+    def test_trending_ranking_uses_window(self):
+        data = self.api(mode="trending", window="24h").json()
+        self.assertEqual([(r["movie_title"], r["window_votes"]) for r in data["results"]], [("rising", 2), ("quiet", 1)])
+        data = self.api(mode="trending", window="7d").json()
+        self.assertEqual([r["movie_title"] for r in data["results"]], ["popular", "rising", "quiet"])
+
+    def test_keyset_pages(self):
+        titles, cursor = [], None
+        for mode in ("total", "trending"):
+            titles, cursor = [], None
+            while True:
+                params = {"mode": mode, "window": "7d", "limit": 1}
+                if cursor:
+                    params["cursor"] = cursor
+                data = self.api(**params).json()
+                titles += [r["movie_title"] for r in data["results"]]
+                cursor = data["next_cursor"]
+                if not cursor:
+                    break
+            self.assertEqual(titles, ["popular", "rising", "quiet"])
+
+    def test_pages_are_cached(self):
+        leaderboard_page("trending")
+        with self.assertNumQueries(0):
+            leaderboard_page("trending")
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.api(mode="worst").status_code, 400)
+        self.assertEqual(self.api(window="1y").status_code, 400)
+        self.assertEqual(self.api(cursor="junk").status_code, 400)
+        for values in (["x", "abc"], [None, 1]):
+            self.assertEqual(self.api(cursor=encode_cursor(values)).status_code, 400)
+            self.assertEqual(self.api(mode="trending", cursor=encode_cursor(values)).status_code, 400)
 
-# Create your tests here.
+    def test_html_leaderboard(self):
+        response = self.client.get("/en/petitions/leaderboard/", {"mode": "trending"})
+        self.assertContains(response, "rising")
+        self.assertNotContains(response, "popular")
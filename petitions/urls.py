@@ -5,6 +5,8 @@ app_name = "petitions"
 
 urlpatterns = [
     path("", views.petition_list_create, name="index"),
+    path("leaderboard/", views.petition_leaderboard, name="leaderboard"),
+    path("api/leaderboard/", views.petition_leaderboard_api, name="leaderboard_api"),
     path("<int:pk>/", views.petition_detail, name="detail"),
     path("<int:pk>/vote/", views.petition_vote, name="vote"),
 ]
@@ -1,7 +1,10 @@
 from django.contrib.auth.decorators import login_required
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
+from django.http import JsonResponse
+from movies.pagination import InvalidCursor
+from .leaderboard import DEFAULT_WINDOW, TRENDING_WINDOWS, leaderboard_page
 from .models import Petition, PetitionVote
 from .forms import PetitionForm
 
@@ -24,15 +27,55 @@ def petition_list_create(request):
 def petition_detail(request, pk):
     petition = get_object_or_404(Petition, pk=pk)
     user_has_voted = petition.votes.filter(user=request.user).exists() if request.user.is_authenticated else False
-    return render(request, "petitions/detail.html", {"petition": petition, "yes_count": petition.yes_count(), "user_has_voted": user_has_voted})
+    return render(request, "petitions/detail.html", {"petition": petition, "yes_count": petition.yes_votes, "user_has_voted": user_has_voted})
 
 @login_required
 def petition_vote(request, pk):
     petition = get_object_or_404(Petition, pk=pk)
     if request.method == "POST":
         try:
-            PetitionVote.objects.create(petition=petition, user=request.user, is_yes=True)
+            with transaction.atomic():
+                # Petition.yes_votes is counted by the PetitionVote signals (see signals.py)
+                PetitionVote.objects.create(petition=petition, user=request.user, is_yes=True)
             messages.success(request, "Vote recorded!")
         except IntegrityError:
             messages.info(request, "You already voted on this petition.")
     return redirect("petitions:detail", pk=pk)
+
+def _leaderboard_params(request):
+    mode = request.GET.get("mode", "total")
+    window = request.GET.get("window", DEFAULT_WINDOW)
+    if mode not in ("total", "trending") or window not in TRENDING_WINDOWS:
+        return None
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 100)
+    except ValueError:
+        return None
+    return mode, window, request.GET.get("cursor"), limit
+
+@login_required
+def petition_leaderboard(request):
+    params = _leaderboard_params(request) or ("total", DEFAULT_WINDOW, None, 20)
+    mode, window, cursor, limit = params
+    try:
+        page = leaderboard_page(mode, window, cursor, limit)
+    except InvalidCursor:
+        page = leaderboard_page(mode, window, None, limit)
+    return render(request, "petitions/leaderboard.html", {
+        "mode": mode,
+        "window": window,
+        "windows": list(TRENDING_WINDOWS),
+        "page": page,
+    })
+
+@login_required
+def petition_leaderboard_api(request):
+    params = _leaderboard_params(request)
+    if params is None:
+        return JsonResponse({"error": "Invalid mode, window or limit"}, status=400)
+    mode, window, cursor, limit = params
+    try:
+        page = leaderboard_page(mode, window, cursor, limit)
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"mode": mode, "window": window if mode == "trending" else None, **page})
@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from profiling.recorder import get_config, percentile, read_profiles
+
+
+class Command(BaseCommand):
+    help = 'Summarize the request profile log: latency and query-count percentiles per view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Profile log to read (defaults to PROFILING["LOG_FILE"])')
+        parser.add_argument('--view', help='Only report this view name')
+        parser.add_argument('--sort', choices=('p95', 'requests', 'queries'), default='p95')
+
+    def handle(self, *args, **options):
+        path = options['file'] or get_config()['LOG_FILE']
+        if not path:
+            raise CommandError('No profile log configured; pass --file or set PROFILING["LOG_FILE"].')
+
+        by_view = defaultdict(list)
+        try:
+            for profile in read_profiles(path):
+                view = profile.get('view') or profile.get('path')
+                if options['view'] is None or view == options['view']:
+                    by_view[view].append(profile)
+        except FileNotFoundError:
+            raise CommandError(f'No profile log at {path}. Is PROFILING enabled?')
+        if not by_view:
+            self.stdout.write('No profiled requests.')
+            return
+
+        rows = []
+        for view, profiles in by_view.items():
+            ms = [p['ms'] for p in profiles]
+            queries = [p['queries'] for p in profiles]
+            rows.append({
+                'view': view,
+                'requests': len(profiles),
+                'p50': percentile(ms, 50),
+                'p95': percentile(ms, 95),
+                'p99': percentile(ms, 99),
+                'queries': percentile(queries, 50),
+                'max_queries': max(queries),
+                'db_ms': percentile([p['db_ms'] for p in profiles], 50),
+                'n_plus_one': sum(1 for p in profiles if p.get('duplicates')),
+            })
+        sort_key = {'p95': 'p95', 'requests': 'requests', 'queries': 'max_queries'}[options['sort']]
+        rows.sort(key=lambda row: row[sort_key], reverse=True)
+
+        header = f'{"view":<36} {"reqs":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8} {"max q":>6} {"db ms":>7} {"N+1":>5}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in rows:
+            self.stdout.write(
+                f'{row["view"][:36]:<36} {row["requests"]:>6} {row["p50"]:>8.1f} {row["p95"]:>8.1f} {row["p99"]:>8.1f} '
+                f'{row["queries"]:>8} {row["max_queries"]:>6} {row["db_ms"]:>7.1f} {row["n_plus_one"]:>5}'
+            )
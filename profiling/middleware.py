@@ -0,0 +1,58 @@
+import logging
+import random
+import time
+
+from django.utils import timezone
+
+from .recorder import QueryRecorder, append_profile, get_config
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """Record view name, wall time, query count, DB time and duplicate SQL per request.
+
+    Configured through settings.PROFILING (see recorder.DEFAULTS). Each profiled
+    request is appended to LOG_FILE, and optionally reported to the browser in a
+    Server-Timing header. Requests that repeat one statement DUPLICATE_THRESHOLD
+    times or more are logged as likely N+1 queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config['ENABLED'] or random.random() >= config['SAMPLE_RATE']:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else None
+        duplicates = recorder.duplicates(config['DUPLICATE_THRESHOLD'])
+        if duplicates:
+            sql, times = duplicates[0]
+            logger.warning('%s ran the same query %d times (likely N+1): %s', view or request.path, times, sql)
+
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'total;dur={elapsed * 1000:.1f}, db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+            )
+        if config['LOG_FILE']:
+            append_profile(config['LOG_FILE'], {
+                'at': timezone.now().isoformat(),
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'ms': round(elapsed * 1000, 3),
+                'queries': recorder.count,
+                'db_ms': round(recorder.duration * 1000, 3),
+                'duplicates': [{'sql': sql, 'times': times} for sql, times in duplicates[:5]],
+            })
+        return response
@@ -0,0 +1,89 @@
+"""Per-request database instrumentation and the profile log.
+
+`QueryRecorder` is installed with `connection.execute_wrapper` on every
+database connection for the duration of a request (or a test block). It
+counts statements and their time, and keeps how often each SQL string ran:
+the same parametrized SQL executed many times in one request is the
+signature of an N+1 loop.
+
+Profiles are appended to PROFILING['LOG_FILE'] as JSON lines, read back by
+`manage.py perf_report`.
+"""
+import json
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+DEFAULTS = {
+    # None: profile only while settings.DEBUG is on
+    'ENABLED': None,
+    'SAMPLE_RATE': 1.0,
+    'LOG_FILE': None,
+    'DUPLICATE_THRESHOLD': 3,
+    'SERVER_TIMING': True,
+}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+    if config['ENABLED'] is None:
+        config['ENABLED'] = settings.DEBUG
+    return config
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def duplicates(self, threshold):
+        """[(sql, times), ...] for statements executed at least `threshold` times, most frequent first."""
+        return [(sql, times) for sql, times in self.statements.most_common() if times >= threshold]
+
+
+_log_lock = threading.Lock()
+
+
+def append_profile(path, profile):
+    line = json.dumps(profile, separators=(',', ':')) + '\n'
+    with _log_lock, open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+def read_profiles(path):
+    """Yield the profiles in a log file, skipping lines that are not valid JSON."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list of numbers."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
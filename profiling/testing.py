@@ -0,0 +1,40 @@
+"""Query budgets for hot views, for use in tests.
+
+    class MyTests(QueryBudgetMixin, TestCase):
+        def test_show(self):
+            self.assertQueryBudget('/en/movies/1/', 'movies.show')
+
+A budget is the most queries a view may run for one request, whatever the size
+of the data behind it. The assertion also fails when any statement repeats
+PROFILING['DUPLICATE_THRESHOLD'] times, which is how N+1 loops show up.
+"""
+from .recorder import QueryRecorder, get_config
+
+# Including the session and user lookups of a logged-in request
+QUERY_BUDGETS = {
+    'movies.index': 5,  # with a search: one FTS lookup
+    'movies.show': 5,
+    'petitions:index': 3,
+    'cart.index': 3,
+    'accounts.orders': 3,
+}
+
+
+class QueryBudgetMixin:
+    def assertQueryBudget(self, url, view_name, budget=None, **request_kwargs):
+        """GET `url`, check it resolves to `view_name` and stays within its query budget."""
+        budget = QUERY_BUDGETS[view_name] if budget is None else budget
+        recorder = QueryRecorder()
+        with recorder.record():
+            response = self.client.get(url, **request_kwargs)
+        self.assertEqual(response.status_code, 200, f'{url} returned {response.status_code}')
+        self.assertEqual(response.resolver_match.view_name, view_name)
+
+        statements = '\n'.join(f'  {times}x {sql}' for sql, times in recorder.statements.most_common())
+        self.assertLessEqual(
+            recorder.count, budget,
+            f'{view_name} ran {recorder.count} queries (budget {budget}):\n{statements}'
+        )
+        duplicates = recorder.duplicates(get_config()['DUPLICATE_THRESHOLD'])
+        self.assertFalse(duplicates, f'{view_name} repeats a query (N+1?):\n{statements}')
+        return response
@@ -0,0 +1,124 @@
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from cart.models import Item, Order
+from cart.storage import save_user_cart
+from movies.models import LibraryBranch, Movie, MovieTranslation, Review, Stock
+from petitions.models import Petition
+
+from .recorder import QueryRecorder, percentile
+from .testing import QueryBudgetMixin
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Hot views stay within their query budget with plenty of rows behind them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', password='pw')
+        branch = LibraryBranch.objects.create(name='Main')
+        order = Order.objects.create(user=cls.user, total_items=30)
+        for i in range(30):
+            movie = Movie.objects.create(name=f'Book {i}', description='desc')
+            MovieTranslation.objects.create(movie=movie, language_code='es', name=f'Libro {i}', description='desc')
+            Stock.objects.create(movie=movie, branch=branch, count=2)
+            Item.objects.create(order=order, movie=movie, branch=branch, quantity=1)
+            Petition.objects.create(movie_title=f'Book {i}', created_by=cls.user)
+        cls.movie = Movie.objects.first()
+        for i in range(30):
+            author = User.objects.create(username=f'critic{i}')
+            Review.objects.create(movie=cls.movie, user=author, comment='ok', rating=4)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_movies_index(self):
+        self.assertQueryBudget('/en/movies/', 'movies.index')
+        self.assertQueryBudget('/es/movies/?search=book', 'movies.index')
+
+    def test_movies_show(self):
+        self.assertQueryBudget(f'/es/movies/{self.movie.id}/', 'movies.show')
+
+    def test_petitions_index(self):
+        self.assertQueryBudget('/en/petitions/', 'petitions:index')
+
+    def test_cart_index(self):
+        movies = Movie.objects.order_by('id')[:10]
+        save_user_cart(self.user.pk, {str(m.id): '1' for m in movies})
+        response = self.assertQueryBudget('/en/cart/', 'cart.index')
+        self.assertEqual(len(response.context['template_data']['movies_in_cart']), 10)
+        for movie in movies:
+            self.assertContains(response, f'<td>{movie.name}</td>')
+
+    def test_accounts_orders(self):
+        self.assertQueryBudget('/en/accounts/orders/', 'accounts.orders')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.log_file = os.path.join(tmp.name, 'perf.jsonl')
+        override = override_settings(PROFILING={'ENABLED': True, 'LOG_FILE': self.log_file, 'DUPLICATE_THRESHOLD': 3})
+        override.enable()
+        self.addCleanup(override.disable)
+        Movie.objects.create(name='Dune', description='desc')
+
+    def profiles(self):
+        with open(self.log_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_records_view_timing_and_queries(self):
+        response = self.client.get('/en/movies/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        [profile] = self.profiles()
+        self.assertEqual(profile['view'], 'movies.index')
+        self.assertEqual(profile['status'], 200)
+        self.assertGreater(profile['queries'], 0)
+        self.assertEqual(profile['duplicates'], [])
+
+    def test_recorder_counts_repeated_statements(self):
+        recorder = QueryRecorder()
+        with recorder.record():
+            for movie_id in (1, 2, 3):
+                Movie.objects.filter(id=movie_id).exists()
+        self.assertEqual(recorder.count, 3)
+        [(sql, times)] = recorder.duplicates(3)
+        self.assertEqual(times, 3)
+
+    def test_flags_repeated_statements(self):
+        movie = Movie.objects.get()
+        # with a threshold of 1 every statement counts as repeated
+        with self.assertLogs('profiling.middleware', 'WARNING') as logs:
+            with override_settings(PROFILING={'ENABLED': True, 'LOG_FILE': self.log_file, 'DUPLICATE_THRESHOLD': 1}):
+                self.client.get(f'/en/movies/{movie.id}/')
+        self.assertIn('likely N+1', logs.output[0])
+        self.assertTrue(self.profiles()[0]['duplicates'])
+
+    def test_disabled_by_default_outside_debug(self):
+        with override_settings(PROFILING={'LOG_FILE': self.log_file}):
+            response = self.client.get('/en/movies/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertFalse(os.path.exists(self.log_file))
+
+    def test_perf_report(self):
+        for _ in range(3):
+            self.client.get('/en/movies/')
+        self.client.get('/en/petitions/')
+        out = io.StringIO()
+        call_command('perf_report', '--sort', 'requests', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('p95 ms', lines[0])
+        self.assertTrue(lines[2].startswith('movies.index'))
+        self.assertIn('petitions:index', out.getvalue())
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 99)), (50, 95, 99))
+        self.assertEqual(percentile([7], 99), 7)
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class SqliteTuningConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'sqlitetuning'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .pragmas import configure_connection
+
+        connection_created.connect(configure_connection, dispatch_uid='sqlitetuning.configure_connection')
@@ -0,0 +1,67 @@
+"""Production PRAGMAs for SQLite connections.
+
+The defaults (rollback journal, synchronous=FULL, no busy timeout at the
+SQLite level) make every writer block every reader, fsync on every commit
+and fail fast with "database is locked" when two writers meet. Each new
+connection is set up instead with:
+
+- journal_mode=WAL: readers no longer wait for writers, and a commit is an
+  append to the write-ahead log.
+- synchronous=NORMAL: fsync at checkpoints rather than at every commit.
+  This is safe with WAL; a power cut can lose the last commits but cannot
+  corrupt the database.
+- busy_timeout: a writer waits for the lock instead of failing at once.
+- mmap_size and cache_size: reads are served from memory-mapped pages and
+  a larger page cache.
+
+The PRAGMAs only work together with the DATABASES settings next to them:
+- OPTIONS['transaction_mode'] = 'IMMEDIATE' starts atomic() blocks with
+  BEGIN IMMEDIATE. A transaction then takes the write lock up front, where
+  busy_timeout can wait for it. A deferred transaction tries to upgrade a
+  read lock in the middle, and SQLite fails that at once to avoid a
+  deadlock.
+- CONN_MAX_AGE with CONN_HEALTH_CHECKS keeps connections, and their page
+  cache and mmap, across requests.
+
+Configured by settings.SQLITE_TUNING (see DEFAULTS).
+"""
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'PRAGMAS': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': 5000,           # ms
+        'mmap_size': 128 * 1024 * 1024,  # bytes
+        'cache_size': -20000,           # negative: KiB, i.e. about 20 MB per connection
+    },
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'SQLITE_TUNING', {})}
+
+
+def apply_pragmas(connection, pragmas):
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver: tune every new SQLite connection."""
+    config = get_config()
+    if connection.vendor == 'sqlite' and config['ENABLED']:
+        apply_pragmas(connection, config['PRAGMAS'])
+
+
+def current_pragmas(connection, names):
+    """{name: value} as SQLite reports them, for checks and the contention benchmark."""
+    values = {}
+    with connection.cursor() as cursor:
+        for name in names:
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            values[name] = row[0] if row else None
+    return values
@@ -0,0 +1,47 @@
+import os
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from .pragmas import current_pragmas
+
+NAMES = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size')
+
+
+class PragmaTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tuning.sqlite3')
+
+    def open(self):
+        """A new connection to a file database, configured as the default one is."""
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': self.path}, alias='tuning')
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def test_new_connections_get_the_production_pragmas(self):
+        pragmas = current_pragmas(self.open(), NAMES)
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+        self.assertEqual(pragmas['busy_timeout'], 5000)
+        self.assertEqual(pragmas['cache_size'], -20000)
+
+    @override_settings(SQLITE_TUNING={'ENABLED': False})
+    def test_disabled_leaves_sqlite_defaults(self):
+        pragmas = current_pragmas(self.open(), NAMES)
+        self.assertEqual(pragmas['journal_mode'], 'delete')
+        self.assertEqual(pragmas['synchronous'], 2)  # FULL
+
+    @override_settings(SQLITE_TUNING={'PRAGMAS': {'synchronous': 'full'}})
+    def test_pragmas_are_configurable(self):
+        pragmas = current_pragmas(self.open(), NAMES)
+        self.assertEqual(pragmas['synchronous'], 2)
+        self.assertEqual(pragmas['journal_mode'], 'delete')
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        self.assertEqual(connection.settings_dict['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertGreater(connection.settings_dict['CONN_MAX_AGE'], 0)
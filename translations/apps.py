@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class TranslationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'translations'
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in
+
+        from . import signals  # noqa: F401
+        from .preferences import load_on_login
+
+        user_logged_in.connect(load_on_login, dispatch_uid='translations.load_on_login')
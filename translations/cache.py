@@ -0,0 +1,168 @@
+"""Two-tier cache in front of the CachedTranslation table.
+
+Tier 1 is a bounded, thread-safe LRU inside each process. Tier 2 is an optional
+Django cache backend shared between processes. Both are keyed by language pair
+and text hash, and configured through settings.TRANSLATION_CACHE:
+
+    TRANSLATION_CACHE = {
+        'LRU_SIZE': 10000,   # entries kept per process (0 disables tier 1)
+        'LRU_TTL': 3600,     # seconds before a tier-1 entry expires
+        'BACKEND': None,     # alias in CACHES for tier 2, e.g. 'default'
+        'TIMEOUT': 86400,    # tier-2 timeout in seconds
+    }
+
+Entries are invalidated when a CachedTranslation row is saved or deleted
+(see signals.py). Other processes only see that invalidation in tier 2; their
+tier-1 copies expire after LRU_TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    'LRU_SIZE': 10000,
+    'LRU_TTL': 3600,
+    'BACKEND': None,
+    'TIMEOUT': 86400,
+}
+
+_MISSING = object()
+
+
+class LRUCache:
+    """A size- and age-bounded least-recently-used mapping with hit/miss counters."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class TranslationCache:
+    """LRU (tier 1) plus optional shared Django cache (tier 2)."""
+
+    def __init__(self):
+        self._lru = None
+        self._config = None
+
+    @property
+    def config(self):
+        if self._config is None:
+            self._config = {**DEFAULTS, **getattr(settings, 'TRANSLATION_CACHE', {})}
+        return self._config
+
+    @property
+    def lru(self):
+        if self._lru is None:
+            self._lru = LRUCache(self.config['LRU_SIZE'], self.config['LRU_TTL'])
+        return self._lru
+
+    @property
+    def backend(self):
+        alias = self.config['BACKEND']
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def make_key(source_lang, target_lang, text_hash):
+        return f'translation:{source_lang}:{target_lang}:{text_hash}'
+
+    def get_many(self, keys):
+        """Return {key: translated_text} for the keys found in either tier."""
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.lru.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        backend = self.backend
+        if missing and backend is not None:
+            shared = backend.get_many(missing)
+            for key, value in shared.items():
+                self.lru.set(key, value)
+            found.update(shared)
+        return found
+
+    def set_many(self, mapping):
+        for key, value in mapping.items():
+            self.lru.set(key, value)
+        backend = self.backend
+        if mapping and backend is not None:
+            backend.set_many(mapping, timeout=self.config['TIMEOUT'])
+
+    def delete(self, key):
+        self.lru.delete(key)
+        backend = self.backend
+        if backend is not None:
+            backend.delete(key)
+
+    def clear(self):
+        """Drop tier 1 and reset its counters; reload settings on next use."""
+        if self._lru is not None:
+            self._lru.clear()
+        self._lru = None
+        self._config = None
+
+    def stats(self):
+        return self.lru.stats()
+
+
+translation_cache = TranslationCache()
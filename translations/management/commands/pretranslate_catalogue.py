@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from translations.pipeline import PretranslationPipeline, target_languages
+
+
+class Command(BaseCommand):
+    help = 'Machine-translate books that are missing a MovieTranslation for any configured language.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--language', action='append', dest='languages',
+                            help='Language code to translate into (repeatable). Defaults to all of LANGUAGES.')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Upstream translation requests in flight at once.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore saved checkpoints and rescan the whole catalogue.')
+
+    def handle(self, *args, **options):
+        languages = options['languages'] or target_languages()
+        unknown = set(languages) - set(target_languages())
+        if unknown:
+            raise CommandError(f"Unknown language(s): {', '.join(sorted(unknown))}")
+
+        pipeline = PretranslationPipeline(
+            languages=languages,
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            resume=not options['restart'],
+            progress=self.stdout.write,
+        )
+        created = pipeline.run()
+        self.stdout.write(self.style.SUCCESS(f'Created {sum(created.values())} translations.'))
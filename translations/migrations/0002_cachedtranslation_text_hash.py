@@ -0,0 +1,62 @@
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _hash_text(text):
+    # Frozen copy of translations.models.hash_text
+    normalized = unicodedata.normalize('NFC', text.strip())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def backfill_text_hash(apps, schema_editor):
+    """Hash existing rows, dropping rows that become duplicates once normalized."""
+    CachedTranslation = apps.get_model('translations', 'CachedTranslation')
+    seen = set()
+    duplicates = []
+    batch = []
+    for row in CachedTranslation.objects.order_by('id').only('id', 'source_language', 'target_language', 'source_text').iterator(chunk_size=1000):
+        row.text_hash = _hash_text(row.source_text)
+        key = (row.source_language, row.target_language, row.text_hash)
+        if key in seen:
+            duplicates.append(row.id)
+            continue
+        seen.add(key)
+        batch.append(row)
+        if len(batch) >= 1000:
+            CachedTranslation.objects.bulk_update(batch, ['text_hash'])
+            batch = []
+    if batch:
+        CachedTranslation.objects.bulk_update(batch, ['text_hash'])
+    for start in range(0, len(duplicates), 500):
+        CachedTranslation.objects.filter(id__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachedtranslation',
+            name='text_hash',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name='cachedtranslation',
+            unique_together=set(),
+        ),
+        migrations.RunPython(backfill_text_hash, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='cachedtranslation',
+            unique_together={('source_language', 'target_language', 'text_hash')},
+        ),
+        migrations.RemoveIndex(
+            model_name='cachedtranslation',
+            name='translation_source__5d1932_idx',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translations', '0002_cachedtranslation_text_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PretranslationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language_code', models.CharField(max_length=10, unique=True)),
+                ('last_movie_id', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,7 +1,16 @@
+import hashlib
+import unicodedata
+
 from django.db import models
 from django.contrib.auth.models import User
 
 
+def hash_text(text):
+    """SHA-256 hex digest of text after Unicode (NFC) and surrounding-whitespace normalization."""
+    normalized = unicodedata.normalize('NFC', text.strip())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
 class UserLanguagePreference(models.Model):
     """Stores user's preferred language for the interface and content."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='language_preference')
@@ -31,14 +40,27 @@ class CachedTranslation(models.Model):
     source_language = models.CharField(max_length=10)
     target_language = models.CharField(max_length=10)
     source_text = models.TextField()
+    # Fixed-size key for source_text so lookups and the unique index don't depend on text length
+    text_hash = models.CharField(max_length=64, editable=False)
     translated_text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('source_language', 'target_language', 'source_text')
-        indexes = [
-            models.Index(fields=['source_language', 'target_language']),
-        ]
+        unique_together = ('source_language', 'target_language', 'text_hash')
+
+    def save(self, *args, **kwargs):
+        self.text_hash = hash_text(self.source_text)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.source_language} -> {self.target_language}"
+
+
+class PretranslationCheckpoint(models.Model):
+    """Last Movie id processed by the pre-translation pipeline for one language."""
+    language_code = models.CharField(max_length=10, unique=True)
+    last_movie_id = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.language_code} @ movie {self.last_movie_id}"
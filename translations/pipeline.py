@@ -0,0 +1,180 @@
+"""Background pre-translation of catalogue content.
+
+Finds Movie rows without a MovieTranslation for each configured language,
+translates their name, description and genre through the cached translator,
+and writes MovieTranslation rows with bulk_create, then refreshes the search
+index and bumps the movies' cache generations. Upstream requests run on a
+thread pool of `concurrency` workers; all database work stays on the calling
+thread. Progress is checkpointed per language (PretranslationCheckpoint) after
+every batch, in order, so an interrupted run resumes where it stopped.
+
+Run it as a separate process with `manage.py pretranslate_catalogue`, or
+in-process through `pretranslation_worker.enqueue(movie_ids)`.
+"""
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+from cacheversions import generations
+from movies import search
+from movies.models import Movie, MovieTranslation
+
+from .models import PretranslationCheckpoint
+from .translator import lookup_cached, store_translations
+from .upstream import request_translations
+
+logger = logging.getLogger(__name__)
+
+SOURCE_LANGUAGE = 'en'
+
+# Movie fields translated into MovieTranslation; author names are left to the English fallback
+TRANSLATED_FIELDS = ('name', 'description', 'genre')
+
+
+def target_languages():
+    return [code for code, _ in settings.LANGUAGES if code != SOURCE_LANGUAGE]
+
+
+class PretranslationPipeline:
+    def __init__(self, languages=None, batch_size=20, concurrency=4, resume=True, progress=None):
+        self.languages = languages or target_languages()
+        self.batch_size = batch_size
+        self.concurrency = max(1, concurrency)
+        self.resume = resume
+        self.progress = progress or (lambda message: logger.info(message))
+
+    def pending_movies(self, language, after_id=0, movie_ids=None):
+        """Movies after `after_id` with no translation in `language`, in id order."""
+        movies = Movie.objects.filter(id__gt=after_id).exclude(
+            translations__language_code=language
+        )
+        if movie_ids is not None:
+            movies = movies.filter(id__in=movie_ids)
+        return movies.order_by('id').only('id', *TRANSLATED_FIELDS)
+
+    def run(self, movie_ids=None):
+        """Translate every pending movie. Returns {language: translations_created}.
+
+        With `movie_ids`, only those movies are considered and checkpoints are
+        left alone.
+        """
+        created = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for language in self.languages:
+                created[language] = self._run_language(executor, language, movie_ids)
+        return created
+
+    def _run_language(self, executor, language, movie_ids):
+        checkpoint = None
+        after_id = 0
+        if movie_ids is None:
+            checkpoint, _ = PretranslationCheckpoint.objects.get_or_create(language_code=language)
+            if self.resume:
+                after_id = checkpoint.last_movie_id
+
+        created = 0
+        window = deque()
+        for batch in self._batches(language, after_id, movie_ids):
+            window.append(self._submit(executor, batch, language))
+            # Finish batches in submission order so the checkpoint only moves forward
+            if len(window) >= self.concurrency:
+                created += self._finish(window.popleft(), language, checkpoint)
+        while window:
+            created += self._finish(window.popleft(), language, checkpoint)
+        self.progress(f'{language}: {created} translations created')
+        return created
+
+    def _batches(self, language, after_id, movie_ids):
+        # Keyset batches rather than one open cursor, since rows are inserted between batches
+        while True:
+            batch = list(self.pending_movies(language, after_id, movie_ids)[:self.batch_size])
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
+
+    def _submit(self, executor, batch, language):
+        texts = list(dict.fromkeys(
+            value for movie in batch for value in (getattr(movie, f) for f in TRANSLATED_FIELDS) if value
+        ))
+        hits = lookup_cached(texts, SOURCE_LANGUAGE, language)
+        misses = [text for text in texts if text not in hits]
+        future = executor.submit(request_translations, misses, SOURCE_LANGUAGE, language) if misses else None
+        return batch, hits, future
+
+    def _finish(self, submitted, language, checkpoint):
+        batch, translated, future = submitted
+        if future is not None:
+            fresh = future.result()
+            store_translations(fresh, SOURCE_LANGUAGE, language)
+            translated = {**translated, **fresh}
+
+        rows = []
+        for movie in batch:
+            if movie.name not in translated or movie.description not in translated:
+                continue
+            rows.append(MovieTranslation(
+                movie_id=movie.id,
+                language_code=language,
+                name=translated[movie.name],
+                description=translated[movie.description],
+                genre=translated.get(movie.genre) if movie.genre else None,
+            ))
+        # bulk_create skips post_save, so refresh the search index and the cached pages of these movies explicitly
+        MovieTranslation.objects.bulk_create(rows, ignore_conflicts=True)
+        if rows:
+            movie_ids = [row.movie_id for row in rows]
+            search.index_movies(movie_ids)
+            generations.changed(Movie, movie_ids)
+
+        if checkpoint is not None:
+            checkpoint.last_movie_id = batch[-1].id
+            checkpoint.save(update_fields=['last_movie_id', 'updated_at'])
+        skipped = len(batch) - len(rows)
+        self.progress(
+            f'{language}: up to movie {batch[-1].id}, {len(rows)} translated'
+            + (f', {skipped} failed' if skipped else '')
+        )
+        return len(rows)
+
+
+class PretranslationWorker:
+    """In-process worker: a daemon thread draining a queue of Movie ids."""
+
+    def __init__(self, **pipeline_options):
+        self.pipeline_options = pipeline_options
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, movie_ids):
+        with self._lock:
+            self.queue.put(list(movie_ids))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._drain, name='pretranslation-worker', daemon=True)
+                self._thread.start()
+
+    def _drain(self):
+        try:
+            while True:
+                with self._lock:
+                    if self.queue.empty():
+                        self._thread = None
+                        return
+                    movie_ids = self.queue.get()
+                try:
+                    PretranslationPipeline(**self.pipeline_options).run(movie_ids=movie_ids)
+                except Exception:
+                    logger.exception('Pre-translation failed for movies %s', movie_ids)
+                finally:
+                    self.queue.task_done()
+        finally:
+            connection.close()
+
+
+pretranslation_worker = PretranslationWorker()
@@ -0,0 +1,90 @@
+"""Apply a user's saved UserLanguagePreference without a query per request.
+
+The preference is read from the database once, at login (or when it is
+changed through set_language_preference), and then carried by the request
+itself: in the session for the rest of the login, and in a signed cookie so
+a returning visitor keeps it after the session ends or on a logged-out visit.
+
+LanguagePreferenceMiddleware runs after LocaleMiddleware. A URL with a
+language prefix always wins. For a URL without one, the middleware serves
+the preferred-language page directly instead of letting i18n_patterns
+answer with a redirect to the prefixed URL. On other unprefixed URLs, such
+as the admin, it simply activates the preferred language.
+"""
+from django.conf import settings
+from django.core.signing import BadSignature
+from django.urls import is_valid_path
+from django.utils import translation
+from django.utils.cache import patch_vary_headers
+
+SESSION_KEY = '_language_preference'
+COOKIE_NAME = 'language_preference'
+COOKIE_SALT = 'translations.preferences'
+COOKIE_AGE = 60 * 60 * 24 * 365
+
+
+def supported(language):
+    return language in {code for code, _ in settings.LANGUAGES}
+
+
+def remember(request, language):
+    """Cache `language` on the session now and in the signed cookie on the response."""
+    if hasattr(request, 'session'):
+        request.session[SESSION_KEY] = language
+    request._language_preference_cookie = language
+
+
+def get_preference(request):
+    """The preferred language carried by the request, or None. Never queries the database."""
+    language = getattr(request, 'session', {}).get(SESSION_KEY)
+    if language is None:
+        try:
+            language = request.get_signed_cookie(COOKIE_NAME, salt=COOKIE_SALT, max_age=COOKIE_AGE)
+        except (KeyError, BadSignature):
+            return None
+    return language if supported(language) else None
+
+
+def load_on_login(sender, request, user, **kwargs):
+    """user_logged_in receiver: the one query that reads the stored preference."""
+    from .models import UserLanguagePreference
+
+    if request is None:
+        return
+    language = (
+        UserLanguagePreference.objects.filter(user=user).values_list('preferred_language', flat=True).first()
+    )
+    if language:
+        remember(request, language)
+
+
+class LanguagePreferenceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        language = get_preference(request)
+        rewritten = False
+        if language and translation.get_language_from_path(request.path_info) is None:
+            # Activate first: the i18n_patterns prefix resolves against the active language
+            translation.activate(language)
+            request.LANGUAGE_CODE = language
+            prefixed = f'/{language}{request.path_info}'
+            urlconf = getattr(request, 'urlconf', None)
+            if not is_valid_path(request.path_info, urlconf) and is_valid_path(prefixed, urlconf):
+                request.path = request.path[: len(request.path) - len(request.path_info)] + prefixed
+                request.path_info = prefixed
+                rewritten = True
+
+        response = self.get_response(request)
+
+        if rewritten:
+            # The same URL now serves different languages to different visitors
+            patch_vary_headers(response, ('Cookie',))
+        new_language = getattr(request, '_language_preference_cookie', None)
+        if new_language:
+            response.set_signed_cookie(
+                COOKIE_NAME, new_language, salt=COOKIE_SALT, max_age=COOKIE_AGE,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
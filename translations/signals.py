@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from movies.models import Movie
+
+from .cache import translation_cache
+from .models import CachedTranslation
+
+
+@receiver(post_save, sender=CachedTranslation)
+@receiver(post_delete, sender=CachedTranslation)
+def invalidate_cached_translation(sender, instance, **kwargs):
+    """Drop the cached copy when a row is written or deleted (e.g. through the admin)."""
+    translation_cache.delete(translation_cache.make_key(
+        instance.source_language, instance.target_language, instance.text_hash
+    ))
+
+
+@receiver(post_save, sender=Movie)
+def pretranslate_new_movie(sender, instance, created, **kwargs):
+    """Queue new books for machine translation when PRETRANSLATE_ON_SAVE is enabled."""
+    if created and getattr(settings, 'PRETRANSLATE_ON_SAVE', False):
+        from .pipeline import pretranslation_worker
+        transaction.on_commit(lambda: pretranslation_worker.enqueue([instance.id]))
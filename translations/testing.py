@@ -0,0 +1,50 @@
+"""Test helpers shared by the translations tests and the benchmarks."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLibreTranslate:
+    """
+    Local stand-in for the LibreTranslate API, used as a context manager.
+    Translates "text" to "<target>:text" and records every request body.
+    """
+    
+    def __init__(self, status=200, delay=0):
+        self.status = status
+        self.delay = delay
+        self.received = []
+    
+    def __enter__(self):
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.received.append(body)
+                time.sleep(stub.delay)
+                texts = body['q'] if isinstance(body['q'], list) else [body['q']]
+                translated = [f"{body['target']}:{text}" for text in texts]
+                payload = json.dumps({
+                    'translatedText': translated if isinstance(body['q'], list) else translated[0]
+                }).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/translate'
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,9 +1,19 @@
+import asyncio
 import json
+from unittest import mock
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.test.utils import override_settings
-from .models import UserLanguagePreference, CachedTranslation
+from .cache import LRUCache, translation_cache
+from django.core.management import call_command
+from movies.models import Movie, MovieTranslation
+from .models import UserLanguagePreference, CachedTranslation, PretranslationCheckpoint, hash_text
+from .pipeline import PretranslationPipeline
+from .preferences import COOKIE_NAME, SESSION_KEY
+from .testing import StubLibreTranslate
+from .upstream import get_session
+from .translator import atranslate_text, translate_text
 
 
 class UserLanguagePreferenceTests(TestCase):
@@ -76,12 +86,29 @@ class CachedTranslationTests(TestCase):
                 translated_text='Hola'
             )
 
+    def test_text_hash_is_set_on_save(self):
+        """Test that the lookup hash is derived from the source text."""
+        cached = CachedTranslation.objects.create(
+            source_language='en',
+            target_language='es',
+            source_text='Hello',
+            translated_text='Hola'
+        )
+        self.assertEqual(cached.text_hash, hash_text('Hello'))
+        self.assertEqual(len(cached.text_hash), 64)
+    
+    def test_hash_normalizes_text(self):
+        """Test that composed/decomposed Unicode and outer whitespace hash the same."""
+        self.assertEqual(hash_text('Caf\u00e9'), hash_text(' Cafe\u0301 '))
+        self.assertNotEqual(hash_text('Hello'), hash_text('hello'))
+
 
 class TranslationAPITests(TestCase):
     """Test translation API endpoints."""
     
     def setUp(self):
         """Set up test client and user."""
+        translation_cache.clear()
         self.client = Client(enforce_csrf_checks=False)  # Disable CSRF for API tests
         self.user = User.objects.create_user(
             username='testuser',
@@ -205,3 +232,311 @@ class TranslationAPITests(TestCase):
         data = json.loads(response.content)
         self.assertTrue(data['success'])
         self.assertEqual(data['language'], 'fr')
+
+
+class LanguagePreferenceMiddlewareTests(TestCase):
+    """Test applying the stored language preference without queries or redirects."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        UserLanguagePreference.objects.create(user=self.user, preferred_language='fr')
+
+    def test_login_caches_preference_in_session_and_cookie(self):
+        """Logging in reads the preference once and carries it on the session and a signed cookie."""
+        response = self.client.post('/en/accounts/login/', {'username': 'reader', 'password': 'testpass123'})
+        self.assertEqual(self.client.session[SESSION_KEY], 'fr')
+        self.assertIn(COOKIE_NAME, response.cookies)
+
+    def test_unprefixed_url_is_served_in_preferred_language(self):
+        """A returning visitor gets the preferred page directly instead of a redirect."""
+        self.client.post('/en/accounts/login/', {'username': 'reader', 'password': 'testpass123'})
+        anonymous = Client()
+        anonymous.cookies[COOKIE_NAME] = self.client.cookies[COOKIE_NAME].value
+        with self.assertNumQueries(0):
+            response = anonymous.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Language'], 'fr')
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_language_prefix_in_url_wins(self):
+        """An explicit language prefix is honoured over the preference."""
+        self.client.post('/en/accounts/login/', {'username': 'reader', 'password': 'testpass123'})
+        response = self.client.get('/es/')
+        self.assertEqual(response['Content-Language'], 'es')
+
+    def test_without_preference_unprefixed_url_redirects(self):
+        """Visitors without a preference still get the i18n_patterns redirect."""
+        response = self.client.get('/', HTTP_ACCEPT_LANGUAGE='ja')
+        self.assertRedirects(response, '/ja/', fetch_redirect_response=False)
+
+    def test_tampered_cookie_is_ignored(self):
+        """A cookie that fails the signature check is not trusted."""
+        self.client.cookies[COOKIE_NAME] = 'de'
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_setting_preference_updates_session_and_cookie(self):
+        """Changing the preference takes effect on the next request without a query."""
+        self.client.login(username='reader', password='testpass123')
+        response = self.client.post(
+            '/en/translations/set-preference/',
+            data=json.dumps({'language': 'ja'}),
+            content_type='application/json'
+        )
+        self.assertEqual(self.client.session[SESSION_KEY], 'ja')
+        self.assertIn(COOKIE_NAME, response.cookies)
+        self.assertEqual(self.client.get('/')['Content-Language'], 'ja')
+
+
+class BatchTranslationAPITests(TestCase):
+    """Test the batch translation endpoint."""
+    
+    def setUp(self):
+        """Cache one of the strings that will be requested."""
+        translation_cache.clear()
+        CachedTranslation.objects.create(
+            source_language='en',
+            target_language='es',
+            source_text='Hello',
+            translated_text='Hola'
+        )
+    
+    def post_batch(self, texts, target='es'):
+        return self.client.post(
+            '/en/translations/translate/batch/',
+            data=json.dumps({
+                'texts': texts,
+                'source_language': 'en',
+                'target_language': target
+            }),
+            content_type='application/json'
+        )
+    
+    def test_batch_reports_hits_and_misses(self):
+        """Test that only misses go upstream, in one request, and are cached."""
+        with StubLibreTranslate() as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            # one IN lookup + one bulk insert
+            with self.assertNumQueries(2):
+                response = self.post_batch(['Hello', 'Goodbye', 'Book', 'Hello'])
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(
+            [(t['translated'], t['cached']) for t in data['translations']],
+            [('Hola', True), ('es:Goodbye', False), ('es:Book', False), ('Hola', True)]
+        )
+        self.assertEqual(len(stub.received), 1)
+        self.assertEqual(stub.received[0]['q'], ['Goodbye', 'Book'])
+        self.assertEqual(CachedTranslation.objects.filter(target_language='es').count(), 3)
+    
+    def test_batch_all_cached_makes_no_upstream_call(self):
+        """Test that a fully cached batch needs a single query."""
+        with StubLibreTranslate() as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            with self.assertNumQueries(1):
+                response = self.post_batch(['Hello'])
+        self.assertTrue(json.loads(response.content)['translations'][0]['cached'])
+        self.assertEqual(stub.received, [])
+    
+    def test_batch_upstream_failure_returns_originals(self):
+        """Test that texts come back untranslated when the API fails."""
+        with StubLibreTranslate(status=503) as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            data = json.loads(self.post_batch(['Goodbye']).content)
+        self.assertEqual(data['translations'][0], {'original': 'Goodbye', 'translated': 'Goodbye', 'cached': False})
+        self.assertFalse(CachedTranslation.objects.filter(source_text='Goodbye').exists())
+    
+    def test_batch_validation(self):
+        """Test that texts must be a bounded, non-empty list of strings."""
+        self.assertEqual(self.post_batch([]).status_code, 400)
+        self.assertEqual(self.post_batch('Hello').status_code, 400)
+        self.assertEqual(self.post_batch(['x'] * 101).status_code, 400)
+
+
+class LRUCacheTests(TestCase):
+    """Test the in-process LRU used as the first cache tier."""
+    
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted first."""
+        lru = LRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+        self.assertEqual(lru.stats()['evictions'], 1)
+    
+    def test_entries_expire(self):
+        """Test that entries older than the TTL are treated as misses."""
+        lru = LRUCache(maxsize=10, ttl=60)
+        with mock.patch('translations.cache.time.monotonic', return_value=0):
+            lru.set('a', 1)
+        with mock.patch('translations.cache.time.monotonic', return_value=61):
+            self.assertIsNone(lru.get('a'))
+        stats = lru.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expirations']), (0, 1, 1))
+
+
+class TranslationCacheTests(TestCase):
+    """Test the two-tier cache in front of CachedTranslation."""
+    
+    def setUp(self):
+        translation_cache.clear()
+        CachedTranslation.objects.create(
+            source_language='en',
+            target_language='fr',
+            source_text='Hello',
+            translated_text='Bonjour'
+        )
+    
+    def tearDown(self):
+        translation_cache.clear()
+    
+    def test_repeat_lookups_skip_database(self):
+        """Test that a hot string is served from the LRU."""
+        with self.assertNumQueries(1):
+            self.assertEqual(translate_text('Hello', 'en', 'fr'), 'Bonjour')
+        with self.assertNumQueries(0):
+            self.assertEqual(translate_text('Hello', 'en', 'fr'), 'Bonjour')
+        self.assertEqual(translation_cache.stats()['hits'], 1)
+    
+    def test_saving_row_invalidates_entry(self):
+        """Test that edits (e.g. in the admin) are visible immediately."""
+        translate_text('Hello', 'en', 'fr')
+        row = CachedTranslation.objects.get(target_language='fr')
+        row.translated_text = 'Salut'
+        row.save()
+        self.assertEqual(translate_text('Hello', 'en', 'fr'), 'Salut')
+    
+    @override_settings(
+        TRANSLATION_CACHE={'LRU_SIZE': 0, 'BACKEND': 'default'},
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'translation-tests'}}
+    )
+    def test_shared_backend_tier(self):
+        """Test that the Django cache backend serves lookups when the LRU is off."""
+        translation_cache.clear()
+        translate_text('Hello', 'en', 'fr')
+        with self.assertNumQueries(0):
+            self.assertEqual(translate_text('Hello', 'en', 'fr'), 'Bonjour')
+    
+    def test_cache_stats_requires_staff(self):
+        """Test that cache counters are only visible to staff."""
+        response = self.client.get('/en/translations/cache-stats/')
+        self.assertEqual(response.status_code, 302)
+        User.objects.create_user(username='staff', password='pw', is_staff=True)
+        self.client.login(username='staff', password='pw')
+        data = json.loads(self.client.get('/en/translations/cache-stats/').content)
+        self.assertIn('hits', data['cache'])
+
+
+class UpstreamClientTests(TestCase):
+    """Test the pooled sync and async LibreTranslate clients against a stub server."""
+    
+    def setUp(self):
+        translation_cache.clear()
+    
+    def tearDown(self):
+        translation_cache.clear()
+    
+    def test_sync_path_reuses_pooled_session(self):
+        """Test that WSGI requests share one keep-alive session."""
+        self.assertIs(get_session(), get_session())
+        with StubLibreTranslate() as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            self.assertEqual(translate_text('Hello', 'en', 'de'), 'de:Hello')
+            self.assertEqual(translate_text('Goodbye', 'en', 'de'), 'de:Goodbye')
+        self.assertEqual(len(stub.received), 2)
+    
+    async def test_async_endpoint_translates_and_caches(self):
+        """Test the async view end to end."""
+        with StubLibreTranslate() as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            for expected_cached in (False, True):
+                response = await self.async_client.post(
+                    '/en/translations/translate/async/',
+                    data={'text': 'Hello', 'source_language': 'en', 'target_language': 'ja'},
+                    content_type='application/json'
+                )
+                data = json.loads(response.content)
+                self.assertEqual(data['translated'], 'ja:Hello')
+                self.assertEqual(data['cached'], expected_cached)
+        self.assertEqual(len(stub.received), 1)
+    
+    async def test_async_endpoint_validates_like_the_sync_one(self):
+        """Test that both endpoints answer bad and same-language bodies alike."""
+        bodies = ('invalid json', json.dumps({'text': ''}), json.dumps({'text': 'Hi', 'target_language': 'en'}))
+        for body in bodies:
+            sync = await self.async_client.post('/en/translations/translate/', data=body, content_type='application/json')
+            response = await self.async_client.post('/en/translations/translate/async/', data=body, content_type='application/json')
+            self.assertEqual((response.status_code, response.content), (sync.status_code, sync.content))
+    
+    async def test_concurrent_identical_requests_share_one_upstream_call(self):
+        """Test that in-flight requests for the same text are collapsed."""
+        with StubLibreTranslate(delay=0.2) as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            results = await asyncio.gather(*[atranslate_text('Library', 'en', 'pt') for _ in range(5)])
+        self.assertEqual(results, [('pt:Library', False)] * 5)
+        self.assertEqual(len(stub.received), 1)
+
+
+class PretranslationPipelineTests(TestCase):
+    """Test background pre-translation of the catalogue."""
+    
+    def setUp(self):
+        translation_cache.clear()
+        self.movies = [
+            Movie.objects.create(name=f'Book {i}', description=f'About book {i}', genre='Fiction')
+            for i in range(3)
+        ]
+        MovieTranslation.objects.create(movie=self.movies[0], language_code='es', name='Libro 0', description='Sobre')
+    
+    def tearDown(self):
+        translation_cache.clear()
+    
+    def run_command(self, *args):
+        call_command('pretranslate_catalogue', '--language', 'es', '--batch-size', '1', '--concurrency', '2', *args, stdout=mock.Mock())
+    
+    def test_translates_missing_movies_and_checkpoints(self):
+        """Test that only untranslated movies are translated, and the run resumes."""
+        with StubLibreTranslate() as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            self.run_command()
+            self.run_command()
+        translation = MovieTranslation.objects.get(movie=self.movies[2], language_code='es')
+        self.assertEqual((translation.name, translation.genre), ('es:Book 2', 'es:Fiction'))
+        self.assertIsNone(translation.author)
+        self.assertEqual(MovieTranslation.objects.get(movie=self.movies[0]).name, 'Libro 0')
+        self.assertEqual(PretranslationCheckpoint.objects.get(language_code='es').last_movie_id, self.movies[2].id)
+        # the second run resumed after the checkpoint and sent nothing upstream
+        self.assertEqual(len(stub.received), 2)
+    
+    def test_failed_movies_are_retried_on_restart(self):
+        """Test that upstream failures create nothing, and --restart retries them."""
+        with StubLibreTranslate(status=503) as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            self.run_command()
+        self.assertEqual(MovieTranslation.objects.filter(language_code='es').count(), 1)
+        with StubLibreTranslate() as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            self.run_command('--restart')
+        self.assertEqual(MovieTranslation.objects.filter(language_code='es').count(), 3)
+    
+    def test_shared_strings_come_from_cache(self):
+        """Test that strings already in the translation cache are not re-requested."""
+        with StubLibreTranslate() as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            PretranslationPipeline(languages=['fr'], batch_size=10).run()
+        self.assertEqual(len(stub.received), 1)
+        self.assertEqual(stub.received[0]['q'].count('Fiction'), 1)
+        self.assertEqual(MovieTranslation.objects.filter(language_code='fr').count(), 3)
+    
+    def test_cached_pages_show_new_translations(self):
+        """Test that a batch written by the pipeline invalidates the cached listing and book pages."""
+        movie = self.movies[1]
+        pages = ['/fr/movies/', f'/fr/movies/{movie.id}/']
+        for url in pages:
+            self.assertNotContains(self.client.get(url), 'fr:Book 1')
+        with StubLibreTranslate() as stub, self.settings(TRANSLATION_UPSTREAM={'URL': stub.url}):
+            with self.captureOnCommitCallbacks(execute=True):
+                PretranslationPipeline(languages=['fr'], batch_size=10).run()
+        for url in pages:
+            self.assertContains(self.client.get(url), 'fr:Book 1')
+    
+    @override_settings(PRETRANSLATE_ON_SAVE=True)
+    def test_new_movies_are_queued_when_enabled(self):
+        """Test that creating a book queues it for the in-process worker."""
+        with mock.patch('translations.pipeline.pretranslation_worker.enqueue') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                movie = Movie.objects.create(name='New Book', description='desc')
+        enqueue.assert_called_once_with([movie.id])
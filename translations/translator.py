@@ -0,0 +1,109 @@
+"""Cached translation of arbitrary text.
+
+Every function here checks the two-tier translation cache and the
+CachedTranslation table first, sends only the misses to LibreTranslate
+(see upstream.py) and stores new results for next time.
+"""
+from asgiref.sync import sync_to_async
+
+from .cache import translation_cache
+from .models import CachedTranslation, hash_text
+from .upstream import arequest_translations, request_translations, singleflight
+
+
+def lookup_cached(texts, source_lang, target_lang):
+    """
+    Return {source_text: translated_text} for the texts already cached.
+    Checks the in-process/shared cache first, then the database in one query.
+    """
+    keys = {text: translation_cache.make_key(source_lang, target_lang, hash_text(text)) for text in texts}
+    found = translation_cache.get_many(set(keys.values()))
+
+    missing = {key.rsplit(':', 1)[1] for key in keys.values() if key not in found}
+    if missing:
+        rows = CachedTranslation.objects.filter(
+            source_language=source_lang,
+            target_language=target_lang,
+            text_hash__in=missing
+        ).values_list('text_hash', 'translated_text')
+        loaded = {
+            translation_cache.make_key(source_lang, target_lang, text_hash): translated_text
+            for text_hash, translated_text in rows
+        }
+        translation_cache.set_many(loaded)
+        found.update(loaded)
+
+    return {text: found[key] for text, key in keys.items() if key in found}
+
+
+def store_translations(translated, source_lang, target_lang):
+    """Save {source_text: translated_text} with one bulk insert and write it through to the cache."""
+    if not translated:
+        return
+    rows = [
+        CachedTranslation(
+            source_language=source_lang,
+            target_language=target_lang,
+            source_text=text,
+            text_hash=hash_text(text),
+            translated_text=translated_text
+        )
+        for text, translated_text in translated.items()
+    ]
+    CachedTranslation.objects.bulk_create(rows, ignore_conflicts=True)
+    translation_cache.set_many({
+        translation_cache.make_key(source_lang, target_lang, row.text_hash): row.translated_text
+        for row in rows
+    })
+
+
+def translate_batch(texts, source_lang, target_lang):
+    """
+    Translate many texts with caching.
+
+    Cache hits are resolved with a single IN query, only the misses go upstream,
+    and new translations are stored with one bulk insert. Returns a list of
+    (translated_text, cached) pairs in the order of `texts`; texts that could
+    not be translated come back unchanged with cached=False.
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    hits = lookup_cached(unique_texts, source_lang, target_lang)
+    misses = [text for text in unique_texts if text not in hits]
+
+    fresh = request_translations(misses, source_lang, target_lang) if misses else {}
+    store_translations(fresh, source_lang, target_lang)
+
+    results = []
+    for text in texts:
+        if text in hits:
+            results.append((hits[text], True))
+        else:
+            results.append((fresh.get(text, text), False))
+    return results
+
+
+def translate_text(source_text, source_lang, target_lang):
+    """
+    Translate text using LibreTranslate API with caching.
+    Returns translated text or original text if translation fails.
+    """
+    return translate_batch([source_text], source_lang, target_lang)[0][0]
+
+
+async def atranslate_text(source_text, source_lang, target_lang):
+    """
+    Async version of translate_batch for a single text.
+    Concurrent requests for the same uncached text share one upstream call.
+    Returns (translated_text, cached).
+    """
+    hits = await sync_to_async(lookup_cached)([source_text], source_lang, target_lang)
+    if source_text in hits:
+        return hits[source_text], True
+
+    async def fetch_and_store():
+        fresh = await arequest_translations([source_text], source_lang, target_lang)
+        await sync_to_async(store_translations)(fresh, source_lang, target_lang)
+        return fresh.get(source_text, source_text)
+
+    key = translation_cache.make_key(source_lang, target_lang, hash_text(source_text))
+    return await singleflight(key, fetch_and_store), False
@@ -0,0 +1,187 @@
+"""HTTP clients for the LibreTranslate API.
+
+The sync path (WSGI views, management commands) shares one pooled
+`requests.Session` per process. The async path (ASGI views) uses a pooled
+`httpx.AsyncClient` per event loop with a concurrency limit, and collapses
+concurrent identical requests into a single upstream call ("singleflight").
+Without httpx installed the async path runs the sync client in a thread.
+
+Configured through settings.TRANSLATION_UPSTREAM:
+
+    TRANSLATION_UPSTREAM = {
+        'URL': 'https://libretranslate.com/translate',
+        'TIMEOUT': 10,           # seconds per upstream request
+        'BATCH_SIZE': 50,        # most strings per upstream request
+        'POOL_SIZE': 20,         # keep-alive connections per process / event loop
+        'MAX_CONCURRENCY': 10,   # in-flight async upstream requests per event loop
+    }
+"""
+import asyncio
+import threading
+import weakref
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+DEFAULTS = {
+    # LibreTranslate API endpoint (free, public API - no key required)
+    'URL': 'https://libretranslate.com/translate',
+    'TIMEOUT': 10,
+    'BATCH_SIZE': 50,
+    'POOL_SIZE': 20,
+    'MAX_CONCURRENCY': 10,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TRANSLATION_UPSTREAM', {})}
+
+
+def _payload(chunk, source_lang, target_lang):
+    return {
+        "q": chunk if len(chunk) > 1 else chunk[0],
+        "source": source_lang,
+        "target": target_lang,
+    }
+
+
+def _parse(status_code, body, chunk):
+    """Map a LibreTranslate response to {source_text: translated_text}, or {} on failure."""
+    if status_code != 200:
+        return {}
+    result = body.get('translatedText') if isinstance(body, dict) else None
+    if isinstance(result, str):
+        result = [result]
+    if not isinstance(result, list) or len(result) != len(chunk):
+        return {}
+    return dict(zip(chunk, result))
+
+
+def _chunks(texts, size):
+    return [texts[start:start + size] for start in range(0, len(texts), size)]
+
+
+# --- sync (WSGI) ---------------------------------------------------------
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide pooled requests.Session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = get_config()['POOL_SIZE']
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def request_translations(texts, source_lang, target_lang):
+    """
+    Translate a list of texts with LibreTranslate, BATCH_SIZE per request.
+    Returns {source_text: translated_text} for the texts that were translated.
+    """
+    config = get_config()
+    translated = {}
+    for chunk in _chunks(texts, config['BATCH_SIZE']):
+        try:
+            response = get_session().post(
+                config['URL'],
+                json=_payload(chunk, source_lang, target_lang),
+                timeout=config['TIMEOUT']
+            )
+            translated.update(_parse(response.status_code, response.json(), chunk))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Translation API error: {e}")
+    return translated
+
+
+# --- async (ASGI) --------------------------------------------------------
+
+class _LoopState:
+    """Client, concurrency limit and in-flight calls belonging to one event loop."""
+
+    def __init__(self, config):
+        self.client = None
+        if httpx is not None:
+            self.client = httpx.AsyncClient(
+                timeout=config['TIMEOUT'],
+                limits=httpx.Limits(
+                    max_connections=config['POOL_SIZE'],
+                    max_keepalive_connections=config['POOL_SIZE'],
+                ),
+            )
+        self.semaphore = asyncio.Semaphore(config['MAX_CONCURRENCY'])
+        self.in_flight = {}
+
+
+_loop_states = weakref.WeakKeyDictionary()
+
+
+def _state():
+    loop = asyncio.get_running_loop()
+    state = _loop_states.get(loop)
+    if state is None:
+        state = _loop_states[loop] = _LoopState(get_config())
+    return state
+
+
+async def singleflight(key, func):
+    """
+    Run `func()` once for all concurrent callers using the same key.
+    Callers that arrive while a call is in flight await its result.
+    """
+    state = _state()
+    task = state.in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(func())
+        state.in_flight[key] = task
+        task.add_done_callback(lambda _: state.in_flight.pop(key, None))
+    # shield: one caller going away must not cancel the shared call
+    return await asyncio.shield(task)
+
+
+async def _post_async(state, chunk, source_lang, target_lang):
+    config = get_config()
+    async with state.semaphore:
+        try:
+            response = await state.client.post(config['URL'], json=_payload(chunk, source_lang, target_lang))
+            return _parse(response.status_code, response.json(), chunk)
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Translation API error: {e}")
+            return {}
+
+
+async def arequest_translations(texts, source_lang, target_lang):
+    """Async version of `request_translations`."""
+    state = _state()
+    if state.client is None:
+        return await sync_to_async(request_translations, thread_sensitive=False)(texts, source_lang, target_lang)
+    results = await asyncio.gather(*[
+        _post_async(state, chunk, source_lang, target_lang)
+        for chunk in _chunks(texts, get_config()['BATCH_SIZE'])
+    ])
+    translated = {}
+    for result in results:
+        translated.update(result)
+    return translated
+
+
+async def aclose():
+    """Close the async client of the running event loop."""
+    state = _loop_states.pop(asyncio.get_running_loop(), None)
+    if state is not None and state.client is not None:
+        await state.client.aclose()
@@ -4,6 +4,9 @@ from . import views
 urlpatterns = [
     # Translation API endpoints
     path('translate/', views.translate_api, name='translate'),
+    path('translate/batch/', views.translate_batch_api, name='translate_batch'),
+    path('translate/async/', views.translate_api_async, name='translate_async'),
     path('set-preference/', views.set_language_preference, name='set_preference'),
     path('get-preference/', views.get_language_preference, name='get_preference'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
 ]
@@ -1,61 +1,61 @@
 import json
-import requests
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from .models import UserLanguagePreference, CachedTranslation
+from django.contrib.admin.views.decorators import staff_member_required
+from .cache import translation_cache
+from .models import UserLanguagePreference
+from .preferences import remember as remember_language_preference
+from .translator import atranslate_text, translate_batch, translate_text  # noqa: F401
 
 
-# LibreTranslate API endpoint (free, public API - no key required)
-LIBRETRANSLATE_API = "https://libretranslate.com/translate"
+# Most strings accepted by the batch endpoint in one request
+MAX_BATCH_SIZE = 100
 
 
-def translate_text(source_text, source_lang, target_lang):
-    """
-    Translate text using LibreTranslate API with caching.
-    Returns translated text or original text if translation fails.
+def _error_response(message, status):
+    return JsonResponse({
+        'success': False,
+        'error': message
+    }, status=status)
+
+
+def _translation_response(source_text, translated_text, source_lang, target_lang, cached):
+    return JsonResponse({
+        'success': True,
+        'original': source_text,
+        'translated': translated_text,
+        'source_language': source_lang,
+        'target_language': target_lang,
+        'cached': cached
+    })
+
+
+def _read_translation_request(request):
     """
-    # Check if translation is already cached
-    cached = CachedTranslation.objects.filter(
-        source_language=source_lang,
-        target_language=target_lang,
-        source_text=source_text
-    ).first()
+    Parse the body shared by translate_api and translate_api_async.
     
-    if cached:
-        return cached.translated_text
-
+    Returns (text, source_language, target_language) when there is something
+    to translate, or else the JsonResponse to send: an error for a bad body,
+    the original text when source and target are the same.
+    """
     try:
-        response = requests.post(
-            LIBRETRANSLATE_API,
-            json={
-                "q": source_text,
-                "source": source_lang,
-                "target": target_lang,
-            },
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            translated_text = result.get('translatedText', source_text)
-            
-            # Cache the translation
-            CachedTranslation.objects.create(
-                source_language=source_lang,
-                target_language=target_lang,
-                source_text=source_text,
-                translated_text=translated_text
-            )
-            
-            return translated_text
-    except requests.exceptions.RequestException as e:
-        print(f"Translation API error: {e}")
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return _error_response('Invalid JSON', 400)
+    source_text = data.get('text', '').strip()
+    source_lang = data.get('source_language', 'en')
+    target_lang = data.get('target_language', 'en')
     
-    # Return original text if translation fails
-    return source_text
+    if not source_text:
+        return _error_response('No text provided', 400)
+    
+    # If source and target are the same, return original
+    if source_lang == target_lang:
+        return _translation_response(source_text, source_text, source_lang, target_lang, False)
+    return source_text, source_lang, target_lang
 
 
 @csrf_exempt  # CSRF exempt for API requests from frontend
@@ -81,45 +81,100 @@ def translate_api(request):
         "target_language": "es"
     }
     """
+    parsed = _read_translation_request(request)
+    if isinstance(parsed, JsonResponse):
+        return parsed
+    source_text, source_lang, target_lang = parsed
+    try:
+        translated_text, cached = translate_batch([source_text], source_lang, target_lang)[0]
+    except Exception as e:
+        return _error_response(str(e), 500)
+    return _translation_response(source_text, translated_text, source_lang, target_lang, cached)
+
+
+@csrf_exempt  # CSRF exempt for API requests from frontend
+@require_http_methods(["POST"])
+async def translate_api_async(request):
+    """
+    Async version of translate_api, for the ASGI application (moviesstore.asgi).
+    POST /translations/translate/async/
+    
+    Same request and response as translate_api. Waiting on LibreTranslate does
+    not hold a worker, and concurrent requests for the same uncached text are
+    served by one upstream call.
+    """
+    parsed = _read_translation_request(request)
+    if isinstance(parsed, JsonResponse):
+        return parsed
+    source_text, source_lang, target_lang = parsed
+    try:
+        translated_text, cached = await atranslate_text(source_text, source_lang, target_lang)
+    except Exception as e:
+        return _error_response(str(e), 500)
+    return _translation_response(source_text, translated_text, source_lang, target_lang, cached)
+
+
+@csrf_exempt  # CSRF exempt for API requests from frontend
+@require_http_methods(["POST"])
+def translate_batch_api(request):
+    """
+    API endpoint for translating many strings at once.
+    POST /translations/translate/batch/
+    
+    Request body:
+    {
+        "texts": ["Hello", "Goodbye"],
+        "source_language": "en",
+        "target_language": "es"
+    }
+    
+    Response:
+    {
+        "success": true,
+        "source_language": "en",
+        "target_language": "es",
+        "translations": [
+            {"original": "Hello", "translated": "Hola", "cached": true},
+            {"original": "Goodbye", "translated": "Adiós", "cached": false}
+        ]
+    }
+    """
     try:
         data = json.loads(request.body)
-        source_text = data.get('text', '').strip()
+        texts = data.get('texts')
         source_lang = data.get('source_language', 'en')
         target_lang = data.get('target_language', 'en')
-        
-        if not source_text:
+
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
             return JsonResponse({
                 'success': False,
-                'error': 'No text provided'
+                'error': 'texts must be a non-empty list of strings'
             }, status=400)
-        
-        # If source and target are the same, return original
-        if source_lang == target_lang:
+
+        if len(texts) > MAX_BATCH_SIZE:
             return JsonResponse({
-                'success': True,
-                'original': source_text,
-                'translated': source_text,
-                'source_language': source_lang,
-                'target_language': target_lang,
-                'cached': False
-            })
-        
-        # Translate the text
-        translated_text = translate_text(source_text, source_lang, target_lang)
-        
+                'success': False,
+                'error': f'At most {MAX_BATCH_SIZE} texts per request'
+            }, status=400)
+
+        texts = [t.strip() for t in texts]
+        if source_lang == target_lang:
+            results = [(text, False) for text in texts]
+        else:
+            to_translate = [text for text in texts if text]
+            translated = iter(translate_batch(to_translate, source_lang, target_lang))
+            results = [next(translated) if text else (text, False) for text in texts]
+
         return JsonResponse({
             'success': True,
-            'original': source_text,
-            'translated': translated_text,
             'source_language': source_lang,
             'target_language': target_lang,
-            'cached': CachedTranslation.objects.filter(
-                source_language=source_lang,
-                target_language=target_lang,
-                source_text=source_text
-            ).exists()
+            'translations': [
+                {'original': text, 'translated': translated_text, 'cached': cached}
+                for text, (translated_text, cached) in zip(texts, results)
+            ]
         })
-        
+
     except json.JSONDecodeError:
         return JsonResponse({
             'success': False,
@@ -162,6 +217,7 @@ def set_language_preference(request):
             )
             preference.preferred_language = language
             preference.save()
+            remember_language_preference(request, language)
             
             return JsonResponse({
                 'success': True,
@@ -202,3 +258,15 @@ def get_language_preference(request):
         'success': True,
         'language': language
     })
+
+
+@staff_member_required
+def cache_stats(request):
+    """
+    Hit/miss/eviction counters of this process's translation cache.
+    GET /translations/cache-stats/
+    """
+    return JsonResponse({
+        'success': True,
+        'cache': translation_cache.stats()
+    })